@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+單一審查者按需產生 - 不必重新分割整個母檔
+
+審查者遺失檔案或只想預覽某人的資料列時，過去要重新分割全部審查者。這裡：
+1. 第一次使用時掃描母檔一次，建立「審查者 → Excel 列號」分割索引，
+   以母檔內容雜湊為鍵存在快取資料夾；母檔未變時直接讀取索引，不再載入母檔找審查者
+2. 只產生指定審查者的活頁簿（與完整分割相同的方法與整理步驟；以相同的處理方法與
+   瘦身 / 樞紐分析表快取選項執行的完整分割，輸出逐位元組相同。列指紋、代理人與路由規則不支援）
+3. 產生過的檔案保留在 LRU 快取中（預設 32 個），快取鍵包含所有影響輸出的選項，
+   同一審查者以相同選項再次要求時直接複製
+
+快取資料夾結構：
+  <快取>/index-<雜湊>.json        分割索引
+  <快取>/files/<雜湊>/...          產生過的活頁簿
+  <快取>/lru.json                  使用順序（最舊在前）
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from excel_manifest import file_sha256
+from excel_package_tools import (active_sheet_name, normalize_package, package_timestamp, slim_workbook_package,
+                                 strip_pivot_caches)
+from excel_partition import DEFAULT_SEPARATORS, NO_SPLIT, build_reviewer_incidence, incidence_to_partitions
+from excel_publish import files_identical, publish_file
+from excel_roster import normalize_person_name
+from excel_splitter_fixed import (process_reviewer_excel_hide_rows, process_reviewer_excel_xlsm_passthrough,
+                                  validate_excel_file)
+
+BUILD_CACHE_NAME = '.split_cache'
+BUILD_METHODS = ('hide_rows', 'exclude_rows')
+DEFAULT_CACHED_FILES = 32
+
+
+def _write_json(path: str, data) -> None:
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+class ReviewerBuilder:
+    """
+    依快取的分割索引產生單一審查者的活頁簿
+
+    Args:
+        file_path: 母檔路徑
+        column_name: 審查者欄位名稱
+        processing_method: 'hide_rows' 或 'exclude_rows'（.xlsm 自動使用巨集保留快速路徑）
+        multi_valued: 審查者儲存格可能列出多人
+        cache_dir: 快取資料夾（預設為母檔所在資料夾下的 .split_cache）
+        max_cached_files: LRU 快取保留的活頁簿數
+        slim_output: 對輸出檔瘦身（同 process_excel_file_safe 的 slim_output）
+        strip_pivot_cache: 移除樞紐分析表快取記錄（同 process_excel_file_safe 的 strip_pivot_cache）
+    """
+
+    def __init__(self, file_path: str, column_name: str, processing_method: str = 'hide_rows',
+                 multi_valued: bool = False, cache_dir: Optional[str] = None,
+                 max_cached_files: int = DEFAULT_CACHED_FILES, slim_output: bool = False,
+                 strip_pivot_cache: bool = False):
+        if processing_method not in BUILD_METHODS:
+            raise ValueError(f"按需產生只支援 {', '.join(BUILD_METHODS)}")
+        self.file_path = os.path.abspath(file_path)
+        self.column_name = column_name
+        self.processing_method = processing_method
+        self.multi_valued = multi_valued
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(self.file_path), BUILD_CACHE_NAME)
+        self.max_cached_files = max(1, max_cached_files)
+        self.slim_output = slim_output
+        self.strip_pivot_cache = strip_pivot_cache
+        self.master_sha256 = file_sha256(self.file_path)
+        self._partitions: Optional[Dict[str, List[int]]] = None
+        self.stats = {'index_built': False, 'hits': 0, 'builds': 0, 'evicted': 0}
+
+    def _key(self, *extra) -> str:
+        text = json.dumps([self.master_sha256, self.column_name, self.multi_valued, *extra], ensure_ascii=False)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:24]
+
+    @property
+    def partitions(self) -> Dict[str, List[int]]:
+        """{審查者: [Excel 列號]}（第一次使用時從快取讀取或掃描母檔建立）"""
+        if self._partitions is None:
+            index_path = os.path.join(self.cache_dir, f"index-{self._key()}.json")
+            try:
+                with open(index_path, encoding='utf-8') as f:
+                    self._partitions = json.load(f)['partitions']
+            except (OSError, ValueError, KeyError):
+                df = pd.read_excel(self.file_path, engine='openpyxl', sheet_name=active_sheet_name(self.file_path))
+                if self.column_name not in df.columns:
+                    raise ValueError(f"找不到欄位 '{self.column_name}'")
+                separators = DEFAULT_SEPARATORS if self.multi_valued else NO_SPLIT
+                self._partitions = incidence_to_partitions(build_reviewer_incidence(df, self.column_name,
+                                                                                    separators=separators))
+                os.makedirs(self.cache_dir, exist_ok=True)
+                _write_json(index_path, {'master': os.path.basename(self.file_path), 'column': self.column_name,
+                                         'multi_valued': self.multi_valued, 'partitions': self._partitions})
+                self.stats['index_built'] = True
+        return self._partitions
+
+    def reviewers(self) -> List[str]:
+        return list(self.partitions)
+
+    def resolve(self, reviewer) -> str:
+        """找出索引中的審查者名稱（先完全比對，再忽略大小寫與多餘空白）"""
+        name = str(reviewer)
+        if name in self.partitions:
+            return name
+        key = normalize_person_name(name)
+        for candidate in self.partitions:
+            if normalize_person_name(candidate) == key:
+                return candidate
+        raise ValueError(f"找不到審查者 '{reviewer}'")
+
+    def preview(self, reviewer) -> pd.DataFrame:
+        """審查者的資料列（index 為 Excel 列號）"""
+        rows = self.partitions[self.resolve(reviewer)]
+        keep = set(rows)
+        df = pd.read_excel(self.file_path, engine='openpyxl', sheet_name=active_sheet_name(self.file_path),
+                           skiprows=lambda i: i > 0 and i + 1 not in keep)
+        df.index = rows[:len(df)]
+        return df
+
+    def _load_lru(self) -> "OrderedDict[str, Dict]":
+        try:
+            with open(os.path.join(self.cache_dir, 'lru.json'), encoding='utf-8') as f:
+                return OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            return OrderedDict()
+
+    def _save_lru(self, lru: "OrderedDict[str, Dict]") -> None:
+        while len(lru) > self.max_cached_files:
+            old_key, _ = lru.popitem(last=False)
+            shutil.rmtree(os.path.join(self.cache_dir, 'files', old_key), ignore_errors=True)
+            self.stats['evicted'] += 1
+        _write_json(os.path.join(self.cache_dir, 'lru.json'), list(lru.items()))
+
+    def build(self, reviewer, output_folder: Optional[str] = None) -> Dict:
+        """
+        產生單一審查者的活頁簿
+
+        Args:
+            reviewer: 審查者名稱
+            output_folder: 輸出資料夾；提供時以原子替換放到 <輸出資料夾>/<審查者>/（內容相同則不重寫）
+
+        Returns:
+            {'reviewer', 'rows', 'folder', 'filename', 'path'（快取或輸出位置）, 'cached'}
+        """
+        name = self.resolve(reviewer)
+        rows = self.partitions[name]
+        key = self._key(self.processing_method, self.slim_output, self.strip_pivot_cache, name)
+        entry_dir = os.path.join(self.cache_dir, 'files', key)
+
+        lru = self._load_lru()
+        entry = lru.pop(key, None)
+        cached = entry is not None and os.path.exists(os.path.join(entry_dir, entry['folder'], entry['filename']))
+        if cached:
+            self.stats['hits'] += 1
+        else:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            passthrough = os.path.splitext(self.file_path)[1].lower() == '.xlsm'
+            build_reviewer = (process_reviewer_excel_xlsm_passthrough if passthrough
+                              else process_reviewer_excel_hide_rows)
+            success, folder_path, filename = build_reviewer(
+                self.file_path, name, self.column_name, entry_dir,
+                exclude_rows=self.processing_method == 'exclude_rows', keep_rows=set(rows))
+            if not success:
+                raise RuntimeError(f"無法產生 {name} 的檔案")
+            output_path = os.path.join(folder_path, filename)
+            # 與完整分割相同的整理順序：樞紐分析表快取 → 瘦身 → 穩定輸出
+            if self.strip_pivot_cache:
+                try:
+                    strip_pivot_caches(output_path)
+                except Exception as e:
+                    print(f"⚠️ 樞紐分析表快取處理失敗: {e}")
+            if self.slim_output:
+                try:
+                    slim_workbook_package(output_path)
+                except Exception as e:
+                    print(f"⚠️ 瘦身失敗，保留原輸出: {e}")
+            if not passthrough:
+                normalize_package(output_path, package_timestamp(self.file_path))
+            validation = validate_excel_file(output_path)
+            if 'validation_error' in validation:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                raise RuntimeError(f"輸出檔案驗證失敗: {validation['validation_error']}")
+            entry = {'folder': os.path.relpath(folder_path, entry_dir), 'filename': filename}
+            self.stats['builds'] += 1
+        lru[key] = entry
+        self._save_lru(lru)
+
+        path = os.path.join(entry_dir, entry['folder'], entry['filename'])
+        if output_folder:
+            target_dir = os.path.join(output_folder, entry['folder'])
+            os.makedirs(target_dir, exist_ok=True)
+            target = os.path.join(target_dir, entry['filename'])
+            if not files_identical(path, target):
+                publish_file(path, target)
+            path = target
+        return {'reviewer': name, 'rows': len(rows), 'folder': entry['folder'].replace(os.sep, '/'),
+                'filename': entry['filename'], 'path': path, 'cached': cached}
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='按需產生單一審查者的活頁簿')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    build = subcommands.add_parser('build', help='只產生指定審查者的活頁簿')
+    preview = subcommands.add_parser('preview', help='顯示指定審查者的資料列')
+    for sub in (build, preview):
+        sub.add_argument('master', help='母檔路徑')
+        sub.add_argument('column_name', help='審查者欄位名稱')
+        sub.add_argument('--reviewer', required=True, help='審查者名稱')
+        sub.add_argument('--multi-valued', action='store_true', help='審查者儲存格可能列出多人')
+        sub.add_argument('--cache-dir', help='快取資料夾（預設：母檔資料夾下的 .split_cache）')
+    build.add_argument('--output', help='輸出資料夾（預設只放在快取中）')
+    build.add_argument('--method', default='hide_rows', choices=BUILD_METHODS, help='處理方法（預設 hide_rows）')
+    build.add_argument('--max-cached', type=int, default=DEFAULT_CACHED_FILES, help='快取保留的活頁簿數（預設 32）')
+    build.add_argument('--slim', action='store_true', help='對輸出檔瘦身（與完整分割的 --slim 相同）')
+    build.add_argument('--strip-pivot', action='store_true', help='移除樞紐分析表快取（與完整分割的 --strip-pivot 相同）')
+    preview.add_argument('--limit', type=int, default=20, help='顯示列數（預設 20）')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.master):
+        print(f"❌ 找不到檔案: {args.master}")
+        sys.exit(1)
+    try:
+        builder = ReviewerBuilder(args.master, args.column_name, getattr(args, 'method', 'hide_rows'),
+                                  args.multi_valued, args.cache_dir, getattr(args, 'max_cached', DEFAULT_CACHED_FILES),
+                                  getattr(args, 'slim', False), getattr(args, 'strip_pivot', False))
+        if args.command == 'build':
+            result = builder.build(args.reviewer, args.output)
+            source = '快取' if result['cached'] else '新產生'
+            print(f"✅ {result['reviewer']}: {result['rows']} 列（{source}）")
+            print(f"📁 {result['path']}")
+        else:
+            df = builder.preview(args.reviewer)
+            print(f"👀 {builder.resolve(args.reviewer)}: {len(df)} 列")
+            print(df.head(args.limit).to_string())
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
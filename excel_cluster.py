@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+"""
+多機分割 - 以共用資料夾上的工作佇列讓多台主機合作完成同一批分割
+
+年底審查一次要分割數十個母檔、每個數千位審查者，單台主機跑不完。
+協調端把每個母檔的審查者切成小批工作寫進共用資料夾，各主機上的 worker 認領後分割：
+1. 認領以 O_CREAT | O_EXCL 建立租約檔（lease），同一工作只有一台主機拿得到
+2. 處理期間定期更新租約檔的修改時間（心跳）；worker 當機或斷線時租約逾期，
+   其他 worker 以原子更名接手，工作重新排入。租約檔含唯一權杖，心跳、發佈與釋放前都確認
+   租約仍屬於自己；被接手的 worker 中止該批，不會覆寫或刪除新持有者的租約
+3. 每批先在本機暫存產生輸出，完成後才發佈到共用輸出資料夾，再寫入完成紀錄
+4. 所有工作完成後，協調端彙整完成紀錄，為每個母檔寫出 output_manifest
+
+不使用 sqlite：網路檔案系統（SMB / NFS）上的 sqlite 鎖定不可靠，建立檔案與更名則是原子的。
+各主機需以相同路徑掛載共用資料夾、時鐘需同步（租約時間應遠大於時鐘誤差）。
+
+佇列結構：
+  <佇列資料夾>/<工作 id>/job.json          工作設定
+  <佇列資料夾>/<工作 id>/tasks/<批>.json    每批的母檔與審查者
+  <佇列資料夾>/<工作 id>/leases/<批>.lease  租約（修改時間即心跳）
+  <佇列資料夾>/<工作 id>/attempts/<批>.json 認領次數與最後錯誤（超過上限時整批記錄為失敗）
+  <佇列資料夾>/<工作 id>/done/<批>.json     完成紀錄（每位審查者的輸出清單紀錄）
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from excel_manifest import STATUS_FAILED, STATUS_INVALID, STATUS_OK, manifest_entry, write_output_manifest
+from excel_package_tools import active_sheet_name, normalize_package, package_timestamp
+from excel_publish import StagedOutput
+from excel_splitter_fixed import (process_reviewer_excel_hide_rows, process_reviewer_excel_xlsm_passthrough,
+                                  validate_excel_file)
+
+CLUSTER_METHODS = ('hide_rows', 'exclude_rows')
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_CHUNK_SIZE = 25
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def _write_json(path: str, data) -> None:
+    """原子寫入 JSON（暫存檔名含主機與程序，避免多台主機互相覆寫）"""
+    temp_path = f"{path}.{socket.gethostname()}-{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _read_json(path: str):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _task_ids(job_dir: str) -> List[str]:
+    return sorted(name[:-5] for name in os.listdir(os.path.join(job_dir, 'tasks')) if name.endswith('.json'))
+
+
+def submit_job(queue_dir: str, masters: List[str], column_name: str, output_folder: str,
+               processing_method: str = 'hide_rows', chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """
+    建立分割工作並切成小批放入佇列
+
+    Args:
+        queue_dir: 共用佇列資料夾
+        masters: 母檔路徑（所有主機都能以相同路徑讀取）
+        column_name: 審查者欄位名稱
+        output_folder: 共用輸出資料夾（每個母檔輸出到 <輸出資料夾>/<母檔名稱>）
+        processing_method: 'hide_rows' 或 'exclude_rows'（.xlsm 自動使用巨集保留快速路徑）
+        chunk_size: 每批的審查者數
+
+    Returns:
+        工作 id
+    """
+    if processing_method not in CLUSTER_METHODS:
+        raise ValueError(f"多機分割只支援 {', '.join(CLUSTER_METHODS)}")
+    job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    job_dir = os.path.join(queue_dir, job_id)
+    for sub in ('tasks', 'leases', 'done', 'attempts'):
+        os.makedirs(os.path.join(job_dir, sub))
+
+    output_folder = os.path.abspath(output_folder)
+    masters = [os.path.abspath(master) for master in masters]
+    task_count = 0
+    for master_index, master in enumerate(masters):
+        # 只讀取審查者與 Email 欄位
+        df = pd.read_excel(master, engine='openpyxl', sheet_name=active_sheet_name(master),
+                           usecols=lambda c: c in (column_name, 'Email Address'))
+        if column_name not in df.columns:
+            raise ValueError(f"{os.path.basename(master)} 找不到欄位 '{column_name}'")
+        counts = df[column_name].value_counts(sort=False)
+        emails = {}
+        if 'Email Address' in df.columns:
+            assigned = df[[column_name, 'Email Address']].dropna()
+            emails = {str(name): str(email).strip()
+                      for name, email in zip(assigned[column_name], assigned['Email Address'])}
+        reviewers = df[column_name].dropna().unique().tolist()
+        target = os.path.join(output_folder, os.path.splitext(os.path.basename(master))[0])
+        for start in range(0, len(reviewers), max(1, chunk_size)):
+            chunk = reviewers[start:start + max(1, chunk_size)]
+            task_id = f"{master_index:03d}-{start // max(1, chunk_size):05d}"
+            _write_json(os.path.join(job_dir, 'tasks', f"{task_id}.json"), {
+                'master': master,
+                'output': target,
+                'reviewers': [{'name': reviewer, 'rows': int(counts.get(reviewer, 0)),
+                               'email': emails.get(str(reviewer), '')} for reviewer in chunk],
+            })
+            task_count += 1
+        print(f"✓ {os.path.basename(master)}: {len(reviewers)} 位審查者")
+
+    # job.json 最後寫入：worker 只認領已有 job.json 的工作，不會讀到切分一半的佇列
+    _write_json(os.path.join(job_dir, 'job.json'), {
+        'id': job_id, 'masters': masters, 'column': column_name, 'output': output_folder,
+        'method': processing_method, 'tasks': task_count, 'created': time.time(),
+    })
+    print(f"📮 已建立工作 {job_id}: {task_count} 批")
+    return job_id
+
+
+def job_status(queue_dir: str, job_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Dict[str, int]:
+    """
+    工作進度
+
+    Returns:
+        {'tasks', 'done', 'running', 'expired', 'pending'}
+    """
+    job_dir = os.path.join(queue_dir, job_id)
+    status = {'tasks': 0, 'done': 0, 'running': 0, 'expired': 0, 'pending': 0}
+    now = time.time()
+    for task_id in _task_ids(job_dir):
+        status['tasks'] += 1
+        if os.path.exists(os.path.join(job_dir, 'done', f"{task_id}.json")):
+            status['done'] += 1
+            continue
+        try:
+            heartbeat = os.stat(os.path.join(job_dir, 'leases', f"{task_id}.lease")).st_mtime
+        except FileNotFoundError:
+            status['pending'] += 1
+            continue
+        status['expired' if now - heartbeat > lease_seconds else 'running'] += 1
+    return status
+
+
+def finalize_job(queue_dir: str, job_id: str) -> List[str]:
+    """
+    彙整完成紀錄，為每個母檔寫出 output_manifest
+
+    Returns:
+        寫出的 output_manifest.json 路徑
+
+    Raises:
+        RuntimeError: 仍有未完成的批次
+    """
+    job_dir = os.path.join(queue_dir, job_id)
+    job = _read_json(os.path.join(job_dir, 'job.json'))
+    entries: Dict[str, List[Dict]] = {}
+    for task_id in _task_ids(job_dir):
+        done_path = os.path.join(job_dir, 'done', f"{task_id}.json")
+        if not os.path.exists(done_path):
+            raise RuntimeError(f"批次 {task_id} 尚未完成")
+        task = _read_json(os.path.join(job_dir, 'tasks', f"{task_id}.json"))
+        entries.setdefault(task['output'], []).extend(_read_json(done_path)['entries'])
+
+    paths = []
+    for master in job['masters']:
+        target = os.path.join(job['output'], os.path.splitext(os.path.basename(master))[0])
+        json_path, _ = write_output_manifest(entries.get(target, []), target, os.path.basename(master),
+                                             job['column'], job['method'])
+        paths.append(json_path)
+    return paths
+
+
+def wait_for_job(queue_dir: str, job_id: str, poll_interval: float = 5.0,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, timeout: Optional[float] = None) -> bool:
+    """等待所有批次完成並寫出輸出清單；逾時回傳 False"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    last = None
+    while True:
+        status = job_status(queue_dir, job_id, lease_seconds)
+        if status != last:
+            print(f"⏳ {status['done']}/{status['tasks']} 批完成，{status['running']} 批處理中，"
+                  f"{status['expired']} 批租約逾期")
+            last = status
+        if status['done'] == status['tasks']:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
+    for path in finalize_job(queue_dir, job_id):
+        print(f"🧾 輸出清單: {path}")
+    return True
+
+
+def _identity(stat) -> tuple:
+    return stat.st_dev, stat.st_ino
+
+
+def _restore(moved_path: str, lease_path: str) -> None:
+    """把誤移走的租約放回原位（不覆寫已存在的新租約），並移除暫存名稱"""
+    try:
+        os.link(moved_path, lease_path)
+    except FileExistsError:
+        pass  # 原位已有新租約：被移走租約的持有者會在下次心跳時發現租約遺失並中止
+    os.remove(moved_path)
+
+
+class LeaseLost(RuntimeError):
+    """租約已被其他 worker 接手"""
+
+
+class Lease:
+    """
+    持有中的租約
+
+    保留租約檔的檔案描述元與唯一權杖；心跳、發佈與釋放前都以 inode（os.fstat 與 os.stat）
+    及檔案內的權杖確認租約仍屬於自己，不會更新或刪除其他 worker 的租約
+    """
+
+    def __init__(self, path: str, fd: int, token: str):
+        self.path = path
+        self.fd = fd
+        self.token = token
+        self.identity = _identity(os.fstat(fd))
+        self.lost = threading.Event()
+
+    @classmethod
+    def create(cls, path: str, worker_id: str) -> Optional['Lease']:
+        """以 O_CREAT | O_EXCL 建立租約；已存在時回傳 None"""
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_RDWR)
+        except FileExistsError:
+            return None
+        token = f"{worker_id}-{uuid.uuid4().hex}"
+        os.write(fd, json.dumps({'worker': worker_id, 'token': token, 'claimed': time.time()}).encode('utf-8'))
+        os.fsync(fd)
+        return cls(path, fd, token)
+
+    def owned(self) -> bool:
+        try:
+            if _identity(os.stat(self.path)) != self.identity:
+                return False
+            return _read_json(self.path).get('token') == self.token
+        except (OSError, ValueError):
+            return False
+
+    def renew(self) -> bool:
+        """更新心跳；租約已不屬於自己時設定 lost 並回傳 False"""
+        for attempt in range(2):
+            if self.owned():
+                os.utime(self.fd if os.utime in os.supports_fd else self.path)
+                return True
+            if attempt == 0:
+                time.sleep(1)  # 其他 worker 檢查逾期時會短暫更名租約
+        self.lost.set()
+        return False
+
+    def ensure(self) -> None:
+        """確認仍持有租約，否則拋出 LeaseLost"""
+        if self.lost.is_set() or not self.renew():
+            raise LeaseLost(f"租約已被接手: {os.path.basename(self.path)}")
+
+    def release(self) -> None:
+        """釋放租約（先更名再確認，確認與刪除之間不會誤刪其他 worker 剛建立的租約）"""
+        released = f"{self.path}.released-{self.token}"
+        try:
+            os.rename(self.path, released)
+        except FileNotFoundError:
+            pass
+        else:
+            if _identity(os.stat(released)) == self.identity:
+                os.remove(released)
+            else:
+                _restore(released, self.path)
+        self.close()
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class ClusterWorker:
+    """
+    認領並處理佇列中的批次
+
+    Args:
+        queue_dir: 共用佇列資料夾
+        worker_id: worker 名稱（預設為 主機名稱-程序編號）
+        lease_seconds: 租約時間；超過此時間沒有心跳的批次由其他 worker 接手
+        staging_root: 本機暫存資料夾位置（預設為系統暫存目錄）
+        max_attempts: 每批最多認領次數（含當機後被接手）；超過時記錄為失敗，不再重試
+    """
+
+    def __init__(self, queue_dir: str, worker_id: Optional[str] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, staging_root: Optional[str] = None,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.queue_dir = queue_dir
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.staging_root = staging_root
+        self.max_attempts = max(1, max_attempts)
+        self.stats = {'tasks': 0, 'files': 0, 'failed': 0, 'requeued': 0, 'errors': 0, 'lost': 0, 'abandoned': 0}
+        self._random = random.Random(self.worker_id)
+        self._given_up = set()   # 本 worker 處理失敗的批次（留給其他 worker 重試）
+
+    def _expired(self, lease_path: str) -> bool:
+        try:
+            return time.time() - os.stat(lease_path).st_mtime > self.lease_seconds
+        except FileNotFoundError:
+            return False
+
+    def _take_over(self, lease_path: str) -> bool:
+        """移除逾期的租約（更名是原子的，同時只有一個 worker 會成功）"""
+        stale_path = f"{lease_path}.expired-{self.worker_id}-{uuid.uuid4().hex}"
+        try:
+            os.rename(lease_path, stale_path)
+        except FileNotFoundError:
+            return False
+        if not self._expired(stale_path):
+            # 檢查後已有其他 worker 建立新租約：放回去
+            _restore(stale_path, lease_path)
+            return False
+        os.remove(stale_path)
+        self.stats['requeued'] += 1
+        return True
+
+    def _attempts_path(self, job_dir: str, task_id: str) -> str:
+        return os.path.join(job_dir, 'attempts', f"{task_id}.json")
+
+    def _record_attempt(self, job_dir: str, task_id: str, error: Optional[str] = None) -> int:
+        """持有租約時更新認領次數與最後錯誤（只有租約持有者會寫入），回傳目前次數"""
+        path = self._attempts_path(job_dir, task_id)
+        try:
+            record = _read_json(path)
+        except (OSError, ValueError):
+            record = {'count': 0, 'error': ''}
+        if error is None:
+            record['count'] += 1
+        else:
+            record['error'] = error
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_json(path, record)
+        return record['count']
+
+    def _abandon(self, job_dir: str, task_id: str) -> None:
+        """超過認領次數：將整批記錄為失敗，讓工作可以結束"""
+        task = _read_json(os.path.join(job_dir, 'tasks', f"{task_id}.json"))
+        try:
+            last_error = _read_json(self._attempts_path(job_dir, task_id)).get('error', '')
+        except (OSError, ValueError):
+            last_error = ''
+        error = f"超過 {self.max_attempts} 次嘗試" + (f": {last_error}" if last_error else '')
+        entries = [manifest_entry(task['output'], reviewer['name'], None, None, reviewer['rows'],
+                                  email=reviewer['email'], status=STATUS_FAILED, error=error)
+                   for reviewer in task['reviewers']]
+        _write_json(os.path.join(job_dir, 'done', f"{task_id}.json"),
+                    {'worker': self.worker_id, 'entries': entries, 'abandoned': True})
+        self.stats['abandoned'] += 1
+        print(f"🛑 批次 {task_id} {error}，記錄為失敗")
+
+    def claim(self, job_dir: str, task_id: str) -> Optional[Lease]:
+        """嘗試認領一批；已完成、他人持有有效租約或超過嘗試次數時回傳 None"""
+        done_path = os.path.join(job_dir, 'done', f"{task_id}.json")
+        if os.path.exists(done_path):
+            return None
+        lease_path = os.path.join(job_dir, 'leases', f"{task_id}.lease")
+        for _ in range(2):
+            lease = Lease.create(lease_path, self.worker_id)
+            if lease is None:
+                if not self._expired(lease_path) or not self._take_over(lease_path):
+                    return None
+                print(f"♻️ 接手逾期批次 {task_id}")
+                continue
+            # 認領前可能剛好完成
+            if os.path.exists(done_path):
+                lease.release()
+                return None
+            if self._record_attempt(job_dir, task_id) > self.max_attempts:
+                self._abandon(job_dir, task_id)
+                lease.release()
+                return None
+            return lease
+        return None
+
+    def _heartbeat(self, lease: Lease, stop: threading.Event) -> None:
+        while not stop.wait(self.lease_seconds / 3):
+            if not lease.renew():
+                print(f"⚠️ 租約已被接手: {os.path.basename(lease.path)}")
+                return
+
+    def process_task(self, job: Dict, job_dir: str, task_id: str, lease: Optional[Lease] = None) -> List[Dict]:
+        """
+        在本機暫存分割一批審查者並發佈到共用輸出資料夾
+
+        Raises:
+            LeaseLost: 處理期間租約被其他 worker 接手（不發佈任何輸出）
+        """
+        task = _read_json(os.path.join(job_dir, 'tasks', f"{task_id}.json"))
+        master = task['master']
+        exclude_rows = job['method'] == 'exclude_rows'
+        passthrough = os.path.splitext(master)[1].lower() == '.xlsm'
+        build_reviewer = process_reviewer_excel_xlsm_passthrough if passthrough else process_reviewer_excel_hide_rows
+        package_time = package_timestamp(master)
+
+        entries = []
+        with StagedOutput(task['output'], self.staging_root) as staging:
+            for reviewer in task['reviewers']:
+                if lease and lease.lost.is_set():
+                    raise LeaseLost(f"租約已被接手: {task_id}")
+                success, folder_path, filename = build_reviewer(master, reviewer['name'], job['column'],
+                                                                staging.path, exclude_rows=exclude_rows)
+                status, error = STATUS_FAILED, '處理失敗'
+                if success:
+                    output_path = os.path.join(folder_path, filename)
+                    if not passthrough:
+                        normalize_package(output_path, package_time)
+                    validation = validate_excel_file(output_path)
+                    if 'validation_error' in validation:
+                        status, error = STATUS_INVALID, validation['validation_error']
+                    else:
+                        status, error = STATUS_OK, ''
+                entries.append(manifest_entry(staging.path, reviewer['name'], folder_path if success else None,
+                                              filename if success else None, reviewer['rows'],
+                                              email=reviewer['email'], status=status, error=error))
+            if lease:
+                lease.ensure()  # 發佈前確認仍持有租約
+        return entries
+
+    def run_once(self) -> bool:
+        """認領並處理一批；佇列中沒有可認領的批次時回傳 False"""
+        if not os.path.isdir(self.queue_dir):
+            return False
+        for job_id in sorted(os.listdir(self.queue_dir)):
+            job_dir = os.path.join(self.queue_dir, job_id)
+            if not os.path.exists(os.path.join(job_dir, 'job.json')):
+                continue
+            task_ids = _task_ids(job_dir)
+            # 各 worker 以不同順序嘗試，減少同時搶同一批
+            self._random.shuffle(task_ids)
+            for task_id in task_ids:
+                if (job_id, task_id) in self._given_up:
+                    continue
+                lease = self.claim(job_dir, task_id)
+                if lease:
+                    self._run_task(job_dir, task_id, lease)
+                    return True
+        return False
+
+    def _run_task(self, job_dir: str, task_id: str, lease: Lease) -> None:
+        job = _read_json(os.path.join(job_dir, 'job.json'))
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(lease, stop), daemon=True)
+        heartbeat.start()
+        print(f"🔨 {self.worker_id} 處理 {job['id']}/{task_id}")
+        entries = None
+        error = None
+        try:
+            entries = self.process_task(job, job_dir, task_id, lease)
+        except LeaseLost as e:
+            print(f"⚠️ {job['id']}/{task_id} 中止: {e}")
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            print(f"❌ {job['id']}/{task_id} 處理失敗: {error}")
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        if entries is not None and not lease.owned():
+            print(f"⚠️ {job['id']}/{task_id} 中止: 租約已被接手")
+            entries = None
+        if entries is None and error is None:
+            # 租約遺失：批次屬於新的持有者，不寫完成紀錄也不刪除租約
+            self.stats['lost'] += 1
+            lease.close()
+            return
+        if entries is None:
+            # 例如共用資料夾暫時無法存取：記錄錯誤並釋放租約讓其他 worker 重試；用完嘗試次數時記錄為失敗
+            self.stats['errors'] += 1
+            if self._record_attempt(job_dir, task_id, error) >= self.max_attempts:
+                self._abandon(job_dir, task_id)
+            else:
+                self._given_up.add((job['id'], task_id))
+        else:
+            # 先寫完成紀錄再釋放租約；worker 在兩者之間當機時，批次不會被重做
+            _write_json(os.path.join(job_dir, 'done', f"{task_id}.json"),
+                        {'worker': self.worker_id, 'entries': entries})
+            self.stats['tasks'] += 1
+            self.stats['files'] += sum(1 for entry in entries if entry['status'] == STATUS_OK)
+            self.stats['failed'] += sum(1 for entry in entries if entry['status'] != STATUS_OK)
+        lease.release()
+
+    def run(self, stop_event: Optional[threading.Event] = None, exit_when_idle: bool = False,
+            poll_interval: float = 5.0) -> Dict[str, int]:
+        """
+        持續處理佇列直到 stop_event 被設定、Ctrl+C，或（exit_when_idle 時）沒有可認領的批次
+
+        Returns:
+            統計資料（tasks、files、failed、requeued、errors、lost、abandoned）
+        """
+        stop_event = stop_event or threading.Event()
+        print(f"🧑‍🏭 worker {self.worker_id} 監看佇列 {self.queue_dir}")
+        try:
+            while not stop_event.is_set():
+                if self.run_once():
+                    continue
+                if exit_when_idle:
+                    break
+                self._given_up.clear()  # 閒置一輪後重試失敗過的批次（次數由 max_attempts 限制）
+                stop_event.wait(poll_interval)
+        except KeyboardInterrupt:
+            print("\n⏹️ 停止 worker")
+        return self.stats
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='多機分割（共用資料夾工作佇列）')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    submit = subcommands.add_parser('submit', help='建立分割工作')
+    submit.add_argument('queue_dir', help='共用佇列資料夾')
+    submit.add_argument('column_name', help='審查者欄位名稱')
+    submit.add_argument('output_folder', help='共用輸出資料夾（每個母檔一個子資料夾）')
+    submit.add_argument('masters', nargs='+', help='母檔路徑')
+    submit.add_argument('--method', default='hide_rows', choices=CLUSTER_METHODS, help='處理方法（預設 hide_rows）')
+    submit.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每批審查者數（預設 25）')
+    submit.add_argument('--wait', action='store_true', help='等待完成並寫出輸出清單')
+
+    worker = subcommands.add_parser('worker', help='認領並處理佇列中的批次')
+    worker.add_argument('queue_dir', help='共用佇列資料夾')
+    worker.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS, help='租約秒數（預設 300）')
+    worker.add_argument('--staging-dir', help='本機暫存資料夾')
+    worker.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help='每批最多嘗試次數，超過時記錄為失敗（預設 3）')
+    worker.add_argument('--exit-when-idle', action='store_true', help='沒有可認領的批次時結束')
+
+    status = subcommands.add_parser('status', help='查看工作進度；全部完成時寫出輸出清單')
+    status.add_argument('queue_dir', help='共用佇列資料夾')
+    status.add_argument('job_id', help='工作 id')
+    status.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS, help='租約秒數（預設 300）')
+
+    args = parser.parse_args()
+
+    if args.command == 'submit':
+        job_id = submit_job(args.queue_dir, args.masters, args.column_name, args.output_folder, args.method,
+                            args.chunk_size)
+        if args.wait:
+            wait_for_job(args.queue_dir, job_id)
+    elif args.command == 'worker':
+        stats = ClusterWorker(args.queue_dir, lease_seconds=args.lease, staging_root=args.staging_dir,
+                              max_attempts=args.max_attempts).run(exit_when_idle=args.exit_when_idle)
+        print(f"📊 完成 {stats['tasks']} 批、{stats['files']} 個檔案，失敗 {stats['failed']}，"
+              f"接手逾期批次 {stats['requeued']}，無法處理 {stats['errors']} 批，"
+              f"租約遺失 {stats['lost']} 批，放棄 {stats['abandoned']} 批")
+    elif args.command == 'status':
+        status = job_status(args.queue_dir, args.job_id, args.lease)
+        print(f"📊 {status['done']}/{status['tasks']} 批完成，{status['running']} 批處理中，"
+              f"{status['expired']} 批租約逾期，{status['pending']} 批等待中")
+        if status['done'] == status['tasks']:
+            for path in finalize_job(args.queue_dir, args.job_id):
+                print(f"🧾 輸出清單: {path}")
+        sys.exit(0 if status['done'] == status['tasks'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+跨母檔合併 - 每位審查者一個活頁簿，每個應用程式一個工作表
+
+同一位審查者出現在多個應用程式母檔時，原本會收到多個資料夾與檔案，
+也要分別建立多次分享。合併模式對每個母檔只做一次串流讀取，
+把資料列依審查者分組，最後每位審查者只輸出一個活頁簿。
+"""
+
+import os
+import re
+import sys
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+from excel_package_tools import normalize_package, package_timestamp
+from excel_partition import DEFAULT_SEPARATORS, split_reviewer_names
+from excel_splitter_fixed import sanitize_folder_name, validate_excel_file
+
+# 工作表名稱不可包含的字元與長度上限
+INVALID_SHEET_CHARS_RE = re.compile(r'[\[\]:*?/\\]')
+MAX_SHEET_NAME_LENGTH = 31
+
+
+def sheet_title_for(app_name: str, used: Optional[set] = None) -> str:
+    """將應用程式名稱轉成合法且不重複的工作表名稱"""
+    base = INVALID_SHEET_CHARS_RE.sub('_', str(app_name)).strip("' ") or 'Sheet'
+    title = base[:MAX_SHEET_NAME_LENGTH]
+    counter = 2
+    while used is not None and title.lower() in used:
+        suffix = f" ({counter})"
+        title = base[:MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+        counter += 1
+    if used is not None:
+        used.add(title.lower())
+    return title
+
+
+def stream_master_by_reviewer(file_path: str, column_name: str,
+                              multi_valued: bool = False) -> Tuple[List, Dict[str, List[tuple]]]:
+    """
+    串流讀取母檔的使用中工作表一次，依審查者分組資料列
+
+    Returns:
+        (標題列, {審查者: [資料列值, ...]})；找不到審查者欄位時拋出 ValueError
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        if column_name not in header:
+            raise ValueError(f"找不到欄位 '{column_name}'")
+        col_idx = header.index(column_name)
+
+        groups = OrderedDict()
+        for values in rows:
+            if values is None or all(v is None for v in values):
+                continue
+            value = values[col_idx] if col_idx < len(values) else None
+            if multi_valued:
+                names = split_reviewer_names(value, DEFAULT_SEPARATORS)
+            else:
+                names = [str(value).strip()] if value is not None and str(value).strip() else []
+            for name in names:
+                groups.setdefault(name, []).append(values)
+        return header, groups
+    finally:
+        wb.close()
+
+
+def reviewer_folder_collisions(reviewers) -> Dict[str, List[str]]:
+    """
+    找出清理後對應到同一個資料夾的審查者（例如「R&D/Ops」與「R&D:Ops」）
+
+    資料夾名稱不分大小寫比對（Windows、macOS 與 SharePoint 都不分大小寫）
+
+    Returns:
+        {資料夾名稱: [審查者, ...]}，只列出有兩位以上審查者的資料夾
+    """
+    folders = OrderedDict()
+    for reviewer in reviewers:
+        folder_name = sanitize_folder_name(reviewer)
+        folders.setdefault(folder_name.casefold(), (folder_name, []))[1].append(reviewer)
+    return {folder_name: names for folder_name, names in folders.values() if len(names) > 1}
+
+
+def _write_reviewer_workbook(path: str, sheets: List[Tuple[str, List, List[tuple]]],
+                             timestamp: Optional[str] = None) -> None:
+    """以唯寫模式輸出單一審查者的活頁簿（每個應用程式一個工作表），docProps 時間固定為 timestamp"""
+    wb = Workbook(write_only=True)
+    header_font = Font(bold=True)
+    used = set()
+    for app_name, header, rows in sheets:
+        ws = wb.create_sheet(sheet_title_for(app_name, used))
+        ws.freeze_panes = 'A2'
+        ws.auto_filter.ref = f"A1:{get_column_letter(max(len(header), 1))}{len(rows) + 1}"
+        header_cells = []
+        for value in header:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.font = header_font
+            header_cells.append(cell)
+        ws.append(header_cells)
+        for values in rows:
+            ws.append(list(values))
+    wb.save(path)
+    normalize_package(path, timestamp)
+
+
+def consolidate_reviewer_workbooks(masters: Dict[str, str], column_name: str, output_folder: str,
+                                   multi_valued: bool = False) -> Dict:
+    """
+    將多個應用程式母檔合併成每位審查者一個活頁簿
+
+    Args:
+        masters: {應用程式名稱: 母檔路徑}（依此順序排列工作表）
+        column_name: 審查者欄位名稱
+        output_folder: 輸出資料夾（每位審查者一個子資料夾）
+        multi_valued: 審查者儲存格可能列出多人（以分號或換行分隔）
+
+    Returns:
+        統計資料：masters、reviewers、files、files_without_consolidation、sheets、rows、failed_masters、
+        collisions（{資料夾名稱: [審查者]}，這些審查者不輸出，避免互相覆寫）
+    """
+    print(f"📚 合併 {len(masters)} 個母檔，審查者欄位: {column_name}")
+    print(f"📂 輸出資料夾: {output_folder}")
+    print("=" * 50)
+
+    # {審查者: [(應用程式, 標題列, 資料列)]}
+    per_reviewer = OrderedDict()
+    failed_masters = []
+    # 輸出檔的 docProps 時間取最新母檔的時間，相同輸入重跑時位元組不變
+    timestamp = None
+    for app_name, file_path in masters.items():
+        try:
+            header, groups = stream_master_by_reviewer(file_path, column_name, multi_valued)
+        except Exception as e:
+            print(f"⚠️ 略過 {app_name}: {e}")
+            failed_masters.append(app_name)
+            continue
+        timestamp = max(filter(None, (timestamp, package_timestamp(file_path))))
+        for reviewer, rows in groups.items():
+            per_reviewer.setdefault(reviewer, []).append((app_name, header, rows))
+        print(f"✓ {app_name}: {sum(len(r) for r in groups.values())} 列，{len(groups)} 位審查者")
+
+    collisions = reviewer_folder_collisions(per_reviewer)
+    colliding = {name for names in collisions.values() for name in names}
+    for folder_name, names in collisions.items():
+        print(f"❌ 審查者 {', '.join(names)} 會寫入同一個資料夾 '{folder_name}'，略過不輸出")
+
+    files = 0
+    sheets = 0
+    rows_written = 0
+    for reviewer, reviewer_sheets in per_reviewer.items():
+        if reviewer in colliding:
+            continue
+        folder_name = sanitize_folder_name(reviewer)
+        reviewer_folder = os.path.join(output_folder, folder_name)
+        os.makedirs(reviewer_folder, exist_ok=True)
+        output_path = os.path.join(reviewer_folder, f"{folder_name}.xlsx")
+        try:
+            _write_reviewer_workbook(output_path, reviewer_sheets, timestamp)
+        except Exception as e:
+            print(f"  ❌ {reviewer}: {e}")
+            continue
+        validation = validate_excel_file(output_path)
+        if 'validation_error' in validation:
+            print(f"  ⚠️ {reviewer}: 輸出檔案驗證失敗: {validation['validation_error']}")
+            continue
+        files += 1
+        sheets += len(reviewer_sheets)
+        rows_written += sum(len(rows) for _, _, rows in reviewer_sheets)
+        print(f"📝 {reviewer}: {len(reviewer_sheets)} 個應用程式")
+
+    stats = {
+        'masters': len(masters) - len(failed_masters),
+        'reviewers': len(per_reviewer),
+        'files': files,
+        # 未合併時每個（應用程式, 審查者）各一個檔案與一次分享
+        'files_without_consolidation': sum(len(s) for s in per_reviewer.values()),
+        'sheets': sheets,
+        'rows': rows_written,
+        'failed_masters': failed_masters,
+        'collisions': collisions,
+    }
+
+    print("\n" + "=" * 50)
+    print("✅ 合併完成！")
+    print(f"📊 輸出檔案: {stats['files']} 個（未合併時為 {stats['files_without_consolidation']} 個）")
+    print(f"📄 工作表: {stats['sheets']} 個，資料列: {stats['rows']:,}")
+    if failed_masters:
+        print(f"❌ 無法讀取的母檔: {', '.join(failed_masters)}")
+    if collisions:
+        print(f"❌ 資料夾名稱衝突: {len(colliding)} 位審查者未輸出，請修正審查者名稱")
+    return stats
+
+
+def parse_master_arguments(arguments: List[str]) -> Dict[str, str]:
+    """解析「應用程式=路徑」或單純路徑（以檔名作為應用程式名稱）"""
+    masters = OrderedDict()
+    for argument in arguments:
+        if '=' in argument and not os.path.exists(argument):
+            app_name, path = argument.split('=', 1)
+        else:
+            app_name, path = os.path.splitext(os.path.basename(argument))[0], argument
+        masters[app_name.strip()] = path
+    return masters
+
+
+def main():
+    """主程式"""
+    multi_valued = '--multi-valued' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--multi-valued']
+    if len(args) < 3:
+        print("使用方式：python excel_consolidate.py <輸出資料夾> <審查者欄位> <母檔1> [母檔2 ...] [--multi-valued]")
+        print("範例：python excel_consolidate.py ./output Reviewer SAP=sap.xlsx Slack=slack.xlsx")
+        sys.exit(1)
+
+    stats = consolidate_reviewer_workbooks(parse_master_arguments(args[2:]), args[1], args[0], multi_valued)
+    sys.exit(0 if stats['files'] > 0 and not stats['collisions'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+期間異動 - 只把本期新增、變更與移除的資料列送給審查者
+
+以鍵欄位（例如 User_ID / ID）對本期與上期母檔做雜湊合併，
+每列先算出整列雜湊值，只有雜湊不同的列才逐欄比對找出變更欄位。
+合併與雜湊都是向量化的線性運算，百萬列母檔也能在合理時間內完成。
+"""
+
+import os
+import sys
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from excel_package_tools import fingerprint_value_text, normalize_package, package_timestamp
+from excel_partition import DEFAULT_SEPARATORS, NO_SPLIT, build_reviewer_incidence
+from excel_splitter_fixed import sanitize_folder_name
+
+# 異動類型與輸出欄位
+CHANGE_NEW = '新增'
+CHANGE_MODIFIED = '變更'
+CHANGE_REMOVED = '移除'
+CHANGE_COLUMN = '異動類型'
+CHANGED_FIELDS_COLUMN = '變更欄位'
+
+
+def cell_text(value) -> str:
+    """
+    比對用的儲存格文字（與列指紋相同的正規化）
+
+    上下期同一欄位的型別可能不同：某一期有空白儲存格時，pandas 會把整數欄讀成浮點數（10 → 10.0），
+    因此整數型浮點數去除小數點、NaN 視為空白；文字原樣保留
+    """
+    return value if isinstance(value, str) else fingerprint_value_text(value)
+
+
+def normalize_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """將指定欄位轉為比對用文字"""
+    return pd.DataFrame({column: df[column].map(cell_text) for column in columns}, index=df.index,
+                        columns=columns)
+
+
+def hash_rows(df: pd.DataFrame, columns: List[str]) -> pd.Series:
+    """
+    計算每列的雜湊值（只看指定欄位，欄位順序固定）
+
+    值先以 cell_text 正規化再雜湊，避免上下期欄位型別不同（例如 int、float 與 object）造成誤判。
+    """
+    return pd.util.hash_pandas_object(normalize_columns(df, columns), index=False)
+
+
+def compute_cycle_delta(current: pd.DataFrame, previous: pd.DataFrame, key_column: str,
+                        ignore_columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    比對本期與上期母檔
+
+    Args:
+        current: 本期資料
+        previous: 上期資料
+        key_column: 鍵欄位（每期內不可重複）
+        ignore_columns: 不列入比對的欄位（例如審查意見欄）
+
+    Returns:
+        DataFrame：異動類型、變更欄位，其後為本期欄位（移除列取上期的值），依本期順序排列，移除列在最後
+    """
+    for label, frame in (('本期', current), ('上期', previous)):
+        if key_column not in frame.columns:
+            raise ValueError(f"{label}母檔找不到鍵欄位 '{key_column}'")
+        duplicated = frame[key_column].dropna()
+        duplicated = duplicated[duplicated.duplicated()]
+        if not duplicated.empty:
+            raise ValueError(f"{label}母檔的鍵欄位有重複值: {', '.join(map(str, duplicated.unique()[:5]))}")
+
+    ignored = set(ignore_columns or [])
+    compare_columns = [c for c in current.columns if c in previous.columns and c != key_column and c not in ignored]
+
+    current = current[current[key_column].notna()].reset_index(drop=True)
+    previous = previous[previous[key_column].notna()].reset_index(drop=True)
+    left = pd.DataFrame({'key': current[key_column].map(cell_text), 'hash': hash_rows(current, compare_columns),
+                         'current_pos': current.index})
+    right = pd.DataFrame({'key': previous[key_column].map(cell_text), 'hash': hash_rows(previous, compare_columns),
+                          'previous_pos': previous.index})
+    joined = left.merge(right, on='key', how='outer', suffixes=('', '_previous'), indicator=True, sort=False)
+
+    new_rows = joined[joined['_merge'] == 'left_only']
+    removed_rows = joined[joined['_merge'] == 'right_only']
+    modified_rows = joined[(joined['_merge'] == 'both') & (joined['hash'] != joined['hash_previous'])]
+
+    parts = []
+    if not new_rows.empty:
+        frame = current.iloc[new_rows['current_pos'].astype(int)].copy()
+        frame.insert(0, CHANGED_FIELDS_COLUMN, '')
+        frame.insert(0, CHANGE_COLUMN, CHANGE_NEW)
+        parts.append(frame)
+
+    if not modified_rows.empty:
+        frame = current.iloc[modified_rows['current_pos'].astype(int)].copy()
+        before = normalize_columns(previous.iloc[modified_rows['previous_pos'].astype(int)], compare_columns)
+        after = normalize_columns(frame, compare_columns)
+        before, after = before.to_numpy(), after.to_numpy()
+        differs = before != after
+        fields = [', '.join(c for c, changed in zip(compare_columns, row) if changed) for row in differs]
+        frame.insert(0, CHANGED_FIELDS_COLUMN, fields)
+        frame.insert(0, CHANGE_COLUMN, CHANGE_MODIFIED)
+        parts.append(frame)
+
+    if parts:
+        delta = pd.concat(parts)
+        delta = delta.sort_index(kind='stable')
+    else:
+        delta = pd.DataFrame(columns=[CHANGE_COLUMN, CHANGED_FIELDS_COLUMN] + list(current.columns))
+
+    if not removed_rows.empty:
+        frame = previous.iloc[removed_rows['previous_pos'].astype(int)]
+        frame = frame.reindex(columns=current.columns).copy()
+        frame.insert(0, CHANGED_FIELDS_COLUMN, '')
+        frame.insert(0, CHANGE_COLUMN, CHANGE_REMOVED)
+        delta = pd.concat([delta, frame]) if not delta.empty else frame
+
+    return delta.reset_index(drop=True)
+
+
+def write_delta_workbooks(delta: pd.DataFrame, column_name: str, output_folder: str, base_name: str,
+                          multi_valued: bool = False, timestamp: Optional[str] = None) -> Dict[str, int]:
+    """
+    依審查者輸出異動活頁簿（docProps 時間固定為 timestamp，相同輸入產生相同位元組）
+
+    Returns:
+        {審查者: 異動列數}
+    """
+    separators = DEFAULT_SEPARATORS if multi_valued else NO_SPLIT
+    incidence = build_reviewer_incidence(delta, column_name, separators=separators)
+    counts = {}
+    for reviewer, positions in incidence.groupby('reviewer', sort=False)['row']:
+        folder_name = sanitize_folder_name(reviewer)
+        reviewer_folder = os.path.join(output_folder, folder_name)
+        os.makedirs(reviewer_folder, exist_ok=True)
+        output_path = os.path.join(reviewer_folder, f"{base_name} - {folder_name} - 異動.xlsx")
+        rows = delta.iloc[positions.to_numpy()]
+        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+            rows.to_excel(writer, index=False, sheet_name='異動')
+            ws = writer.sheets['異動']
+            ws.freeze_panes = 'A2'
+            ws.auto_filter.ref = ws.dimensions
+        normalize_package(output_path, timestamp)
+        counts[reviewer] = len(rows)
+    return counts
+
+
+def process_cycle_delta(current_path: str, previous_path: str, key_column: str, column_name: str,
+                        output_folder: str, multi_valued: bool = False,
+                        ignore_columns: Optional[List[str]] = None) -> Optional[Dict]:
+    """
+    期間異動主函數：讀取兩期母檔、比對並輸出每位審查者的異動活頁簿
+
+    Returns:
+        統計資料（new、modified、removed、reviewers）；失敗時回傳 None
+    """
+    print(f"📁 本期母檔: {os.path.basename(current_path)}")
+    print(f"📁 上期母檔: {os.path.basename(previous_path)}")
+    print(f"🔑 鍵欄位: {key_column}")
+    print(f"📊 審查者欄位: {column_name}")
+    print("=" * 50)
+
+    for path in (current_path, previous_path):
+        if not os.path.exists(path):
+            print(f"❌ 找不到檔案: {path}")
+            return None
+
+    try:
+        current = pd.read_excel(current_path, engine='openpyxl')
+        previous = pd.read_excel(previous_path, engine='openpyxl')
+        if column_name not in current.columns:
+            print(f"❌ 找不到欄位 '{column_name}'")
+            return None
+
+        delta = compute_cycle_delta(current, previous, key_column, ignore_columns)
+        kinds = delta[CHANGE_COLUMN].value_counts()
+        stats = {
+            'new': int(kinds.get(CHANGE_NEW, 0)),
+            'modified': int(kinds.get(CHANGE_MODIFIED, 0)),
+            'removed': int(kinds.get(CHANGE_REMOVED, 0)),
+            'unchanged': len(current) - int(kinds.get(CHANGE_NEW, 0)) - int(kinds.get(CHANGE_MODIFIED, 0)),
+        }
+        print(f"✓ 新增 {stats['new']} 列、變更 {stats['modified']} 列、移除 {stats['removed']} 列、"
+              f"未變動 {stats['unchanged']} 列")
+
+        base_name = os.path.splitext(os.path.basename(current_path))[0]
+        counts = write_delta_workbooks(delta, column_name, output_folder, base_name, multi_valued,
+                                       package_timestamp(current_path))
+        stats['reviewers'] = counts
+        for reviewer, count in counts.items():
+            print(f"📝 {reviewer}: {count} 列異動")
+
+        print("\n" + "=" * 50)
+        print(f"✅ 已輸出 {len(counts)} 位審查者的異動檔")
+        print(f"📁 輸出位置: {output_folder}")
+        return stats
+
+    except Exception as e:
+        print(f"\n❌ 發生錯誤: {str(e)}")
+        return None
+
+
+def main():
+    """主程式"""
+    multi_valued = '--multi-valued' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--multi-valued']
+    if len(args) < 4:
+        print("使用方式：python excel_delta.py <本期母檔> <上期母檔> <鍵欄位> <審查者欄位> [輸出資料夾] [--multi-valued]")
+        print("範例：python excel_delta.py 2025Q3.xlsx 2025Q2.xlsx User_ID Reviewer ./delta")
+        sys.exit(1)
+
+    current_path, previous_path, key_column, column_name = args[:4]
+    output_folder = args[4] if len(args) > 4 else os.path.join(os.path.dirname(current_path) or '.', '異動')
+    stats = process_cycle_delta(current_path, previous_path, key_column, column_name, output_folder, multi_valued)
+    sys.exit(0 if stats is not None else 1)
+
+
+if __name__ == "__main__":
+    main()
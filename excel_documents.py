@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+附件文件分發 - 同一份說明文件放進每位審查者資料夾時避免重複寫入
+
+每位審查者資料夾都需要相同的 Word/PDF 說明文件。逐一 shutil.copy2 時，
+800 位審查者 × 60 MB 就是 48 GB 的寫入量。這裡依檔案系統能力選擇：
+1. reflink（Linux FICLONE / macOS clonefile）：共用資料區塊，寫入時才複製，審查者修改互不影響
+2. 硬連結：同一個檔案的多個名稱，任何一處修改會反映到所有資料夾（只適合唯讀文件）
+3. 一般複製（Linux 上優先使用 copy_file_range，由核心直接複製）
+
+DocumentDistributor 把來源文件只 glob 一次，再由有上限的執行緒池分發到各資料夾；
+目的檔大小與修改時間都相同時直接略過，重跑時不會再寫一次。
+"""
+
+import ctypes
+import ctypes.util
+import glob
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 分發方式：auto 先嘗試 reflink 再一般複製；hardlink 需明確指定
+LINK_MODES = ('copy', 'auto', 'reflink', 'hardlink')
+# copy_selected_documents 使用的文件類型
+WORD_PATTERNS = ('*.docx', '*.doc')
+PDF_PATTERNS = ('*.pdf',)
+# Linux ioctl FICLONE = _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+_clonefile = None
+if sys.platform == 'darwin':
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        _clonefile = _libc.clonefile
+        _clonefile.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+        _clonefile.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _clonefile = None
+
+
+def _remove_existing(dst: str) -> None:
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+
+def reflink_file(src: str, dst: str) -> bool:
+    """
+    以 reflink 建立共用資料區塊的副本
+
+    Returns:
+        是否成功；檔案系統不支援時回傳 False 且不留下目的檔
+    """
+    if _clonefile is not None:
+        _remove_existing(dst)
+        if _clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0:
+            return True
+        return False
+
+    try:
+        import fcntl
+    except ImportError:  # Windows 沒有 FICLONE
+        return False
+
+    _remove_existing(dst)
+    try:
+        with open(src, 'rb') as source, open(dst, 'wb') as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def copy_file(src: str, dst: str) -> None:
+    """一般複製：Linux 上以 copy_file_range 由核心複製資料，其他平台使用 shutil.copy2"""
+    if not hasattr(os, 'copy_file_range'):
+        shutil.copy2(src, dst)
+        return
+    _remove_existing(dst)
+    try:
+        with open(src, 'rb') as source, open(dst, 'wb') as target:
+            remaining = os.fstat(source.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        if remaining > 0:
+            raise OSError('copy_file_range ended early')
+    except OSError:
+        shutil.copy2(src, dst)
+        return
+    shutil.copystat(src, dst)
+
+
+def resolve_documents(source_dir: str, patterns: Iterable[str]) -> List[str]:
+    """
+    依樣式 glob 來源資料夾一次，回傳排序後、不重複的檔案清單
+    """
+    files = []
+    for pattern in patterns:
+        for file_path in sorted(glob.glob(os.path.join(source_dir, pattern))):
+            if os.path.isfile(file_path) and file_path not in files:
+                files.append(file_path)
+    return files
+
+
+def is_up_to_date(src: str, dst: str, mode: str = 'copy') -> bool:
+    """
+    目的檔是否已與來源相同（大小與修改時間一致）
+
+    目的檔與來源為同一檔案（硬連結）時，只有 hardlink 模式視為已完成；
+    其他模式要換成獨立副本。
+    """
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    src_stat = os.stat(src)
+    if os.path.samestat(src_stat, dst_stat):
+        return mode == 'hardlink'
+    return (src_stat.st_size == dst_stat.st_size
+            and abs(src_stat.st_mtime_ns - dst_stat.st_mtime_ns) < 1_000_000)
+
+
+def distribute_file(src: str, dst: str, mode: str = 'auto') -> Tuple[str, int]:
+    """
+    依指定方式把文件放到目的地
+
+    Args:
+        src: 來源檔案
+        dst: 目的檔案路徑
+        mode: 'copy'、'auto'（reflink，失敗時複製）、'reflink'（同 auto）、'hardlink'（硬連結，失敗時複製）
+
+    Returns:
+        (實際使用的方式 'reflink' / 'hardlink' / 'copy', 節省的寫入位元組數)
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(f"不支援的分發方式: {mode}（可用: {', '.join(LINK_MODES)}）")
+
+    size = os.path.getsize(src)
+    if mode in ('auto', 'reflink') and reflink_file(src, dst):
+        return 'reflink', size
+    if mode == 'hardlink':
+        try:
+            _remove_existing(dst)
+            os.link(src, dst)
+            return 'hardlink', size
+        except OSError:
+            pass
+    copy_file(src, dst)
+    return 'copy', 0
+
+
+class DistributionStats:
+    """累計分發方式與節省的位元組數"""
+
+    def __init__(self):
+        self.methods: Dict[str, int] = {'reflink': 0, 'hardlink': 0, 'copy': 0, 'skipped': 0}
+        self.bytes_saved = 0
+        self.bytes_total = 0
+        self._lock = threading.Lock()
+
+    def record(self, method: str, size: int, saved: int) -> None:
+        with self._lock:
+            self.methods[method] = self.methods.get(method, 0) + 1
+            self.bytes_total += size
+            self.bytes_saved += saved
+
+    def summary(self) -> str:
+        counts = '、'.join(f"{method} {count}" for method, count in self.methods.items() if count)
+        return f"{counts or '無檔案'}，節省寫入 {self.bytes_saved:,} / {self.bytes_total:,} bytes"
+
+
+def distribute_files(files, dest_dir: str, mode: str = 'copy',
+                     stats: Optional[DistributionStats] = None) -> List[str]:
+    """
+    將多個檔案分發到目的資料夾（檔名不變）
+
+    Returns:
+        已分發的檔名清單
+    """
+    for file_path in files:
+        _distribute_one(file_path, os.path.join(dest_dir, os.path.basename(file_path)), mode, stats)
+    return [os.path.basename(file_path) for file_path in files]
+
+
+def _distribute_one(file_path: str, dest_path: str, mode: str, stats: Optional[DistributionStats]) -> str:
+    if is_up_to_date(file_path, dest_path, mode):
+        size = os.path.getsize(file_path)
+        method, saved = 'skipped', size
+    else:
+        if os.path.exists(dest_path) and os.path.samefile(file_path, dest_path):
+            # 上次以硬連結分發：先移除，避免複製到來源檔本身
+            os.remove(dest_path)
+        if mode == 'copy':
+            # shutil.copy2 在 Linux/macOS/Windows 會使用 sendfile / fcopyfile / CopyFile2 等零複製路徑
+            shutil.copy2(file_path, dest_path)
+            method, saved = 'copy', 0
+        else:
+            method, saved = distribute_file(file_path, dest_path, mode)
+        size = os.path.getsize(dest_path)
+    if stats is not None:
+        stats.record(method, size, saved)
+    return method
+
+
+class DocumentDistributor:
+    """
+    文件分發階段：來源檔案清單只解析一次，複製工作交給有上限的執行緒池
+
+    用法：
+        with DocumentDistributor(files, mode='auto', workers=4) as distributor:
+            for folder in reviewer_folders:
+                distributor.submit(folder)
+        print(distributor.stats.summary())
+
+    submit 立即回傳檔名清單，複製在背景進行；離開 with 區塊時等待全部完成，
+    個別檔案的錯誤收集在 errors（[(目的路徑, 錯誤訊息)]），不會中斷其他資料夾。
+    """
+
+    def __init__(self, files: Iterable[str], mode: str = 'copy', workers: int = 4,
+                 stats: Optional[DistributionStats] = None):
+        if mode not in LINK_MODES:
+            raise ValueError(f"不支援的分發方式: {mode}（可用: {', '.join(LINK_MODES)}）")
+        self.files = list(files)
+        self.mode = mode
+        self.stats = stats if stats is not None else DistributionStats()
+        self.errors: List[Tuple[str, str]] = []
+        workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='documents')
+        # 限制排隊中的工作數，呼叫端寫活頁簿的速度不會把記憶體塞滿
+        self._slots = threading.BoundedSemaphore(workers * 4)
+        self._lock = threading.Lock()
+
+    def submit(self, dest_dir: str) -> List[str]:
+        """把所有文件排入分發到 dest_dir 的工作，回傳檔名清單"""
+        for file_path in self.files:
+            dest_path = os.path.join(dest_dir, os.path.basename(file_path))
+            self._slots.acquire()
+            try:
+                self._pool.submit(self._run, file_path, dest_path)
+            except BaseException:
+                self._slots.release()
+                raise
+        return [os.path.basename(file_path) for file_path in self.files]
+
+    def _run(self, file_path: str, dest_path: str) -> None:
+        try:
+            _distribute_one(file_path, dest_path, self.mode, self.stats)
+        except OSError as e:
+            with self._lock:
+                self.errors.append((dest_path, str(e)))
+        finally:
+            self._slots.release()
+
+    def close(self) -> DistributionStats:
+        """等待所有分發工作完成"""
+        self._pool.shutdown(wait=True)
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
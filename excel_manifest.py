@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+輸出清單 - 分割結果的機器可讀紀錄
+
+分割完成後寫出 output_manifest.json 與 output_manifest.csv，每位審查者（與主管彙總）一筆：
+資料夾、檔名、資料列數、位元組數、內容雜湊、Email、附件文件與處理狀態。
+上傳、分享、Power Automate 與稽核工具直接讀取這份清單，不必重新走訪資料夾或讀取母檔。
+
+路徑一律相對於輸出資料夾並使用 /，清單本身不含執行時間，相同輸入產生相同內容。
+"""
+
+import csv
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+OUTPUT_MANIFEST_NAME = 'output_manifest'
+OUTPUT_MANIFEST_COLUMNS = ['reviewer', 'kind', 'folder', 'filename', 'rows', 'bytes', 'sha256', 'email',
+                           'documents', 'status', 'error']
+
+# 處理狀態
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+STATUS_INVALID = 'invalid'
+
+
+def file_sha256(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """計算檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_entry(output_root: str, reviewer, folder_path: Optional[str], filename: Optional[str],
+                   rows: Optional[int], kind: str = 'reviewer', email: str = '',
+                   documents: Iterable[str] = (), status: str = STATUS_OK, error: str = '') -> Dict:
+    """
+    建立一筆輸出清單紀錄（檔案存在時計算位元組數與雜湊）
+
+    Args:
+        output_root: 輸出資料夾（folder 欄位相對於此）
+        reviewer: 審查者或主管名稱
+        folder_path: 輸出檔所在資料夾
+        filename: 輸出檔名
+        rows: 分派的資料列數
+        kind: 'reviewer' 或 'rollup'（主管彙總）
+    """
+    path = os.path.join(folder_path, filename) if folder_path and filename else None
+    exists = path is not None and os.path.exists(path)
+    folder = os.path.relpath(folder_path, output_root).replace(os.sep, '/') if folder_path else ''
+    return {
+        'reviewer': str(reviewer),
+        'kind': kind,
+        'folder': folder,
+        'filename': filename or '',
+        'rows': int(rows) if rows is not None else None,
+        'bytes': os.path.getsize(path) if exists else None,
+        'sha256': file_sha256(path) if exists else '',
+        'email': email or '',
+        'documents': list(documents),
+        'status': status,
+        'error': error or '',
+    }
+
+
+def write_output_manifest(entries: List[Dict], output_folder: str, source: Optional[str] = None,
+                          column: Optional[str] = None, method: Optional[str] = None) -> Tuple[str, str]:
+    """
+    寫出 output_manifest.json 與 output_manifest.csv
+
+    Returns:
+        (JSON 路徑, CSV 路徑)
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    totals = {
+        'files': sum(1 for entry in entries if entry['status'] == STATUS_OK),
+        'failed': sum(1 for entry in entries if entry['status'] != STATUS_OK),
+        'rows': sum(entry['rows'] or 0 for entry in entries if entry['kind'] == 'reviewer'),
+        'bytes': sum(entry['bytes'] or 0 for entry in entries),
+    }
+    document = {'source': source, 'column': column, 'method': method, 'totals': totals, 'files': entries}
+
+    json_path = os.path.join(output_folder, f"{OUTPUT_MANIFEST_NAME}.json")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+
+    csv_path = os.path.join(output_folder, f"{OUTPUT_MANIFEST_NAME}.csv")
+    with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_MANIFEST_COLUMNS)
+        writer.writeheader()
+        for entry in entries:
+            writer.writerow({**entry, 'documents': '; '.join(entry['documents']),
+                             'rows': '' if entry['rows'] is None else entry['rows'],
+                             'bytes': '' if entry['bytes'] is None else entry['bytes']})
+    return json_path, csv_path
+
+
+def load_output_manifest(path: str) -> Dict:
+    """
+    讀取輸出清單（可傳入輸出資料夾或 output_manifest.json 路徑）
+
+    Returns:
+        {'source', 'column', 'method', 'totals', 'files': [紀錄]}
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, f"{OUTPUT_MANIFEST_NAME}.json")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
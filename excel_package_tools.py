@@ -0,0 +1,920 @@
+#!/usr/bin/env python3
+"""
+Excel 封裝層工具 - 直接處理 .xlsx/.xlsm 的 ZIP 部件
+
+不經過 openpyxl 重新序列化整本活頁簿，用於分割後的輸出檔後處理：
+1. 依實際引用重建共用字串表 (sharedStrings.xml)
+2. 依實際引用重建儲存格樣式表 (cellXfs)
+3. 移除縮圖與沒有任何關聯指向的孤立部件
+4. 移除樞紐分析表快取記錄（pivotCacheRecords）與欄位項目（sharedItems），改為開啟時重新整理
+5. 只改寫資料工作表 XML 的隱藏列快速路徑（.xlsm 的 vbaProject.bin、簽章、customUI 原封不動）
+6. 直接串流讀取作用中工作表的資料列、隱藏狀態與自動篩選條件（合併審查結果時使用，不建立 openpyxl 物件）
+7. 資料列指紋：分割時寫入隱藏的列編號與原始值雜湊，之後不必載入母檔即可判斷哪些列被修改
+8. 穩定輸出：固定 ZIP 項目時間、部件順序與 docProps 時間，相同輸入產生逐位元組相同的檔案
+"""
+
+import datetime
+import hashlib
+import math
+import numbers
+import os
+import re
+import posixpath
+import tempfile
+import zipfile
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote
+from xml.sax.saxutils import escape, unescape
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import to_excel
+
+CONTENT_TYPES_PART = '[Content_Types].xml'
+PACKAGE_RELS_PART = '_rels/.rels'
+CORE_PROPERTIES_PART = 'docProps/core.xml'
+SHARED_STRINGS_PART = 'xl/sharedStrings.xml'
+STYLES_PART = 'xl/styles.xml'
+THUMBNAIL_REL_TYPE = 'http://schemas.openxmlformats.org/package/2006/relationships/metadata/thumbnail'
+OFFICE_DOCUMENT_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+# 分割時附加的隱藏欄位：母檔列號與原始列值雜湊
+ROW_ID_COLUMN = '_row_id'
+FINGERPRINT_COLUMN = '_fingerprint'
+PIVOT_RECORDS_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/pivotCacheRecords'
+
+_WORKSHEET_PART_RE = re.compile(r'^xl/worksheets/[^/]+\.xml$')
+_RELATIONSHIP_RE = re.compile(r'<Relationship\b[^>]*?/>|<Relationship\b[^>]*?>.*?</Relationship>', re.S)
+_ATTR_RE = re.compile(r'([\w:]+)="([^"]*)"')
+_CELL_RE = re.compile(r'<c\b([^>]*?)(/>|>(.*?)</c>)', re.S)
+_CELL_STYLE_ATTR_RE = re.compile(r'(\s)s="(\d+)"')
+_VALUE_RE = re.compile(r'<v>\s*(\d+)\s*</v>')
+_ROW_STYLE_RE = re.compile(r'(<row\b[^>]*?\s)s="(\d+)"')
+_COL_STYLE_RE = re.compile(r'(<col\b[^>]*?\s)style="(\d+)"')
+_SI_RE = re.compile(r'<si\s*/>|<si>.*?</si>', re.S)
+_SST_OPEN_RE = re.compile(r'<sst\b[^>]*>')
+_CELL_XFS_RE = re.compile(r'(<cellXfs\b[^>]*>)(.*?)(</cellXfs>)', re.S)
+_XF_RE = re.compile(r'<xf\b[^>]*?(?:/>|>.*?</xf>)', re.S)
+_PIVOT_CACHE_PART_RE = re.compile(r'^xl/pivotCache/pivotCacheDefinition[^/]*\.xml$')
+_PIVOT_CACHE_OPEN_RE = re.compile(r'<pivotCacheDefinition\b[^>]*>')
+_PREFIXED_ID_ATTR_RE = re.compile(r'\s\w+:id="[^"]*"')
+_PIVOT_TABLE_PART_RE = re.compile(r'^xl/pivotTables/[^/]+\.xml$')
+_SHARED_ITEMS_RE = re.compile(r'<sharedItems\b([^>]*?)(?:/>|>.*?</sharedItems>)', re.S)
+_SHARED_ITEMS_VALUE_ATTR_RE = re.compile(r'\s(?:count|minValue|maxValue|minDate|maxDate)="[^"]*"')
+_RECORD_COUNT_ATTR_RE = re.compile(r'\srecordCount="[^"]*"')
+_PIVOT_ITEMS_RE = re.compile(r'<items\b[^>]*>(.*?)</items>', re.S)
+_PIVOT_ITEM_RE = re.compile(r'<item\b[^>]*?/>|<item\b[^>]*?>.*?</item>', re.S)
+_PIVOT_AXIS_ITEMS_RE = re.compile(r'<(rowItems|colItems)\b[^>]*?(?:/>|>.*?</\1>)', re.S)
+_PAGE_FIELD_ITEM_RE = re.compile(r'(<pageField\b[^>]*?)\sitem="\d+"')
+_ROW_RE = re.compile(r'<row\b([^>]*?)(/>|>(.*?)</row>)', re.S)
+_ROW_NUMBER_RE = re.compile(r'\sr="(\d+)"')
+_CELL_REF_RE = re.compile(r'\sr="([A-Z]+)\d+"')
+_TEXT_RE = re.compile(r'<t\b[^>]*>(.*?)</t>|<t\b[^>]*/>', re.S)
+_PHONETIC_RE = re.compile(r'<rPh\b.*?</rPh>', re.S)
+_FORMULA_VALUE_RE = re.compile(r'<v>.*?</v>|<v/>', re.S)
+_DIMENSION_RE = re.compile(r'<dimension\b[^>]*\sref="[A-Z]*\d*:?([A-Z]+)\d+"')
+_AUTOFILTER_RE = re.compile(r'<autoFilter\b[^>]*?(?:/>|>.*?</autoFilter>)', re.S)
+_AUTOFILTER_REF_RE = re.compile(r'<autoFilter\b[^>]*\sref="\$?([A-Z]+)')
+_FILTER_COLUMN_RE = re.compile(r'<filterColumn\b([^>]*?)(?:/>|>(.*?)</filterColumn>)', re.S)
+_FILTER_VALUE_RE = re.compile(r'<filter\b[^>]*\sval="([^"]*)"')
+_SHEET_DATA_END_RE = re.compile(r'</sheetData>|<sheetData\s*/>')
+_BEFORE_AUTOFILTER_RE = re.compile(
+    r'\s*<(sheetCalcPr|sheetProtection|protectedRanges|scenarios)\b[^>]*?(?:/>|>.*?</\1>)', re.S)
+_XML_ENTITIES = {'&quot;': '"', '&apos;': "'"}
+_CORE_DATE_RE = re.compile(r'(<dcterms:(created|modified)\b[^>]*>)([^<]*)(</dcterms:\2>)')
+
+# ZIP 格式可表示的最早時間；所有部件使用同一個時間，輸出不隨執行時間改變
+FIXED_ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+# 來源沒有 docProps 時間時使用的固定值
+DEFAULT_PACKAGE_TIMESTAMP = '1980-01-01T00:00:00Z'
+
+
+def read_package(file_path: str) -> "OrderedDict[str, bytes]":
+    """讀取整個 ZIP 封裝，保留原本的部件順序"""
+    parts = OrderedDict()
+    with zipfile.ZipFile(file_path) as zf:
+        for info in zf.infolist():
+            parts[info.filename] = zf.read(info)
+    return parts
+
+
+def write_package(file_path: str, parts: "OrderedDict[str, bytes]") -> int:
+    """
+    寫回 ZIP 封裝（先寫暫存檔再取代，避免留下寫到一半的檔案）
+
+    Returns:
+        寫入的位元組數
+    """
+    target_dir = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=target_dir)
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for name, data in parts.items():
+                zf.writestr(_stable_zip_info(name), data)
+        replace_file(temp_path, file_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return os.path.getsize(file_path)
+
+
+def _default_file_mode() -> int:
+    """一般新建檔案的權限（0o666 扣除 umask）"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# 匯入時讀取一次：os.umask 只能以設定的方式讀取，在多執行緒寫檔時呼叫會短暫影響其他執行緒
+DEFAULT_FILE_MODE = _default_file_mode()
+
+
+def replace_file(temp_path: str, file_path: str) -> None:
+    """
+    以暫存檔原子取代目的檔
+
+    mkstemp 建立的暫存檔權限為 0600，os.replace 會沿用；這裡先改為目的檔原本的權限
+    （目的檔不存在時使用一般新建檔案的權限），避免輸出檔在共用資料夾中變成只有自己能讀
+    """
+    try:
+        mode = os.stat(file_path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = DEFAULT_FILE_MODE
+    os.chmod(temp_path, mode)
+    os.replace(temp_path, file_path)
+
+
+def _stable_zip_info(name: str) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=FIXED_ZIP_TIMESTAMP)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.create_system = 3
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def canonical_part_order(names: Iterable[str]) -> List[str]:
+    """[Content_Types].xml、_rels/.rels 在前，其餘部件依名稱排序"""
+    priority = {CONTENT_TYPES_PART: 0, PACKAGE_RELS_PART: 1}
+    return sorted(names, key=lambda name: (priority.get(name, 2), name))
+
+
+def package_timestamp(file_path: str) -> str:
+    """
+    讀取活頁簿 docProps/core.xml 的修改時間（沒有時取建立時間）
+
+    輸出檔以母檔的這個時間作為自己的 docProps 時間，只有母檔內容改變時才會不同。
+    """
+    try:
+        with zipfile.ZipFile(file_path) as zf:
+            core = zf.read(CORE_PROPERTIES_PART).decode('utf-8')
+    except (KeyError, OSError, zipfile.BadZipFile):
+        return DEFAULT_PACKAGE_TIMESTAMP
+    dates = {match.group(2): match.group(3).strip() for match in _CORE_DATE_RE.finditer(core)}
+    return dates.get('modified') or dates.get('created') or DEFAULT_PACKAGE_TIMESTAMP
+
+
+def normalize_package(file_path: str, timestamp: Optional[str] = None) -> int:
+    """
+    讓 openpyxl / pandas 寫出的活頁簿位元組穩定
+
+    openpyxl 每次儲存都把 docProps 的建立/修改時間與 ZIP 項目時間設為當下，
+    同一份輸入兩次分割的結果便不相同，無法以內容雜湊判斷「沒有變更」。
+    這裡將 docProps 的 created / modified 設為 timestamp、部件依固定順序排列、
+    ZIP 項目使用固定時間與屬性後寫回。
+
+    Args:
+        file_path: 活頁簿路徑（就地改寫）
+        timestamp: W3CDTF 時間字串，通常為 package_timestamp(母檔)；未提供時使用固定值
+
+    Returns:
+        寫入的位元組數
+    """
+    timestamp = timestamp or DEFAULT_PACKAGE_TIMESTAMP
+    parts = read_package(file_path)
+    if CORE_PROPERTIES_PART in parts:
+        core = parts[CORE_PROPERTIES_PART].decode('utf-8')
+        core = _CORE_DATE_RE.sub(lambda m: f"{m.group(1)}{timestamp}{m.group(4)}", core)
+        parts[CORE_PROPERTIES_PART] = core.encode('utf-8')
+    ordered = OrderedDict((name, parts[name]) for name in canonical_part_order(parts))
+    return write_package(file_path, ordered)
+
+
+def worksheet_parts(parts: Dict[str, bytes]) -> List[str]:
+    """列出封裝中的工作表部件"""
+    return [name for name in parts if _WORKSHEET_PART_RE.match(name)]
+
+
+def rels_part_for(part_name: str) -> str:
+    """取得部件對應的 .rels 路徑（空字串代表封裝根目錄）"""
+    directory, base = posixpath.split(part_name)
+    return posixpath.join(directory, '_rels', f"{base}.rels")
+
+
+def resolve_target(source_part: str, target: str) -> str:
+    """將關聯中的 Target 轉成封裝內的部件名稱"""
+    target = unquote(target)
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_part), target))
+
+
+def parse_relationships(rels_xml: bytes) -> List[Dict[str, str]]:
+    """解析 .rels 內容，回傳每個 Relationship 的屬性"""
+    text = rels_xml.decode('utf-8')
+    return [dict(_ATTR_RE.findall(m.group(0))) for m in _RELATIONSHIP_RE.finditer(text)]
+
+
+def find_reachable_parts(parts: Dict[str, bytes]) -> Set[str]:
+    """從封裝根目錄沿著所有內部關聯找出可到達的部件（含其 .rels）"""
+    reachable = {CONTENT_TYPES_PART}
+    pending = ['']
+    visited = set()
+    while pending:
+        source = pending.pop()
+        if source in visited:
+            continue
+        visited.add(source)
+        rels_name = rels_part_for(source)
+        if rels_name not in parts:
+            continue
+        reachable.add(rels_name)
+        for rel in parse_relationships(parts[rels_name]):
+            if rel.get('TargetMode') == 'External' or 'Target' not in rel:
+                continue
+            target = resolve_target(source, rel['Target'])
+            if target in parts:
+                reachable.add(target)
+                pending.append(target)
+    return reachable
+
+
+def remove_content_type_overrides(parts: Dict[str, bytes], removed: List[str]):
+    """從 [Content_Types].xml 移除已刪除部件的 Override"""
+    if not removed or CONTENT_TYPES_PART not in parts:
+        return
+    text = parts[CONTENT_TYPES_PART].decode('utf-8')
+    for name in removed:
+        pattern = r'<Override\b[^>]*PartName="/%s"[^>]*/>' % re.escape(name)
+        text = re.sub(pattern, '', text)
+    parts[CONTENT_TYPES_PART] = text.encode('utf-8')
+
+
+def drop_relationships(parts: Dict[str, bytes], source_part: str, rel_type: str) -> List[str]:
+    """移除指定類型的關聯，回傳原本指向的部件名稱"""
+    rels_name = rels_part_for(source_part)
+    if rels_name not in parts:
+        return []
+    text = parts[rels_name].decode('utf-8')
+    targets = []
+
+    def _drop(match):
+        rel = dict(_ATTR_RE.findall(match.group(0)))
+        if rel.get('Type') != rel_type:
+            return match.group(0)
+        if rel.get('TargetMode') != 'External' and 'Target' in rel:
+            targets.append(resolve_target(source_part, rel['Target']))
+        return ''
+
+    parts[rels_name] = _RELATIONSHIP_RE.sub(_drop, text).encode('utf-8')
+    return targets
+
+
+def _collect_sheet_references(xml: str) -> Tuple[Set[int], Set[int], int]:
+    """收集工作表引用的共用字串索引、樣式索引，以及共用字串儲存格總數"""
+    strings, styles = set(), set()
+    string_cells = 0
+    for match in _CELL_RE.finditer(xml):
+        attrs = dict(_ATTR_RE.findall(match.group(1)))
+        if 's' in attrs:
+            styles.add(int(attrs['s']))
+        if attrs.get('t') == 's' and match.group(3):
+            value = _VALUE_RE.search(match.group(3))
+            if value:
+                strings.add(int(value.group(1)))
+                string_cells += 1
+    for match in _ROW_STYLE_RE.finditer(xml):
+        styles.add(int(match.group(2)))
+    for match in _COL_STYLE_RE.finditer(xml):
+        styles.add(int(match.group(2)))
+    return strings, styles, string_cells
+
+
+def _remap_sheet(xml: str, string_map: Optional[Dict[int, int]], style_map: Optional[Dict[int, int]]) -> str:
+    """依新的索引對照表改寫工作表中的儲存格、列與欄引用"""
+
+    def _cell(match):
+        attrs, closing, body = match.group(1), match.group(2), match.group(3)
+        is_shared = 't="s"' in attrs
+        if style_map:
+            attrs = _CELL_STYLE_ATTR_RE.sub(
+                lambda m: f'{m.group(1)}s="{style_map.get(int(m.group(2)), 0)}"', attrs)
+        if closing == '/>':
+            return f'<c{attrs}/>'
+        if string_map and is_shared and body:
+            body = _VALUE_RE.sub(lambda m: f'<v>{string_map.get(int(m.group(1)), 0)}</v>', body, count=1)
+        return f'<c{attrs}>{body}</c>'
+
+    xml = _CELL_RE.sub(_cell, xml)
+    if style_map:
+        xml = _ROW_STYLE_RE.sub(lambda m: f'{m.group(1)}s="{style_map.get(int(m.group(2)), 0)}"', xml)
+        xml = _COL_STYLE_RE.sub(lambda m: f'{m.group(1)}style="{style_map.get(int(m.group(2)), 0)}"', xml)
+    return xml
+
+
+def _set_xml_attr(tag: str, name: str, value) -> str:
+    """設定（或新增）開始標籤上的屬性"""
+    pattern = re.compile(r'(\s%s=")[^"]*(")' % re.escape(name))
+    if pattern.search(tag):
+        return pattern.sub(lambda m: f'{m.group(1)}{value}{m.group(2)}', tag, count=1)
+    closing = '/>' if tag.endswith('/>') else '>'
+    return f'{tag[:-len(closing)]} {name}="{value}"{closing}'
+
+
+def _slim_shared_strings(parts: Dict[str, bytes], referenced: Set[int], string_cells: int) -> Optional[Dict[int, int]]:
+    """只保留被引用的共用字串，回傳舊索引→新索引（無需變更時回傳 None）"""
+    if SHARED_STRINGS_PART not in parts:
+        return None
+    text = parts[SHARED_STRINGS_PART].decode('utf-8')
+    items = list(_SI_RE.finditer(text))
+    if not items:
+        return None
+    keep = sorted(i for i in referenced if i < len(items))
+    if len(keep) == len(items):
+        return None
+
+    head, tail = text[:items[0].start()], text[items[-1].end():]
+    open_tag = _SST_OPEN_RE.search(head)
+    if open_tag:
+        new_tag = _set_xml_attr(open_tag.group(0), 'count', string_cells)
+        new_tag = _set_xml_attr(new_tag, 'uniqueCount', len(keep))
+        head = head[:open_tag.start()] + new_tag + head[open_tag.end():]
+    body = ''.join(items[i].group(0) for i in keep)
+    parts[SHARED_STRINGS_PART] = (head + body + tail).encode('utf-8')
+    return {old: new for new, old in enumerate(keep)}
+
+
+def _slim_cell_xfs(parts: Dict[str, bytes], referenced: Set[int]) -> Optional[Dict[int, int]]:
+    """只保留被引用的 cellXfs（索引 0 為預設樣式，一律保留）"""
+    if STYLES_PART not in parts:
+        return None
+    text = parts[STYLES_PART].decode('utf-8')
+    block = _CELL_XFS_RE.search(text)
+    if not block:
+        return None
+    xfs = _XF_RE.findall(block.group(2))
+    keep = sorted({0} | {i for i in referenced if i < len(xfs)})
+    if len(keep) >= len(xfs):
+        return None
+
+    open_tag = _set_xml_attr(block.group(1), 'count', len(keep))
+    new_block = open_tag + ''.join(xfs[i] for i in keep) + block.group(3)
+    parts[STYLES_PART] = (text[:block.start()] + new_block + text[block.end():]).encode('utf-8')
+    return {old: new for new, old in enumerate(keep)}
+
+
+def prune_shared_strings(parts: Dict[str, bytes]) -> int:
+    """
+    從共用字串表移除所有工作表都不再引用的字串，並改寫工作表中的索引
+
+    Returns:
+        移除的字串數
+    """
+    sheets = worksheet_parts(parts)
+    sheet_xml = {name: parts[name].decode('utf-8') for name in sheets}
+    strings = set()
+    string_cells = 0
+    for xml in sheet_xml.values():
+        sheet_strings, _, sheet_string_cells = _collect_sheet_references(xml)
+        strings |= sheet_strings
+        string_cells += sheet_string_cells
+    before = len(_SI_RE.findall(parts[SHARED_STRINGS_PART].decode('utf-8'))) if SHARED_STRINGS_PART in parts else 0
+    string_map = _slim_shared_strings(parts, strings, string_cells)
+    if string_map is None:
+        return 0
+    for name in sheets:
+        parts[name] = _remap_sheet(sheet_xml[name], string_map, None).encode('utf-8')
+    return before - len(string_map)
+
+
+def drop_orphaned_parts(parts: Dict[str, bytes]) -> List[str]:
+    """刪除沒有任何關聯指向的部件，回傳被刪除的部件名稱"""
+    if rels_part_for('') not in parts:
+        return []
+    reachable = find_reachable_parts(parts)
+    removed = [name for name in parts if name not in reachable and not name.endswith('/')]
+    for name in removed:
+        del parts[name]
+    remove_content_type_overrides(parts, removed)
+    return removed
+
+
+def slim_workbook_package(file_path: str, drop_thumbnail: bool = True) -> Dict[str, int]:
+    """
+    輸出檔瘦身：重建共用字串表與 cellXfs，移除縮圖與孤立部件
+
+    Args:
+        file_path: 要就地瘦身的 .xlsx/.xlsm 檔案
+        drop_thumbnail: 是否移除 docProps/thumbnail 縮圖
+
+    Returns:
+        統計資訊 (bytes_before, bytes_after, strings_removed, styles_removed, parts_removed)
+    """
+    stats = {
+        'bytes_before': os.path.getsize(file_path),
+        'bytes_after': 0,
+        'strings_removed': 0,
+        'styles_removed': 0,
+        'parts_removed': 0,
+    }
+    parts = read_package(file_path)
+    sheets = worksheet_parts(parts)
+
+    sheet_xml = {}
+    strings, styles = set(), set()
+    string_cells = 0
+    for name in sheets:
+        sheet_xml[name] = parts[name].decode('utf-8')
+        sheet_strings, sheet_styles, sheet_string_cells = _collect_sheet_references(sheet_xml[name])
+        strings |= sheet_strings
+        styles |= sheet_styles
+        string_cells += sheet_string_cells
+
+    before_strings = len(_SI_RE.findall(parts[SHARED_STRINGS_PART].decode('utf-8'))) if SHARED_STRINGS_PART in parts else 0
+    string_map = _slim_shared_strings(parts, strings, string_cells)
+    if string_map is not None:
+        stats['strings_removed'] = before_strings - len(string_map)
+
+    style_block = _CELL_XFS_RE.search(parts[STYLES_PART].decode('utf-8')) if STYLES_PART in parts else None
+    before_styles = len(_XF_RE.findall(style_block.group(2))) if style_block else 0
+    style_map = _slim_cell_xfs(parts, styles)
+    if style_map is not None:
+        stats['styles_removed'] = before_styles - len(style_map)
+
+    if string_map or style_map:
+        for name in sheets:
+            parts[name] = _remap_sheet(sheet_xml[name], string_map, style_map).encode('utf-8')
+
+    if drop_thumbnail:
+        # 縮圖只由根目錄關聯引用，移除關聯後會被當成孤立部件刪除
+        drop_relationships(parts, '', THUMBNAIL_REL_TYPE)
+    stats['parts_removed'] = len(drop_orphaned_parts(parts))
+
+    stats['bytes_after'] = write_package(file_path, parts)
+    return stats
+
+
+def _empty_shared_items(match) -> str:
+    return f'<sharedItems{_SHARED_ITEMS_VALUE_ATTR_RE.sub("", match.group(1)).rstrip()} count="0"/>'
+
+
+def _reset_pivot_items(match) -> str:
+    """只保留不指向 sharedItems 的項目（例如小計 t="default"）"""
+    kept = [item for item in _PIVOT_ITEM_RE.findall(match.group(1)) if ' x="' not in item]
+    return f'<items count="{len(kept)}">{"".join(kept)}</items>' if kept else ''
+
+
+def _reset_pivot_table(xml: str) -> str:
+    """清除樞紐分析表中指向快取項目的索引（欄位項目、列/欄項目、篩選項目），開啟時由 Excel 重建"""
+    xml = _PIVOT_ITEMS_RE.sub(_reset_pivot_items, xml)
+    xml = _PIVOT_AXIS_ITEMS_RE.sub('', xml)
+    return _PAGE_FIELD_ITEM_RE.sub(r'\1', xml)
+
+
+def strip_pivot_cache_records(parts: Dict[str, bytes]) -> List[str]:
+    """
+    移除所有樞紐分析表快取的記錄部件與欄位項目，並設定開啟時重新整理
+
+    等同 Excel「隨檔案儲存來源資料」取消勾選的結果 (saveData="0", refreshOnLoad="1")。
+    欄位的 sharedItems 也是所有資料列的不重複值（其他審查者的名稱、金額等），一併清空；
+    使用這些快取的樞紐分析表的項目索引同時重設，開啟時由 Excel 依工作表內容重建。
+    工作表上樞紐分析表已顯示的儲存格值不在快取中，要等 Excel 開啟重新整理後才會更新
+
+    Returns:
+        被處理的 pivotCacheDefinition 部件名稱
+    """
+    stripped = []
+    for name in [n for n in parts if _PIVOT_CACHE_PART_RE.match(n)]:
+        drop_relationships(parts, name, PIVOT_RECORDS_REL_TYPE)
+        text = parts[name].decode('utf-8')
+        open_tag = _PIVOT_CACHE_OPEN_RE.search(text)
+        if not open_tag:
+            continue
+        new_tag = _PREFIXED_ID_ATTR_RE.sub('', open_tag.group(0))
+        new_tag = _RECORD_COUNT_ATTR_RE.sub('', new_tag)
+        new_tag = _set_xml_attr(new_tag, 'saveData', 0)
+        new_tag = _set_xml_attr(new_tag, 'refreshOnLoad', 1)
+        body = _SHARED_ITEMS_RE.sub(_empty_shared_items, text[open_tag.end():])
+        parts[name] = (text[:open_tag.start()] + new_tag + body).encode('utf-8')
+        stripped.append(name)
+
+    for name in [n for n in parts if _PIVOT_TABLE_PART_RE.match(n)]:
+        rels_name = rels_part_for(name)
+        caches = {resolve_target(name, rel['Target']) for rel in parse_relationships(parts.get(rels_name, b''))
+                  if 'Target' in rel and rel.get('TargetMode') != 'External'}
+        if caches & set(stripped):
+            parts[name] = _reset_pivot_table(parts[name].decode('utf-8')).encode('utf-8')
+    return stripped
+
+
+def strip_pivot_caches(file_path: str) -> Dict[str, int]:
+    """
+    就地移除輸出檔中的樞紐分析表快取記錄
+
+    快取記錄是整份來源資料的副本，會讓每位審查者的檔案重複帶入所有資料列，
+    也會洩漏其他審查者的資料；移除後由 Excel 在開啟時依工作表內容重新整理
+
+    Returns:
+        統計資訊 (bytes_before, bytes_after, caches_stripped, parts_removed)
+    """
+    stats = {'bytes_before': os.path.getsize(file_path)}
+    parts = read_package(file_path)
+    stripped = strip_pivot_cache_records(parts)
+    stats['caches_stripped'] = len(stripped)
+    stats['parts_removed'] = len(drop_orphaned_parts(parts)) if stripped else 0
+    stats['bytes_after'] = write_package(file_path, parts) if stripped else stats['bytes_before']
+    return stats
+
+
+def _xml_text(fragment: str) -> str:
+    """取出 <si> / <is> 片段中的純文字（忽略注音標示）"""
+    fragment = _PHONETIC_RE.sub('', fragment)
+    return ''.join(unescape(m.group(1) or '', _XML_ENTITIES) for m in _TEXT_RE.finditer(fragment))
+
+
+def load_shared_strings(parts: Dict[str, bytes]) -> List[str]:
+    """讀取共用字串表的純文字內容"""
+    if SHARED_STRINGS_PART not in parts:
+        return []
+    text = parts[SHARED_STRINGS_PART].decode('utf-8')
+    return [_xml_text(m.group(0)) for m in _SI_RE.finditer(text)]
+
+
+def _active_sheet(parts: Dict[str, bytes]) -> Tuple[str, Dict[str, str]]:
+    """依 workbookView 的 activeTab 找出作用中工作表，回傳 (活頁簿部件名稱, <sheet> 屬性)"""
+    workbook_part = 'xl/workbook.xml'
+    for rel in parse_relationships(parts.get(rels_part_for(''), b'')):
+        if rel.get('Type') == OFFICE_DOCUMENT_REL_TYPE:
+            workbook_part = resolve_target('', rel['Target'])
+    workbook_xml = parts[workbook_part].decode('utf-8')
+
+    active = re.search(r'<workbookView\b[^>]*\sactiveTab="(\d+)"', workbook_xml)
+    sheets = [dict(_ATTR_RE.findall(m.group(0))) for m in re.finditer(r'<sheet\b[^>]*/?>', workbook_xml)]
+    return workbook_part, sheets[int(active.group(1)) if active else 0]
+
+
+def active_sheet_name(file_path: str) -> str:
+    """
+    作用中工作表的名稱（等同 openpyxl 的 wb.active.title，只讀取活頁簿部件）
+
+    分割時以 openpyxl 的作用中工作表隱藏列；pd.read_excel 預設讀第一張工作表，
+    兩者不同時列號會對不上，讀取分割用的資料時應以此指定 sheet_name
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        _, sheet = _active_sheet(_LazyPackage(zf))
+    return unescape(sheet['name'], _XML_ENTITIES)
+
+
+def active_worksheet_part(parts: Dict[str, bytes]) -> str:
+    """依 workbookView 的 activeTab 找出作用中工作表的部件名稱（等同 openpyxl 的 wb.active）"""
+    workbook_part, sheet = _active_sheet(parts)
+    rel_id = next(value for key, value in sheet.items() if key.endswith(':id'))
+
+    for rel in parse_relationships(parts[rels_part_for(workbook_part)]):
+        if rel.get('Id') == rel_id:
+            return resolve_target(workbook_part, rel['Target'])
+    raise ValueError(f"找不到工作表部件: {sheet.get('name')}")
+
+
+def _row_cell_values(row_body: str, shared_strings: List[str]) -> Dict[int, str]:
+    """解析一列中的儲存格，回傳 欄位索引 → 文字值"""
+    values = {}
+    col = 0
+    for match in _CELL_RE.finditer(row_body or ''):
+        attrs, body = match.group(1), match.group(3) or ''
+        ref = _CELL_REF_RE.search(attrs)
+        col = column_index_from_string(ref.group(1)) if ref else col + 1
+        cell_type = dict(_ATTR_RE.findall(attrs)).get('t', 'n')
+        if cell_type == 'inlineStr':
+            values[col] = _xml_text(body)
+            continue
+        value = re.search(r'<v>(.*?)</v>', body, re.S)
+        if value is None:
+            continue
+        text = unescape(value.group(1), _XML_ENTITIES)
+        if cell_type == 's':
+            index = int(text)
+            text = shared_strings[index] if index < len(shared_strings) else ''
+        values[col] = text
+    return values
+
+
+def _excluded_row_body(row_body: str) -> str:
+    """排除列只留下公式儲存格（移除快取值），避免破壞共用公式與計算鏈"""
+    kept = []
+    for match in _CELL_RE.finditer(row_body or ''):
+        if match.group(3) and '<f' in match.group(3):
+            kept.append(f'<c{match.group(1)}>{_FORMULA_VALUE_RE.sub("", match.group(3))}</c>')
+    return ''.join(kept)
+
+
+def _set_sheet_autofilter(xml: str, ref: str, col_id: int, values: List[str]) -> str:
+    """設定工作表的自動篩選（依 schema 順序放在 sheetData 之後）"""
+    filters = ''.join(f'<filter val="{escape(value, {chr(34): "&quot;"})}"/>' for value in values)
+    auto_filter = (f'<autoFilter ref="{ref}"><filterColumn colId="{col_id}"><filters>'
+                   f'{filters}</filters></filterColumn></autoFilter>')
+    existing = _AUTOFILTER_RE.search(xml)
+    if existing:
+        return xml[:existing.start()] + auto_filter + xml[existing.end():]
+    end = _SHEET_DATA_END_RE.search(xml)
+    if not end:
+        return xml
+    position = end.end()
+    following = _BEFORE_AUTOFILTER_RE.match(xml, position)
+    while following:
+        position = following.end()
+        following = _BEFORE_AUTOFILTER_RE.match(xml, position)
+    return xml[:position] + auto_filter + xml[position:]
+
+
+def hide_rows_in_package(source_path: str, dest_path: str, column_name: str, reviewer,
+                         exclude_rows: bool = False, keep_rows: Optional[Set[int]] = None) -> Dict[str, int]:
+    """
+    直接改寫作用中工作表的 XML，隱藏不屬於該審查者的資料列並設定自動篩選
+
+    除了該工作表部件外，其他部件（vbaProject.bin、vbaProjectSignature.bin、customUI、
+    樣式、共用字串等）的內容逐位元組保留，不經過 openpyxl 重新序列化
+
+    Args:
+        source_path: 母檔路徑（.xlsx / .xlsm）
+        dest_path: 輸出檔路徑
+        column_name: 審查者欄位名稱（第 1 列標題）
+        reviewer: 審查者名稱
+        exclude_rows: 是否一併清空被隱藏列的內容（公式儲存格保留公式、移除快取值），
+            並從共用字串表移除不再被引用的字串
+        keep_rows: 預先算好的保留列號（多值儲存格或代理人分派）；提供時不再比對審查者欄位
+
+    Returns:
+        統計資訊 (rows_hidden, rows_kept, max_row)
+    """
+    parts = read_package(source_path)
+    sheet_part = active_worksheet_part(parts)
+    shared_strings = load_shared_strings(parts)
+    xml = parts[sheet_part].decode('utf-8')
+    target = str(reviewer)
+
+    col_idx = None
+    max_row = 0
+    max_col = 0
+    filter_values = [] if keep_rows is not None else [target]
+    stats = {'rows_hidden': 0, 'rows_kept': 0, 'max_row': 0}
+
+    def _row(match):
+        nonlocal col_idx, max_row, max_col
+        attrs, closing, body = match.group(1), match.group(2), match.group(3)
+        number = _ROW_NUMBER_RE.search(attrs)
+        row_number = int(number.group(1)) if number else max_row + 1
+        max_row = max(max_row, row_number)
+        values = _row_cell_values(body, shared_strings)
+        if values:
+            max_col = max(max_col, max(values))
+
+        if col_idx is None:
+            # 第一個出現的列視為標題列
+            for idx, value in values.items():
+                if value == column_name:
+                    col_idx = idx
+                    break
+            else:
+                raise ValueError(f"找不到 '{column_name}' 欄位！")
+            return match.group(0)
+
+        if keep_rows is not None:
+            keep = row_number in keep_rows
+            if keep and values.get(col_idx) is not None and values[col_idx] not in filter_values:
+                filter_values.append(values[col_idx])
+        else:
+            keep = values.get(col_idx) == target
+        if keep:
+            stats['rows_kept'] += 1
+            return match.group(0)
+
+        stats['rows_hidden'] += 1
+        attrs = _set_xml_attr(f'<row{attrs}>', 'hidden', 1)[4:-1]
+        if exclude_rows:
+            body = _excluded_row_body(body)
+        if closing == '/>' or not body:
+            return f'<row{attrs}/>'
+        return f'<row{attrs}>{body}</row>'
+
+    xml = _ROW_RE.sub(_row, xml)
+    if col_idx is None:
+        raise ValueError(f"找不到 '{column_name}' 欄位！")
+    if not filter_values:
+        filter_values = [target]
+
+    dimension = _DIMENSION_RE.search(xml)
+    if dimension:
+        max_col = max(max_col, column_index_from_string(dimension.group(1)))
+    if max_row > 1:
+        xml = _set_sheet_autofilter(xml, f"A1:{get_column_letter(max_col)}{max_row}", col_idx - 1, filter_values)
+
+    parts[sheet_part] = xml.encode('utf-8')
+    if exclude_rows:
+        # 清空的儲存格文字仍留在共用字串表中：只保留仍被引用的字串
+        prune_shared_strings(parts)
+    write_package(dest_path, parts)
+    stats['max_row'] = max_row
+    return stats
+
+
+class _LazyPackage(Mapping):
+    """只在需要時才解壓縮部件的唯讀封裝（讀取單一工作表時不必解開圖片等大型部件）"""
+
+    def __init__(self, zf: zipfile.ZipFile):
+        self._zf = zf
+        self._names = set(zf.namelist())
+        self._cache = {}
+
+    def __getitem__(self, name: str) -> bytes:
+        if name not in self._names:
+            raise KeyError(name)
+        if name not in self._cache:
+            self._cache[name] = self._zf.read(name)
+        return self._cache[name]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+def _row_cell_typed_values(row_body: str, shared_strings: List[str],
+                           wanted: Optional[Set[int]] = None) -> Dict[int, object]:
+    """
+    解析一列中的儲存格，回傳 欄位索引 → 值（數值為 int/float、布林為 bool、其餘為字串）
+
+    公式儲存格略過（只有快取值，不應視為使用者輸入）；提供 wanted 時只解析這些欄位
+    """
+    values = {}
+    col = 0
+    for match in _CELL_RE.finditer(row_body or ''):
+        attrs, body = match.group(1), match.group(3) or ''
+        ref = _CELL_REF_RE.search(attrs)
+        col = column_index_from_string(ref.group(1)) if ref else col + 1
+        if (wanted is not None and col not in wanted) or '<f' in body:
+            continue
+        cell_type = dict(_ATTR_RE.findall(attrs)).get('t', 'n')
+        if cell_type == 'inlineStr':
+            values[col] = _xml_text(body)
+            continue
+        value = re.search(r'<v>(.*?)</v>', body, re.S)
+        if value is None:
+            continue
+        text = unescape(value.group(1), _XML_ENTITIES)
+        if cell_type == 's':
+            index = int(text)
+            values[col] = shared_strings[index] if index < len(shared_strings) else ''
+        elif cell_type == 'b':
+            values[col] = text.strip() in ('1', 'true')
+        elif cell_type == 'n':
+            number = float(text)
+            values[col] = int(number) if number.is_integer() and 'E' not in text.upper() else number
+        else:
+            values[col] = text
+    return values
+
+
+def sheet_filter_columns(xml: str) -> Dict[int, Optional[List[str]]]:
+    """
+    工作表自動篩選的條件
+
+    Returns:
+        {欄位索引: 篩選值清單}；自訂條件、前 10 項、色彩等非清單條件的值為 None
+    """
+    auto_filter = _AUTOFILTER_RE.search(xml)
+    if not auto_filter:
+        return {}
+    start = _AUTOFILTER_REF_RE.match(auto_filter.group(0))
+    first_col = column_index_from_string(start.group(1)) if start else 1
+    filters = {}
+    for match in _FILTER_COLUMN_RE.finditer(auto_filter.group(0)):
+        attrs = dict(_ATTR_RE.findall(match.group(1)))
+        if 'colId' not in attrs:
+            continue
+        body = match.group(2) or ''
+        values = None
+        if '<filters' in body:
+            values = [unescape(value, _XML_ENTITIES) for value in _FILTER_VALUE_RE.findall(body)]
+        filters[first_col + int(attrs['colId'])] = values
+    return filters
+
+
+def read_sheet_rows(file_path: str, column_names: Optional[Iterable[str]] = None
+                    ) -> Tuple[Dict[int, str], List[Tuple[int, Dict[int, object], bool]],
+                               Dict[int, Optional[List[str]]]]:
+    """
+    讀取作用中工作表的標題列、所有資料列（含隱藏列）與自動篩選條件
+
+    只解壓縮作用中工作表與共用字串表；提供 column_names 時只解析這些欄位的儲存格
+
+    Returns:
+        ({欄位索引: 標題}, [(Excel 列號, {欄位索引: 值}, 是否隱藏), ...], sheet_filter_columns 的結果)
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        parts = _LazyPackage(zf)
+        xml = parts[active_worksheet_part(parts)].decode('utf-8')
+        shared_strings = load_shared_strings(parts)
+
+    header = {}
+    wanted = None
+    rows = []
+    row_number = 0
+    for match in _ROW_RE.finditer(xml):
+        attrs, body = match.group(1), match.group(3)
+        number = _ROW_NUMBER_RE.search(attrs)
+        row_number = int(number.group(1)) if number else row_number + 1
+        if row_number == 1:
+            header = {col: str(value) for col, value in _row_cell_typed_values(body, shared_strings).items()}
+            if column_names is not None:
+                names = set(column_names)
+                wanted = {col for col, name in header.items() if name in names}
+        elif body:
+            hidden = bool(re.search(r'\shidden="(?:1|true)"', attrs))
+            rows.append((row_number, _row_cell_typed_values(body, shared_strings, wanted), hidden))
+    return header, rows, sheet_filter_columns(xml)
+
+
+def read_visible_rows(file_path: str, column_names: Optional[Iterable[str]] = None
+                      ) -> Tuple[Dict[int, str], List[Tuple[int, Dict[int, object]]]]:
+    """
+    讀取作用中工作表的標題列與所有未隱藏的資料列（參數同 read_sheet_rows）
+
+    Returns:
+        ({欄位索引: 標題}, [(Excel 列號, {欄位索引: 值}), ...])
+    """
+    header, rows, _ = read_sheet_rows(file_path, column_names)
+    return header, [(number, values) for number, values, hidden in rows if not hidden]
+
+
+def fingerprint_value_text(value) -> str:
+    """
+    指紋用的儲存格值正規化
+
+    openpyxl 讀到的值與 read_visible_rows 從 XML 解析的值需得到相同文字：
+    日期轉為 Excel 序列值、整數型浮點數去除小數點；公式只存快取值，不列入指紋。
+    pandas 的 NaN / NaT 視為空白，numpy 整數與 Python 整數相同（期間異動比對也使用）
+    """
+    if value is None or value is pd.NaT or value is pd.NA:
+        return ''
+    if isinstance(value, (bool, np.bool_)):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        value = to_excel(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ''
+        return str(int(value)) if value.is_integer() else repr(float(value))
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    value = str(value)
+    return '' if value.startswith('=') else value
+
+
+def row_fingerprint(values: Iterable) -> str:
+    """計算一列原始值的指紋（16 位十六進位）"""
+    text = '\x1f'.join(fingerprint_value_text(value) for value in values)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def filter_changed_rows(header: Dict[int, str], rows: List[Tuple[int, Dict[int, object]]]
+                        ) -> Optional[List[Tuple[int, Dict[int, object]]]]:
+    """
+    只保留內容與分割時指紋不同的資料列（輸入為 read_visible_rows 的結果）
+
+    Returns:
+        [(母檔列號, {欄位索引: 值})]；沒有指紋欄位時回傳 None
+    """
+    columns = {name: col for col, name in header.items()}
+    if ROW_ID_COLUMN not in columns or FINGERPRINT_COLUMN not in columns:
+        return None
+    row_id_col, fingerprint_col = columns[ROW_ID_COLUMN], columns[FINGERPRINT_COLUMN]
+    data_cols = range(1, min(row_id_col, fingerprint_col))
+
+    changed = []
+    for _, values in rows:
+        row_id = values.get(row_id_col)
+        if row_fingerprint(values.get(col) for col in data_cols) != values.get(fingerprint_col):
+            changed.append((int(row_id) if isinstance(row_id, (int, float)) else row_id, values))
+    return changed
+
+
+def changed_visible_rows(file_path: str) -> Optional[Tuple[Dict[int, str], List[Tuple[int, Dict[int, object]]]]]:
+    """讀取輸出檔並只回傳被修改過的可見資料列；檔案沒有指紋欄位時回傳 None"""
+    header, rows = read_visible_rows(file_path)
+    changed = filter_changed_rows(header, rows)
+    return None if changed is None else (header, changed)
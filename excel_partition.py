@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Excel 分割索引 - 資料列與審查者的對應關係
+
+一個儲存格可能列出多位審查者（例如「Alice Chen; Bob Johnson」），
+某些審查者的資料列也要同時送給代理人。這裡只掃描母檔一次，
+建立「資料列 ↔ 審查者」的關聯表，之後每位審查者的輸出都直接取用。
+主管彙總則依組織階層，將部屬的資料列由下往上合併；
+路由規則（例如「Access_Level == 'Admin' → 資安團隊」）則以整欄向量化比對，
+命中的資料列併入同一張關聯表。
+"""
+
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 多值儲存格的分隔符號：半形/全形分號與換行（逗號常出現在「姓, 名」中，不列入預設）
+DEFAULT_SEPARATORS = r'[;；\n]'
+# 不拆分儲存格（只做代理人分派時使用）
+NO_SPLIT = r'(?!)'
+
+# 路由規則：「欄位 運算子 值」，值可加引號；in 的多個值以 | 分隔
+ROUTING_RULE_RE = re.compile(r"^\s*(.+?)\s*(==|!=|>=|<=|>|<|\bin\b|\bcontains\b)\s*(.+?)\s*$")
+ROUTING_OPERATORS = ('==', '!=', '>=', '<=', '>', '<', 'in', 'contains')
+
+
+def split_reviewer_names(value, separators: str = DEFAULT_SEPARATORS) -> List[str]:
+    """將單一儲存格拆成審查者名稱清單（去除空白與重複）"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return []
+    names = []
+    for name in re.split(separators, str(value)):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def load_delegate_table(file_path: str, reviewer_column: str = 'Reviewer',
+                        delegate_column: str = 'Delegate') -> Dict[str, List[str]]:
+    """
+    讀取代理人對照表（CSV 或 Excel，每列一組 審查者 → 代理人）
+
+    Returns:
+        {審查者: [代理人, ...]}
+    """
+    if os.path.splitext(file_path)[1].lower() == '.csv':
+        table = pd.read_csv(file_path, dtype=str)
+    else:
+        table = pd.read_excel(file_path, engine='openpyxl', dtype=str)
+
+    missing = [c for c in (reviewer_column, delegate_column) if c not in table.columns]
+    if missing:
+        raise ValueError(f"代理人對照表缺少欄位: {', '.join(missing)}")
+
+    delegates = {}
+    for reviewer, delegate in table[[reviewer_column, delegate_column]].dropna().itertuples(index=False):
+        reviewer, delegate = reviewer.strip(), delegate.strip()
+        if reviewer and delegate and delegate != reviewer:
+            delegates.setdefault(reviewer, [])
+            if delegate not in delegates[reviewer]:
+                delegates[reviewer].append(delegate)
+    return delegates
+
+
+def parse_routing_rule(expression: str) -> Dict[str, object]:
+    """
+    解析單一路由條件，例如 "Access_Level == 'Admin'" 或 "金額 > 30000"
+
+    Returns:
+        {'column': 欄位, 'operator': 運算子, 'value': 值}（未加引號的數值轉為 float，in 的值一律為字串）
+    """
+    match = ROUTING_RULE_RE.match(str(expression))
+    if not match:
+        raise ValueError(f"無法解析路由規則: {expression}")
+    column, operator, raw = match.groups()
+    column = column.strip('`"\'')
+
+    def _literal(text, numeric=True):
+        text = text.strip()
+        if len(text) >= 2 and text[0] == text[-1] and text[0] in '"\'':
+            return text[1:-1]
+        if not numeric:
+            return text
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+    if operator == 'in':
+        value = [_literal(item, numeric=False) for item in raw.split('|')]
+    else:
+        value = _literal(raw)
+    return {'column': column, 'operator': operator, 'value': value}
+
+
+def load_routing_rules(file_path: str, rule_column: str = 'Rule',
+                       route_column: str = 'Route') -> List[Dict[str, object]]:
+    """
+    讀取路由規則表（CSV 或 Excel，每列一組 條件 → 審查者）
+
+    Returns:
+        [{'column', 'operator', 'value', 'route', 'rule'}, ...]（依檔案順序）
+    """
+    if os.path.splitext(file_path)[1].lower() == '.csv':
+        table = pd.read_csv(file_path, dtype=str)
+    else:
+        table = pd.read_excel(file_path, engine='openpyxl', dtype=str)
+
+    missing = [c for c in (rule_column, route_column) if c not in table.columns]
+    if missing:
+        raise ValueError(f"路由規則表缺少欄位: {', '.join(missing)}")
+
+    rules = []
+    for expression, route in table[[rule_column, route_column]].dropna().itertuples(index=False):
+        if expression.strip() and route.strip():
+            rule = parse_routing_rule(expression)
+            rule.update(route=route.strip(), rule=expression.strip())
+            rules.append(rule)
+    return rules
+
+
+def evaluate_routing_rules(df: pd.DataFrame, rules: List[Dict[str, object]]) -> pd.DataFrame:
+    """
+    以整欄向量化比對評估所有路由規則（每條規則對母檔只做一次欄位運算）
+
+    Returns:
+        路由表 DataFrame，欄位為 row（資料列位置）、reviewer、source（'rule'）、rule（命中的規則）
+    """
+    frames = []
+    for rule in rules:
+        if rule['column'] not in df.columns:
+            raise ValueError(f"路由規則引用不存在的欄位: {rule['column']}")
+        column = df[rule['column']].reset_index(drop=True)
+        operator, value = rule['operator'], rule['value']
+
+        if operator in ('>', '>=', '<', '<=') or isinstance(value, float):
+            # 數值比較：無法轉成數字的儲存格視為不符合
+            column = pd.to_numeric(column, errors='coerce')
+        else:
+            column = column.astype('string').str.strip()
+
+        if operator == 'in':
+            mask = column.isin(value)
+        elif operator == 'contains':
+            mask = column.str.contains(str(value), regex=False)
+        else:
+            mask = {
+                '==': column.eq, '!=': column.ne, '>': column.gt,
+                '>=': column.ge, '<': column.lt, '<=': column.le,
+            }[operator](value)
+        if operator == '!=':
+            mask &= column.notna()
+
+        rows = mask.fillna(False).astype(bool).to_numpy().nonzero()[0]
+        frames.append(pd.DataFrame({'row': rows, 'reviewer': rule['route'], 'source': 'rule',
+                                    'rule': rule.get('rule', f"{rule['column']} {operator} {value}")}))
+
+    if not frames:
+        return pd.DataFrame(columns=['row', 'reviewer', 'source', 'rule'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_reviewer_incidence(df: pd.DataFrame, column_name: str,
+                             delegates: Optional[Dict[str, List[str]]] = None,
+                             separators: str = DEFAULT_SEPARATORS,
+                             routing_rules: Optional[List[Dict[str, object]]] = None) -> pd.DataFrame:
+    """
+    建立資料列與審查者的關聯表（一次向量化掃描）
+
+    Args:
+        df: 母檔資料（第 0 列對應 Excel 第 2 列）
+        column_name: 審查者欄位
+        delegates: 代理人對照表 {審查者: [代理人]}
+        separators: 多值儲存格的分隔符號（正規表示式）
+        routing_rules: 路由規則（見 load_routing_rules），命中的資料列另外分派給規則指定的審查者
+
+    Returns:
+        DataFrame，欄位為 row（資料列位置）、reviewer、source（'cell'、'delegate' 或 'rule'）
+    """
+    column = df[column_name].reset_index(drop=True)
+    names = column.dropna().astype(str).str.split(separators).explode().str.strip()
+    names = names[names != '']
+    incidence = pd.DataFrame({'row': names.index.to_numpy(), 'reviewer': names.to_numpy(), 'source': 'cell'})
+
+    if delegates:
+        table = pd.DataFrame(
+            [(reviewer, delegate) for reviewer, items in delegates.items() for delegate in items],
+            columns=['reviewer', 'delegate'])
+        fan_out = incidence.merge(table, on='reviewer', how='inner')
+        fan_out = pd.DataFrame({'row': fan_out['row'], 'reviewer': fan_out['delegate'], 'source': 'delegate'})
+        incidence = pd.concat([incidence, fan_out], ignore_index=True)
+
+    if routing_rules:
+        routed = evaluate_routing_rules(df, routing_rules)[['row', 'reviewer', 'source']]
+        incidence = pd.concat([incidence, routed], ignore_index=True)
+
+    # 同一列若同時直接指派與代理/規則指派給同一人，保留直接指派
+    incidence = incidence.drop_duplicates(subset=['row', 'reviewer'], keep='first')
+    return incidence.sort_values('row', kind='stable').reset_index(drop=True)
+
+
+def incidence_to_partitions(incidence: pd.DataFrame) -> Dict[str, List[int]]:
+    """
+    將關聯表轉成 {審查者: [Excel 列號]}（依審查者首次出現的順序）
+
+    Excel 列號 = 資料列位置 + 2（第 1 列為標題）
+    """
+    partitions = {}
+    for reviewer, rows in incidence.groupby('reviewer', sort=False)['row']:
+        partitions[reviewer] = [int(row) + 2 for row in rows]
+    return partitions
+
+
+def load_org_hierarchy(file_path: str, person_column: str = 'Name',
+                       manager_column: str = 'Manager') -> Dict[str, str]:
+    """
+    讀取組織階層表（CSV 或 Excel，每列一組 人員 → 直屬主管）
+
+    Returns:
+        {人員: 直屬主管}
+    """
+    if os.path.splitext(file_path)[1].lower() == '.csv':
+        table = pd.read_csv(file_path, dtype=str)
+    else:
+        table = pd.read_excel(file_path, engine='openpyxl', dtype=str)
+
+    missing = [c for c in (person_column, manager_column) if c not in table.columns]
+    if missing:
+        raise ValueError(f"組織階層表缺少欄位: {', '.join(missing)}")
+
+    hierarchy = {}
+    for person, manager in table[[person_column, manager_column]].dropna().itertuples(index=False):
+        person, manager = person.strip(), manager.strip()
+        if person and manager and manager != person:
+            hierarchy[person] = manager
+    return hierarchy
+
+
+def build_rollup_partitions(partitions: Dict[str, List[int]],
+                            hierarchy: Dict[str, str]) -> Dict[str, List[int]]:
+    """
+    計算每位主管的彙總資料列：本人資料列 ∪ 所有直屬與間接部屬的資料列
+
+    每個人的列遮罩只計算一次（由下往上記憶化），主管直接合併部屬的遮罩，
+    不需要重新掃描母檔。階層中若有循環，會在重複出現的人員處截斷。
+
+    Args:
+        partitions: {審查者: [Excel 列號]}
+        hierarchy: {人員: 直屬主管}
+
+    Returns:
+        {主管: [Excel 列號]}（只包含至少有一列資料的主管）
+    """
+    children = {}
+    for person, manager in hierarchy.items():
+        children.setdefault(manager, []).append(person)
+
+    size = max((max(rows) for rows in partitions.values() if rows), default=0) + 1
+    masks = {}
+    for reviewer, rows in partitions.items():
+        mask = np.zeros(size, dtype=bool)
+        mask[rows] = True
+        masks[reviewer] = mask
+
+    memo = {}
+    for manager in children:
+        # 迭代式後序走訪，避免深層組織觸發遞迴上限
+        stack = [(manager, False)]
+        visiting = set()
+        while stack:
+            person, expanded = stack.pop()
+            if person in memo:
+                continue
+            if expanded:
+                mask = masks.get(person, np.zeros(size, dtype=bool)).copy()
+                for child in children.get(person, []):
+                    if child in memo:
+                        mask |= memo[child]
+                memo[person] = mask
+                visiting.discard(person)
+            elif person not in visiting:
+                visiting.add(person)
+                stack.append((person, True))
+                stack.extend((child, False) for child in children.get(person, [])
+                             if child not in memo and child not in visiting)
+
+    return {manager: np.flatnonzero(memo[manager]).tolist()
+            for manager in children if memo[manager].any()}
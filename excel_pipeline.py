@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+分割 → 驗證 → 上傳 → 分享 管線 - 讓 CPU 與網路工作重疊
+
+SharePoint Notebook 過去先分割全部檔案、再全部上傳、再逐一分享：
+分割時網路閒置，上傳等待回應時 CPU 閒置。這裡把每位審查者視為一個工作，
+各階段之間以有上限的佇列串接：
+1. 每個階段有自己的執行緒數（例如分割 1、上傳 4、分享 2）
+2. 佇列滿時上游階段會等待（背壓），不會一次產生所有檔案而堆積
+3. 某階段失敗的工作不再往下游傳遞，結果中記錄失敗階段與錯誤
+
+審查者 N 上傳時，審查者 N+1 已經在分割。上傳與分享函數由 Notebook 提供
+（例如 upload_file_to_sharepoint、share_folder_with_user），這裡不依賴任何網路套件。
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from excel_package_tools import normalize_package, package_timestamp
+from excel_roster import normalize_person_name
+from excel_splitter_fixed import (process_reviewer_excel_hide_rows, process_reviewer_excel_xlsm_passthrough,
+                                  validate_excel_file)
+
+# 工作狀態
+JOB_OK = 'ok'
+JOB_FAILED = 'failed'
+
+_DONE = object()
+
+
+class PipelineStage:
+    """
+    管線階段
+
+    Args:
+        name: 階段名稱（出現在統計與失敗紀錄中）
+        func: func(job) - job 為 dict（item、index 及前面階段加入的欄位）；
+            可直接修改 job 傳遞資料給下游，拋出例外表示該工作失敗
+        workers: 此階段同時處理的工作數
+    """
+
+    def __init__(self, name: str, func: Callable[[Dict], None], workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+def run_pipeline(items: Iterable, stages: List[PipelineStage], queue_size: int = 4,
+                 on_result: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    以有上限的佇列串接各階段並執行所有工作
+
+    Args:
+        items: 工作項目（例如審查者名稱）
+        stages: 依序執行的階段
+        queue_size: 每個階段前的佇列上限（背壓）
+        on_result: 每個工作完成或失敗時呼叫（進度顯示用）
+
+    Returns:
+        {'results': [工作，依輸入順序], 'stages': {階段: 統計}, 'seconds': 總耗時}
+        每個工作包含 item、status（ok / failed）、stage（失敗階段）、error、timings（各階段秒數）
+    """
+    if not stages:
+        raise ValueError("管線至少需要一個階段")
+
+    started = time.perf_counter()
+    inboxes = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+    results = []
+    lock = threading.Lock()
+    stats = {stage.name: {'processed': 0, 'failed': 0, 'busy_seconds': 0.0, 'max_queue': 0} for stage in stages}
+    remaining_workers = [stage.workers for stage in stages]
+
+    def finish(job):
+        with lock:
+            results.append(job)
+        if on_result:
+            on_result(job)
+
+    def worker(index):
+        stage = stages[index]
+        inbox = inboxes[index]
+        try:
+            while True:
+                depth = inbox.qsize()
+                job = inbox.get()
+                if job is _DONE:
+                    inbox.put(_DONE)  # 讓同階段的其他執行緒也能結束
+                    break
+                begin = time.perf_counter()
+                try:
+                    stage.func(job)
+                except Exception as e:
+                    job.update(status=JOB_FAILED, stage=stage.name, error=str(e) or type(e).__name__)
+                elapsed = time.perf_counter() - begin
+                job['timings'][stage.name] = round(elapsed, 4)
+                with lock:
+                    entry = stats[stage.name]
+                    entry['busy_seconds'] += elapsed
+                    entry['max_queue'] = max(entry['max_queue'], depth)
+                    entry['failed' if job['status'] == JOB_FAILED else 'processed'] += 1
+                if job['status'] == JOB_FAILED or index == len(stages) - 1:
+                    finish(job)
+                else:
+                    inboxes[index + 1].put(job)  # 下游佇列滿時在此等待
+        finally:
+            # 最後一個結束的執行緒通知下游階段
+            with lock:
+                remaining_workers[index] -= 1
+                last = remaining_workers[index] == 0
+            if last and index + 1 < len(stages):
+                inboxes[index + 1].put(_DONE)
+
+    threads = [threading.Thread(target=worker, args=(index,), name=f"pipeline-{stage.name}-{n}", daemon=True)
+               for index, stage in enumerate(stages) for n in range(stage.workers)]
+    for thread in threads:
+        thread.start()
+
+    for position, item in enumerate(items):
+        inboxes[0].put({'index': position, 'item': item, 'status': JOB_OK, 'stage': None, 'error': '',
+                        'timings': {}})
+    inboxes[0].put(_DONE)
+
+    for thread in threads:
+        thread.join()
+
+    for entry in stats.values():
+        entry['busy_seconds'] = round(entry['busy_seconds'], 4)
+    return {
+        'results': sorted(results, key=lambda job: job['index']),
+        'stages': stats,
+        'seconds': round(time.perf_counter() - started, 4),
+    }
+
+
+def split_upload_share(file_path: str, column_name: str, output_folder: str,
+                       upload: Optional[Callable[[str, str], bool]] = None,
+                       share: Optional[Callable[[str, str], bool]] = None,
+                       emails: Optional[Dict[str, str]] = None, exclude_rows: bool = False,
+                       build_workers: int = 1, upload_workers: int = 4, share_workers: int = 2,
+                       queue_size: int = 4) -> Dict:
+    """
+    依審查者分割母檔，並在分割的同時上傳與分享已完成的檔案
+
+    Args:
+        file_path: 母檔路徑
+        column_name: 審查者欄位名稱
+        output_folder: 本機輸出資料夾
+        upload: upload(本機檔案路徑, 相對資料夾) → 是否成功；未提供時略過上傳階段
+        share: share(相對資料夾, Email) → 是否成功；未提供時略過分享階段
+        emails: {審查者: Email}；未提供時使用母檔的 Email Address 欄位
+        exclude_rows: 一併清空被隱藏列的內容
+        build_workers / upload_workers / share_workers: 各階段同時處理數
+        queue_size: 階段間佇列上限
+
+    Returns:
+        run_pipeline 的結果；每個工作另含 path（輸出檔）、folder（相對資料夾）、email
+    """
+    df = pd.read_excel(file_path, engine='openpyxl')
+    if column_name not in df.columns:
+        raise ValueError(f"找不到欄位 '{column_name}'")
+    reviewers = df[column_name].dropna().unique().tolist()
+
+    if emails is None and 'Email Address' in df.columns:
+        assigned = df[[column_name, 'Email Address']].dropna()
+        emails = dict(zip(assigned[column_name].astype(str), assigned['Email Address'].astype(str).str.strip()))
+    email_index = {normalize_person_name(name): email for name, email in (emails or {}).items()}
+
+    package_time = package_timestamp(file_path)
+    passthrough = os.path.splitext(file_path)[1].lower() == '.xlsm'
+    build_reviewer = process_reviewer_excel_xlsm_passthrough if passthrough else process_reviewer_excel_hide_rows
+
+    def build(job):
+        success, folder_path, filename = build_reviewer(file_path, job['item'], column_name, output_folder,
+                                                        exclude_rows=exclude_rows)
+        if not success:
+            raise RuntimeError('分割失敗')
+        job['path'] = os.path.join(folder_path, filename)
+        job['folder'] = os.path.relpath(folder_path, output_folder).replace(os.sep, '/')
+        job['email'] = email_index.get(normalize_person_name(job['item']), '')
+        if not passthrough:
+            normalize_package(job['path'], package_time)
+
+    def validate(job):
+        result = validate_excel_file(job['path'])
+        if 'validation_error' in result:
+            raise ValueError(result['validation_error'])
+
+    def upload_file(job):
+        if not upload(job['path'], job['folder']):
+            raise RuntimeError('上傳失敗')
+
+    def share_folder(job):
+        if not job['email']:
+            raise ValueError('沒有 Email')
+        if not share(job['folder'], job['email']):
+            raise RuntimeError('分享失敗')
+
+    stages = [PipelineStage('build', build, build_workers), PipelineStage('validate', validate)]
+    if upload:
+        stages.append(PipelineStage('upload', upload_file, upload_workers))
+    if share:
+        stages.append(PipelineStage('share', share_folder, share_workers))
+
+    print(f"🚚 管線: {' → '.join(stage.name for stage in stages)}（{len(reviewers)} 位審查者）")
+
+    def report(job):
+        if job['status'] == JOB_OK:
+            print(f"  ✓ {job['item']}")
+        else:
+            print(f"  ❌ {job['item']}: {job['stage']} - {job['error']}")
+
+    summary = run_pipeline(reviewers, stages, queue_size, on_result=report)
+    ok = sum(1 for job in summary['results'] if job['status'] == JOB_OK)
+    print(f"✅ 完成 {ok}/{len(reviewers)}，耗時 {summary['seconds']:.1f} 秒")
+    for name, entry in summary['stages'].items():
+        print(f"  {name}: {entry['processed']} 成功、{entry['failed']} 失敗，工作時間 {entry['busy_seconds']:.1f} 秒")
+    return summary
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+本機暫存與批次發佈 - 避免同步資料夾（SharePoint / OneDrive）看到半成品
+
+直接在同步資料夾內產生數百個檔案時，同步用戶端會上傳寫到一半的檔案、
+資料夾更名後又重新上傳。這裡先在本機暫存資料夾產生完整的輸出樹，完成後一次發佈：
+1. 先建立所有目的資料夾（只建立一次，不會更名）
+2. 每個檔案先寫入同資料夾下的 ~$publish- 暫存檔（同步用戶端忽略 ~$ 開頭的檔案），
+   再以 os.replace 原子替換，同步引擎只會看到完整的檔案一次
+3. 內容與目的檔相同的檔案略過，不觸發重新上傳；比對時不讀取目的檔內容（雲端預留位置檔不會被下載），
+   而是與目的資料夾的發佈紀錄（~$published.json）比對：紀錄保存每個發佈檔的 SHA-256、大小與發佈後的修改時間，
+   目的檔的大小與修改時間都與紀錄相同時才採用紀錄的雜湊；沒有紀錄時比對大小與修改時間
+4. 輸出清單（output_manifest）在所有資料檔之後發佈，發佈紀錄最後寫入；中途中斷時紀錄仍是上次的內容，
+   已被替換的目的檔修改時間與紀錄不符，下次會重新發佈
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from excel_manifest import OUTPUT_MANIFEST_NAME, file_sha256
+
+# 發佈中的暫存檔前綴；Excel 鎖定檔同樣以 ~$ 開頭，同步用戶端與審查工具都會略過
+PARTIAL_PREFIX = '~$publish-'
+# 目的資料夾的發佈紀錄（~$ 開頭，同步用戶端不會上傳）
+PUBLISH_RECORD_NAME = '~$published.json'
+
+
+def published_digests(dest_dir: str) -> Dict[str, Tuple[str, int, int]]:
+    """
+    目的資料夾的發佈紀錄
+
+    Returns:
+        {相對路徑: (SHA-256, 位元組數, 發佈後的修改時間 ns)}；沒有紀錄時回傳 {}
+    """
+    try:
+        with open(os.path.join(dest_dir, PUBLISH_RECORD_NAME), encoding='utf-8') as f:
+            entries = json.load(f)
+        return {os.path.normpath(relative): (sha, size, mtime_ns)
+                for relative, (sha, size, mtime_ns) in entries.items()}
+    except (OSError, ValueError, TypeError, AttributeError):
+        return {}
+
+
+def write_published_digests(dest_dir: str, digests: Dict[str, Tuple[str, int, int]]) -> None:
+    """原子地寫入發佈紀錄（只保留目的檔仍存在的項目）"""
+    entries = {relative.replace(os.sep, '/'): list(record) for relative, record in sorted(digests.items())
+               if os.path.isfile(os.path.join(dest_dir, relative))}
+    path = os.path.join(dest_dir, PUBLISH_RECORD_NAME)
+    partial = os.path.join(dest_dir, PARTIAL_PREFIX + PUBLISH_RECORD_NAME)
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False)
+    os.replace(partial, path)
+
+
+def files_identical(src: str, dst: str, recorded: Optional[Tuple[str, int, int]] = None,
+                    src_sha256: Optional[str] = None) -> bool:
+    """
+    目的檔是否存在且內容與來源相同（只讀取來源，不讀取目的檔內容）
+
+    Args:
+        src: 來源檔案
+        dst: 目的檔案
+        recorded: 發佈紀錄中的 (SHA-256, 位元組數, 發佈後的修改時間 ns)
+        src_sha256: 已算好的來源雜湊（省略時需要才計算）
+
+    目的檔的大小與修改時間都與紀錄相同時比對來源雜湊與紀錄，
+    否則比對大小與修改時間（publish_file 保留來源的修改時間）
+    """
+    try:
+        src_stat = os.stat(src)
+        dst_stat = os.stat(dst)
+    except OSError:
+        return False
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if recorded is not None and (recorded[1], recorded[2]) == (dst_stat.st_size, dst_stat.st_mtime_ns):
+        return (src_sha256 or file_sha256(src)) == recorded[0]
+    return abs(src_stat.st_mtime_ns - dst_stat.st_mtime_ns) < 1_000_000
+
+
+def publish_file(src: str, dst: str, move: bool = False) -> None:
+    """
+    將單一檔案原子地放到目的地
+
+    Args:
+        src: 暫存區中的檔案
+        dst: 目的路徑（所在資料夾需已存在）
+        move: 來源與目的在同一個檔案系統時直接更名（不複製）
+    """
+    if move:
+        try:
+            os.replace(src, dst)
+            return
+        except OSError:
+            pass  # 跨檔案系統時改為複製
+
+    partial = os.path.join(os.path.dirname(dst), PARTIAL_PREFIX + os.path.basename(dst))
+    try:
+        shutil.copy2(src, partial)
+        with open(partial, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(partial, dst)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def publish_tree(staging_dir: str, dest_dir: str, move: bool = True) -> Dict[str, int]:
+    """
+    將暫存資料夾的完整輸出樹發佈到目的資料夾（通常是同步資料夾）
+
+    目的地已有的其他檔案不受影響；同名檔案以原子替換更新，內容未變者（依 files_identical）略過。
+    根目錄的輸出清單在所有其他檔案之後發佈，發佈紀錄最後寫入。
+
+    Args:
+        staging_dir: 本機暫存資料夾
+        dest_dir: 目的資料夾
+        move: 同一檔案系統時以更名取代複製
+
+    Returns:
+        統計資料（directories、published、unchanged、bytes）
+    """
+    stats = {'directories': 0, 'published': 0, 'unchanged': 0, 'bytes': 0}
+    digests = published_digests(dest_dir)
+    files = []
+    for root, dirs, names in os.walk(staging_dir):
+        dirs.sort()
+        relative = os.path.relpath(root, staging_dir)
+        target = os.path.normpath(os.path.join(dest_dir, relative))
+        if not os.path.isdir(target):
+            os.makedirs(target)
+            stats['directories'] += 1
+        files.extend((os.path.join(root, name), os.path.join(target, name),
+                      os.path.normpath(os.path.join(relative, name))) for name in sorted(names))
+
+    # 輸出清單描述整棵樹，最後才發佈，中斷時不會出現指向未發佈檔案的清單
+    files.sort(key=lambda item: os.path.dirname(item[2]) == '' and item[2].startswith(OUTPUT_MANIFEST_NAME))
+    for src, dst, relative in files:
+        sha = file_sha256(src)
+        if files_identical(src, dst, digests.get(relative), sha):
+            stats['unchanged'] += 1
+        else:
+            size = os.path.getsize(src)
+            publish_file(src, dst, move)
+            stats['published'] += 1
+            stats['bytes'] += size
+        dst_stat = os.stat(dst)
+        digests[relative] = (sha, dst_stat.st_size, dst_stat.st_mtime_ns)
+    # 多個發佈同時寫入同一個目的資料夾時，較晚寫入者可能蓋掉其他人的項目；
+    # 被蓋掉的項目修改時間與目的檔不符，只會讓下次重新發佈，不會誤判為未變更
+    write_published_digests(dest_dir, digests)
+    return stats
+
+
+class StagedOutput:
+    """
+    本機暫存輸出
+
+    用法：
+        staging = StagedOutput(output_folder)
+        try:
+            ...寫入 staging.path...
+            staging.publish()
+        finally:
+            staging.cleanup()
+    """
+
+    def __init__(self, dest_dir: str, staging_root: Optional[str] = None):
+        self.dest_dir = dest_dir
+        if staging_root:
+            os.makedirs(staging_root, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix='stage_', dir=staging_root)
+        self.stats: Optional[Dict[str, int]] = None
+
+    def publish(self) -> Dict[str, int]:
+        """一次發佈暫存區的所有檔案"""
+        os.makedirs(self.dest_dir, exist_ok=True)
+        self.stats = publish_tree(self.path, self.dest_dir)
+        return self.stats
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.publish()
+        self.cleanup()
+        return False
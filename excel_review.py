@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+審查流程指令 - 分割後的後續作業
+
+merge：將審查者在分割檔中的修改合併回母檔
+    1. 平行串流讀取所有審查者檔案（不建立 openpyxl 物件）：未隱藏的資料列，以及指定審查者欄位時
+       符合分割篩選條件、但被審查者自行篩選隱藏的資料列；
+       檔案帶有分割時寫入的列指紋時，只取出指紋不符（被修改過）的資料列
+    2. 以鍵欄位建立母檔索引，逐列比對找出被修改的儲存格
+    3. 多位審查者對同一儲存格給出不同值時列為衝突，不寫入
+    4. 所有變更一次寫入母檔副本，並輸出合併報告
+
+status：彙整所有審查者檔案的完成進度
+    1. 平行串流讀取每個檔案，只解析狀態欄位（Status / 狀態）與審查者欄位；資料列的選法與 merge 相同
+    2. 以檔案大小與修改時間快取結果，未變動的檔案不再重新讀取
+    3. 輸出進度活頁簿與 JSON
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.datetime import from_excel, to_excel
+
+from excel_package_tools import filter_changed_rows, normalize_package, package_timestamp, read_sheet_rows, replace_file
+
+# 審查者檔案的副檔名（略過 Office 暫存檔 ~$*.xlsx）
+REVIEW_FILE_EXTENSIONS = ('.xlsx', '.xlsm')
+# 進度彙整：預設的狀態欄位、輸出檔與快取檔名稱
+STATUS_COLUMNS = ('Status', '狀態')
+STATUS_REPORT_NAME = 'review_status'
+STATUS_CACHE_NAME = '.review_status_cache.json'
+
+
+def key_text(value) -> Optional[str]:
+    """鍵值正規化：空白視為無鍵值，整數型浮點數去除小數點"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+
+def values_equal(master_value, new_value) -> bool:
+    """比較母檔與審查者檔案的儲存格值（容許型別差異：日期與序列值、int 與 float、None 與空字串）"""
+    if master_value in (None, '') and new_value in (None, ''):
+        return True
+    if isinstance(master_value, (datetime.datetime, datetime.date)) and isinstance(new_value, (int, float)):
+        master_value = to_excel(master_value)
+    if isinstance(master_value, bool) or isinstance(new_value, bool):
+        return master_value == new_value
+    if isinstance(master_value, (int, float)) and isinstance(new_value, (int, float)):
+        return abs(master_value - new_value) <= 1e-9 * max(1.0, abs(master_value))
+    return str(master_value) == str(new_value)
+
+
+def find_review_files(review_folder: str, exclude: Tuple[str, ...] = ()) -> List[str]:
+    """遞迴找出審查者輸出檔（排除母檔本身與 Office 暫存檔）"""
+    excluded = {os.path.abspath(path) for path in exclude}
+    found = []
+    for root, _, files in os.walk(review_folder):
+        for name in sorted(files):
+            path = os.path.abspath(os.path.join(root, name))
+            if name.startswith('~$') or not name.lower().endswith(REVIEW_FILE_EXTENSIONS) or path in excluded \
+                    or name == f"{STATUS_REPORT_NAME}.xlsx":
+                continue
+            found.append(path)
+    return sorted(found)
+
+
+def select_review_rows(header: Dict[int, str], rows: List[Tuple[int, Dict[int, object], bool]],
+                       filters: Dict[int, Optional[List[str]]], reviewer_column: Optional[str] = None
+                       ) -> Tuple[List[Tuple[int, Dict[int, object]]], str]:
+    """
+    選出審查者自己的資料列（輸入為 read_sheet_rows 的結果）
+
+    分割時被隱藏的其他審查者資料列與審查者自行篩選隱藏的資料列在檔案中無法區分；
+    指定審查者欄位時，依分割時設定在該欄位的篩選值選出資料列（連同未隱藏的列），
+    否則只取未隱藏的列，並在檔案有額外篩選條件時回傳警告
+
+    Returns:
+        ([(Excel 列號, {欄位索引: 值})], 警告訊息)
+    """
+    columns = {name: col for col, name in header.items()}
+    reviewer_col = columns.get(reviewer_column) if reviewer_column else None
+    partition = filters.get(reviewer_col) if reviewer_col is not None else None
+    if partition:
+        allowed = set(partition)
+        return [(number, values) for number, values, hidden in rows
+                if not hidden or str(values.get(reviewer_col)) in allowed], ''
+
+    visible = [(number, values) for number, values, hidden in rows if not hidden]
+    # 分割只在審查者欄位設定一個清單篩選；其他條件是審查者自行設定的
+    extra = filters if reviewer_col is not None else (
+        filters if len(filters) > 1 or any(values is None for values in filters.values()) else {})
+    if extra and any(hidden for _, _, hidden in rows):
+        return visible, '檔案有審查者自行設定的篩選，被篩選隱藏的資料列未合併（請指定審查者欄位或清除篩選）'
+    return visible, ''
+
+
+def read_review_file(file_path: str, key_column: str, reviewer_column: Optional[str] = None
+                     ) -> Tuple[str, List[Tuple[str, Dict[str, object]]], str, str]:
+    """
+    讀取單一審查者檔案中屬於該審查者的資料列（在子行程中執行）
+
+    Args:
+        file_path: 審查者檔案
+        key_column: 鍵欄位
+        reviewer_column: 分割時使用的審查者欄位（提供時依分割篩選條件選列，不受審查者自行篩選影響）
+
+    Returns:
+        (檔案路徑, [(鍵值, {欄位名稱: 值})], 錯誤訊息, 警告訊息)
+    """
+    try:
+        header, rows, filters = read_sheet_rows(file_path)
+        rows, warning = select_review_rows(header, rows, filters, reviewer_column)
+        changed = filter_changed_rows(header, rows)
+        if changed is not None:
+            rows = changed
+    except Exception as e:
+        return file_path, [], str(e), ''
+
+    key_col = next((col for col, name in header.items() if name == key_column), None)
+    if key_col is None:
+        return file_path, [], f"找不到鍵欄位 '{key_column}'", warning
+
+    records = []
+    for _, values in rows:
+        key = key_text(values.get(key_col))
+        if key is None:
+            continue
+        records.append((key, {name: values.get(col) for col, name in header.items() if col != key_col}))
+    return file_path, records, '', warning
+
+
+def merge_review_files(master_path: str, review_folder: str, key_column: str,
+                       output_path: Optional[str] = None, workers: Optional[int] = None,
+                       report_path: Optional[str] = None, reviewer_column: Optional[str] = None) -> Optional[Dict]:
+    """
+    將審查者檔案的修改合併回母檔
+
+    Args:
+        master_path: 母檔路徑
+        review_folder: 審查者輸出資料夾（遞迴搜尋）
+        key_column: 鍵欄位（對應母檔與審查者檔案的資料列）
+        output_path: 合併後的輸出路徑（預設為「母檔名_merged」，與母檔相同時直接覆寫）
+        workers: 平行讀取的行程數
+        report_path: 合併報告路徑（預設為「母檔名_merge_report.xlsx」）
+        reviewer_column: 分割時使用的審查者欄位；提供時審查者自行篩選隱藏的資料列仍會合併
+
+    Returns:
+        統計資料（files、changes、conflicts、unmatched、errors、warnings、output、report）；失敗時回傳 None
+    """
+    stem, ext = os.path.splitext(master_path)
+    output_path = output_path or f"{stem}_merged{ext}"
+    report_path = report_path or f"{stem}_merge_report.xlsx"
+
+    print(f"📁 母檔: {os.path.basename(master_path)}")
+    print(f"📂 審查資料夾: {review_folder}")
+    print(f"🔑 鍵欄位: {key_column}")
+    print("=" * 50)
+
+    if not os.path.exists(master_path):
+        print(f"❌ 找不到檔案: {master_path}")
+        return None
+
+    files = find_review_files(review_folder, exclude=(master_path, output_path, report_path))
+    print(f"✓ 找到 {len(files)} 個審查者檔案")
+
+    wb = load_workbook(master_path, keep_vba=ext.lower() == '.xlsm')
+    ws = wb.active
+    columns = {cell.value: cell.column for cell in ws[1] if cell.value is not None}
+    if key_column not in columns:
+        print(f"❌ 母檔找不到鍵欄位 '{key_column}'")
+        wb.close()
+        return None
+
+    # 鍵值 → 母檔列號（只掃描鍵欄位一次）
+    index = {}
+    duplicated = set()
+    key_col = columns[key_column]
+    key_cells = ws.iter_rows(min_row=2, min_col=key_col, max_col=key_col, values_only=True)
+    for row, (value,) in enumerate(key_cells, start=2):
+        key = key_text(value)
+        if key is None:
+            continue
+        if key in index:
+            duplicated.add(key)
+        index.setdefault(key, row)
+    if duplicated:
+        print(f"⚠️ 母檔鍵值重複，只對應第一列: {', '.join(sorted(duplicated)[:5])}")
+    print(f"✓ 母檔索引: {len(index):,} 列")
+
+    # 平行讀取所有審查者檔案
+    proposals = {}   # (列號, 欄位) → {新值文字: (新值, [檔案])}
+    unmatched = []
+    errors = []
+    warnings = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(read_review_file, files, [key_column] * len(files), [reviewer_column] * len(files),
+                           chunksize=4)
+        for file_path, records, error, warning in results:
+            source = os.path.relpath(file_path, review_folder)
+            if warning:
+                warnings.append({'檔案': source, '警告': warning})
+                print(f"  ⚠️ {source}: {warning}")
+            if error:
+                errors.append({'檔案': source, '錯誤': error})
+                print(f"  ⚠️ {source}: {error}")
+                continue
+            for key, values in records:
+                row = index.get(key)
+                if row is None:
+                    unmatched.append({'檔案': source, key_column: key})
+                    continue
+                for name, new_value in values.items():
+                    col = columns.get(name)
+                    if col is None:
+                        continue
+                    master_value = ws.cell(row=row, column=col).value
+                    if isinstance(master_value, str) and master_value.startswith('='):
+                        continue
+                    if values_equal(master_value, new_value):
+                        continue
+                    candidates = proposals.setdefault((row, col), {})
+                    entry = candidates.setdefault(repr(new_value), (new_value, []))
+                    entry[1].append(source)
+
+    # 套用沒有衝突的變更，一次寫入
+    names = {col: name for name, col in columns.items()}
+    changes = []
+    conflicts = []
+    for (row, col), candidates in sorted(proposals.items()):
+        cell = ws.cell(row=row, column=col)
+        key = key_text(ws.cell(row=row, column=key_col).value)
+        if len(candidates) > 1:
+            for new_value, sources in candidates.values():
+                conflicts.append({key_column: key, '欄位': names[col], '母檔值': cell.value,
+                                  '審查值': new_value, '檔案': ', '.join(sources)})
+            continue
+        new_value, sources = next(iter(candidates.values()))
+        old_value = cell.value
+        if isinstance(old_value, (datetime.datetime, datetime.date)) and isinstance(new_value, (int, float)):
+            new_value = from_excel(new_value)
+        cell.value = new_value
+        changes.append({key_column: key, '欄位': names[col], '原值': old_value,
+                        '新值': new_value, '檔案': ', '.join(sources)})
+
+    if changes:
+        fd, temp_path = tempfile.mkstemp(suffix=ext, dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(fd)
+        try:
+            wb.save(temp_path)
+            normalize_package(temp_path, package_timestamp(master_path))
+            replace_file(temp_path, output_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    wb.close()
+
+    with pd.ExcelWriter(report_path, engine='openpyxl') as writer:
+        pd.DataFrame(changes, columns=[key_column, '欄位', '原值', '新值', '檔案']).to_excel(
+            writer, index=False, sheet_name='變更')
+        pd.DataFrame(conflicts, columns=[key_column, '欄位', '母檔值', '審查值', '檔案']).to_excel(
+            writer, index=False, sheet_name='衝突')
+        pd.DataFrame(unmatched, columns=['檔案', key_column]).to_excel(writer, index=False, sheet_name='未對應')
+        pd.DataFrame(errors, columns=['檔案', '錯誤']).to_excel(writer, index=False, sheet_name='讀取失敗')
+        pd.DataFrame(warnings, columns=['檔案', '警告']).to_excel(writer, index=False, sheet_name='警告')
+    normalize_package(report_path, package_timestamp(master_path))
+
+    conflict_cells = len({(c[key_column], c['欄位']) for c in conflicts})
+    stats = {'files': len(files), 'changes': len(changes), 'conflicts': conflict_cells,
+             'unmatched': len(unmatched), 'errors': len(errors), 'warnings': len(warnings),
+             'output': output_path if changes else None, 'report': report_path}
+
+    print("\n" + "=" * 50)
+    print("✅ 合併完成！")
+    print(f"📊 已套用 {len(changes)} 個儲存格變更")
+    if conflict_cells:
+        print(f"⚠️ 衝突 {conflict_cells} 個儲存格（未寫入，請見報告）")
+    if unmatched:
+        print(f"⚠️ 母檔找不到的資料列: {len(unmatched)} 列")
+    if warnings:
+        print(f"⚠️ 有警告的檔案: {len(warnings)} 個（見報告的「警告」工作表）")
+    if changes:
+        print(f"📁 合併結果: {output_path}")
+    print(f"📄 合併報告: {report_path}")
+    return stats
+
+
+def read_file_status(file_path: str, status_columns: Tuple[str, ...] = STATUS_COLUMNS,
+                     reviewer_column: Optional[str] = None) -> Dict:
+    """
+    讀取單一審查者檔案的完成狀況（在子行程中執行，只解析狀態欄位與審查者欄位）
+
+    資料列的選法與 merge 相同（見 select_review_rows），審查者自行篩選隱藏的列仍計入
+
+    Returns:
+        {'rows', 'completed', 'status_column', 'statuses': {狀態: 列數}, 'error', 'warning'}
+    """
+    result = {'rows': 0, 'completed': 0, 'status_column': None, 'statuses': {}, 'error': '', 'warning': ''}
+    try:
+        columns = tuple(status_columns) + ((reviewer_column,) if reviewer_column else ())
+        header, rows, filters = read_sheet_rows(file_path, column_names=columns)
+    except Exception as e:
+        result['error'] = str(e)
+        return result
+    rows, result['warning'] = select_review_rows(header, rows, filters, reviewer_column)
+
+    found = {name: col for col, name in header.items()}
+    status_column = next((name for name in status_columns if name in found), None)
+    if status_column is None:
+        result['error'] = f"找不到狀態欄位（{' / '.join(status_columns)}）"
+        return result
+
+    col = found[status_column]
+    statuses = Counter()
+    for _, values in rows:
+        value = values.get(col)
+        text = '' if value is None else str(value).strip()
+        statuses[text] += 1
+    result.update(rows=len(rows), completed=len(rows) - statuses.pop('', 0),
+                  status_column=status_column, statuses=dict(statuses))
+    return result
+
+
+def collect_review_status(review_folder: str, status_columns: Tuple[str, ...] = STATUS_COLUMNS,
+                          workers: Optional[int] = None, use_cache: bool = True,
+                          reviewer_column: Optional[str] = None) -> Dict:
+    """
+    彙整資料夾下所有審查者檔案的完成進度，輸出 review_status.xlsx 與 review_status.json
+
+    reviewer_column 為分割時使用的審查者欄位；指定時審查者自行篩選隱藏的資料列仍計入進度
+
+    Returns:
+        彙整結果：generated_at、totals、files（每個檔案一筆）、statuses、cached、read、report、json
+    """
+    status_columns = tuple(status_columns)
+    files = find_review_files(review_folder)
+    cache_path = os.path.join(review_folder, STATUS_CACHE_NAME)
+    cache = {}
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+    # 檔案大小與修改時間都沒變、且狀態欄位設定相同時沿用快取
+    results = {}
+    to_read = []
+    signatures = {}
+    for path in files:
+        relative = os.path.relpath(path, review_folder)
+        stat = os.stat(path)
+        signatures[relative] = [stat.st_size, stat.st_mtime_ns, list(status_columns), reviewer_column]
+        cached = cache.get(relative)
+        if cached and cached.get('signature') == signatures[relative]:
+            results[relative] = cached['result']
+        else:
+            to_read.append(path)
+
+    if to_read:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, result in zip(to_read, pool.map(read_file_status, to_read, [status_columns] * len(to_read),
+                                                      [reviewer_column] * len(to_read), chunksize=4)):
+                results[os.path.relpath(path, review_folder)] = result
+    print(f"✓ 找到 {len(files)} 個審查者檔案（讀取 {len(to_read)} 個，沿用快取 {len(files) - len(to_read)} 個）")
+
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump({relative: {'signature': signatures[relative], 'result': results[relative]}
+                   for relative in results}, f, ensure_ascii=False)
+
+    entries = []
+    statuses = Counter()
+    for relative in sorted(results):
+        result = results[relative]
+        statuses.update(result['statuses'])
+        entries.append({
+            '審查者': os.path.basename(os.path.dirname(relative)) or os.path.splitext(relative)[0],
+            '檔案': relative,
+            '資料列': result['rows'],
+            '已完成': result['completed'],
+            '未完成': result['rows'] - result['completed'],
+            '完成率': round(result['completed'] / result['rows'], 4) if result['rows'] else 0.0,
+            '狀態欄位': result['status_column'] or '',
+            '錯誤': result['error'],
+            '警告': result.get('warning', ''),
+        })
+
+    total_rows = sum(entry['資料列'] for entry in entries)
+    total_completed = sum(entry['已完成'] for entry in entries)
+    summary = {
+        'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'review_folder': os.path.abspath(review_folder),
+        'totals': {
+            'files': len(entries),
+            'rows': total_rows,
+            'completed': total_completed,
+            'pending': total_rows - total_completed,
+            'completion_rate': round(total_completed / total_rows, 4) if total_rows else 0.0,
+            'errors': sum(1 for entry in entries if entry['錯誤']),
+            'warnings': sum(1 for entry in entries if entry['警告']),
+        },
+        'files': entries,
+        'statuses': dict(statuses.most_common()),
+        'cached': len(files) - len(to_read),
+        'read': len(to_read),
+    }
+
+    report_path = os.path.join(review_folder, f"{STATUS_REPORT_NAME}.xlsx")
+    json_path = os.path.join(review_folder, f"{STATUS_REPORT_NAME}.json")
+    columns = ['審查者', '檔案', '資料列', '已完成', '未完成', '完成率', '狀態欄位', '錯誤', '警告']
+    with pd.ExcelWriter(report_path, engine='openpyxl') as writer:
+        pd.DataFrame(entries, columns=columns).to_excel(writer, index=False, sheet_name='審查進度')
+        pd.DataFrame(list(statuses.most_common()), columns=['狀態', '列數']).to_excel(
+            writer, index=False, sheet_name='狀態分布')
+        writer.sheets['審查進度'].freeze_panes = 'A2'
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    summary['report'] = report_path
+    summary['json'] = json_path
+
+    totals = summary['totals']
+    print(f"📊 完成 {totals['completed']:,}/{totals['rows']:,} 列（{totals['completion_rate']:.1%}）")
+    if totals['errors']:
+        print(f"⚠️ {totals['errors']} 個檔案無法讀取或缺少狀態欄位")
+    if totals['warnings']:
+        print(f"⚠️ {totals['warnings']} 個檔案有審查者自行設定的篩選，被隱藏的資料列未計入（請指定審查者欄位）")
+    print(f"📄 進度報告: {report_path}")
+    return summary
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='審查流程指令')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    merge = subcommands.add_parser('merge', help='將審查者的修改合併回母檔')
+    merge.add_argument('master', help='母檔路徑')
+    merge.add_argument('review_folder', help='審查者輸出資料夾')
+    merge.add_argument('--key', required=True, help='鍵欄位（例如 User_ID）')
+    merge.add_argument('--reviewer-column',
+                       help='分割時使用的審查者欄位；指定時審查者自行篩選隱藏的資料列仍會合併')
+    merge.add_argument('--output', help='合併結果路徑（預設：母檔名_merged）')
+    merge.add_argument('--in-place', action='store_true', help='直接覆寫母檔')
+    merge.add_argument('--workers', type=int, help='平行讀取的行程數（預設為 CPU 核心數）')
+
+    status = subcommands.add_parser('status', help='彙整所有審查者檔案的完成進度')
+    status.add_argument('review_folder', help='審查者輸出資料夾')
+    status.add_argument('--status-column', action='append',
+                        help='狀態欄位名稱（可重複指定，預設 Status / 狀態）')
+    status.add_argument('--reviewer-column',
+                        help='分割時使用的審查者欄位；指定時審查者自行篩選隱藏的資料列仍計入進度')
+    status.add_argument('--workers', type=int, help='平行讀取的行程數（預設為 CPU 核心數）')
+    status.add_argument('--no-cache', action='store_true', help='忽略快取，重新讀取所有檔案')
+
+    args = parser.parse_args()
+
+    if args.command == 'merge':
+        output_path = args.master if args.in_place else args.output
+        stats = merge_review_files(args.master, args.review_folder, args.key, output_path, args.workers,
+                                   reviewer_column=args.reviewer_column)
+        sys.exit(0 if stats is not None and stats['errors'] == 0 else 1)
+    elif args.command == 'status':
+        summary = collect_review_status(args.review_folder, tuple(args.status_column or STATUS_COLUMNS),
+                                        args.workers, use_cache=not args.no_cache,
+                                        reviewer_column=args.reviewer_column)
+        sys.exit(0 if summary['totals']['errors'] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
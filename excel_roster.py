@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+審查者名冊對照 - 以本機名冊檔解析審查者 Email
+
+過去每位審查者都要透過 Graph API 以顯示名稱查一次 Email。
+這裡改讀一份本機名冊（姓名、Email、部門、主管），與審查者清單做一次雜湊合併，
+產生所有分享流程（PowerShell 腳本、Notebook）都能讀取的審查者清單，
+找不到的名字另外列出報告。
+"""
+
+import os
+from typing import Dict, Iterable, List, Tuple
+
+import pandas as pd
+
+# 審查者清單與未對應報告的欄位
+MANIFEST_COLUMNS = ['folder', 'reviewer', 'email', 'department', 'manager', 'matched']
+ROSTER_FIELDS = ('name', 'email', 'department', 'manager')
+UNMATCHED_REPORT_NAME = 'unmatched_reviewers.csv'
+
+
+def normalize_person_name(name) -> str:
+    """合併用的比對鍵：去除前後空白、合併連續空白、不分大小寫"""
+    return ' '.join(str(name).split()).casefold()
+
+
+def load_roster(file_path: str, name_column: str = 'Name', email_column: str = 'Email',
+                department_column: str = 'Department', manager_column: str = 'Manager') -> pd.DataFrame:
+    """
+    讀取名冊（CSV 或 Excel）
+
+    部門與主管欄位可省略；同名者只保留第一筆。
+
+    Returns:
+        DataFrame，欄位為 name、email、department、manager、key（比對鍵）
+    """
+    if os.path.splitext(file_path)[1].lower() == '.csv':
+        table = pd.read_csv(file_path, dtype=str)
+    else:
+        table = pd.read_excel(file_path, engine='openpyxl', dtype=str)
+
+    missing = [c for c in (name_column, email_column) if c not in table.columns]
+    if missing:
+        raise ValueError(f"名冊缺少欄位: {', '.join(missing)}")
+
+    columns = dict(zip(ROSTER_FIELDS, (name_column, email_column, department_column, manager_column)))
+    roster = pd.DataFrame({
+        field: table[column].str.strip() if column in table.columns else pd.Series(pd.NA, index=table.index)
+        for field, column in columns.items()
+    })
+    roster = roster.dropna(subset=['name'])
+    roster = roster[roster['name'] != '']
+    roster['key'] = roster['name'].map(normalize_person_name)
+    return roster.drop_duplicates(subset='key', keep='first').reset_index(drop=True)
+
+
+def join_roster(reviewers: Iterable[Tuple[str, str]], roster: pd.DataFrame) -> pd.DataFrame:
+    """
+    將審查者與名冊做一次雜湊合併
+
+    Args:
+        reviewers: [(輸出資料夾, 審查者姓名), ...]
+        roster: load_roster 的結果
+
+    Returns:
+        審查者清單 DataFrame（欄位見 MANIFEST_COLUMNS），未對應者 matched 為 False
+    """
+    wanted = pd.DataFrame(list(reviewers), columns=['folder', 'reviewer'])
+    wanted['key'] = wanted['reviewer'].map(normalize_person_name)
+    manifest = wanted.merge(roster[['key', 'email', 'department', 'manager']], on='key', how='left')
+    manifest['matched'] = manifest['email'].notna() & (manifest['email'] != '')
+    return manifest[MANIFEST_COLUMNS]
+
+
+def write_reviewer_manifest(manifest: pd.DataFrame, folder: str,
+                            manifest_name: str = 'reviewer_manifest.csv',
+                            unmatched_name: str = UNMATCHED_REPORT_NAME) -> Tuple[str, str]:
+    """
+    寫出審查者清單與未對應報告（UTF-8 BOM，Excel 可直接開啟中文）
+
+    Returns:
+        (審查者清單路徑, 未對應報告路徑)；全部對應成功時不寫報告（並移除上次留下的報告），第二項為 None
+    """
+    manifest_path = os.path.join(folder, manifest_name)
+    manifest.to_csv(manifest_path, index=False, encoding='utf-8-sig')
+
+    unmatched = manifest[~manifest['matched']]
+    if unmatched.empty:
+        remove_unmatched_report(folder, unmatched_name)
+        return manifest_path, None
+    unmatched_path = os.path.join(folder, unmatched_name)
+    unmatched[['folder', 'reviewer']].to_csv(unmatched_path, index=False, encoding='utf-8-sig')
+    return manifest_path, unmatched_path
+
+
+def remove_unmatched_report(folder: str, unmatched_name: str = UNMATCHED_REPORT_NAME) -> bool:
+    """
+    移除上次執行留下的未對應報告（全部對應成功時報告已不正確，留著會讓人以為仍有未對應的審查者）
+
+    暫存後發佈的輸出不會刪除目的資料夾的檔案，發佈後需對最終資料夾再呼叫一次
+
+    Returns:
+        是否移除了檔案
+    """
+    try:
+        os.remove(os.path.join(folder, unmatched_name))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def load_reviewer_manifest(manifest_path: str) -> pd.DataFrame:
+    """讀回審查者清單（供 Notebook 等其他分享流程使用）"""
+    manifest = pd.read_csv(manifest_path, dtype=str, encoding='utf-8-sig')
+    manifest['matched'] = manifest['matched'].str.lower() == 'true'
+    return manifest
+
+
+def manifest_email_map(manifest: pd.DataFrame) -> Dict[str, str]:
+    """轉成 {輸出資料夾: Email}，沒有 Email 者為 'N/A'（與分享腳本的慣例一致）"""
+    return {folder: (email if isinstance(email, str) and email else 'N/A')
+            for folder, email in manifest[['folder', 'email']].itertuples(index=False)}
+
+
+def unmatched_reviewers(manifest: pd.DataFrame) -> List[str]:
+    """未在名冊中找到的審查者姓名（去除重複）"""
+    return manifest.loc[~manifest['matched'], 'reviewer'].drop_duplicates().tolist()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+本機分割服務 - 不開 Jupyter 也能從其他工具送出與追蹤分割工作
+
+以標準函式庫的 HTTP 伺服器提供 JSON API（預設只監聽 127.0.0.1）：
+  POST /jobs                 送出工作 {"master", "column", "output", "options": {...}}
+  GET  /jobs                 列出所有工作
+  GET  /jobs/<id>            工作狀態（queued / running / succeeded / failed）與執行紀錄
+  GET  /jobs/<id>/manifest   完成後的 output_manifest.json
+  POST /build               立即產生單一審查者的活頁簿 {"master", "column", "reviewer", "output"}
+  GET  /health               服務狀態
+
+除 /health 外，所有請求都需帶 X-Split-Token 標頭（服務每次啟動時產生，啟動訊息會顯示，
+也可用 --token-file 寫入只有自己能讀的檔案）；POST 需為 Content-Type: application/json，
+瀏覽器中的網頁無法不經 CORS 預檢就送出，避免任何網站借用本機服務讀寫檔案。
+
+工作在常駐的處理程序池中執行：pandas / openpyxl 與分割模組在程序啟動時就已載入，
+每個工作不必再花數秒匯入。母檔與各選項檔案（代理人、組織階層、路由規則、名冊、附件資料夾）
+內容、輸出位置都相同，且輸出清單列出的檔案都還在、內容未變時，直接回報上次的結果，不重新分割。
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from excel_manifest import STATUS_OK, file_sha256, load_output_manifest
+
+# process_excel_file_safe 可由 API 指定的選項
+JOB_OPTIONS = ('processing_method', 'slim_output', 'strip_pivot_cache', 'multi_valued', 'delegates_file',
+               'org_hierarchy_file', 'routing_rules_file', 'fingerprint', 'stage', 'staging_root', 'roster_file',
+               'documents_dir', 'doc_link_mode')
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+# 內容會影響輸出的檔案與資料夾選項（快取鍵使用其內容，而不是路徑）
+FILE_OPTIONS = ('delegates_file', 'org_hierarchy_file', 'routing_rules_file', 'roster_file')
+DIRECTORY_OPTIONS = ('documents_dir',)
+# 每個工作保留的執行紀錄行數
+LOG_LINES = 200
+
+TOKEN_HEADER = 'X-Split-Token'
+
+_JOB_PATH_RE = re.compile(r'^/jobs/([\w-]+)(/manifest)?/?$')
+
+
+def _warm_worker() -> None:
+    """處理程序啟動時先載入分割相關模組"""
+    import excel_splitter_fixed  # noqa: F401
+
+
+def run_split_job(master: str, column: str, output: str, options: Dict) -> Tuple[bool, List[str]]:
+    """
+    在工作程序中執行一次分割
+
+    Returns:
+        (是否成功, 執行紀錄最後 LOG_LINES 行)
+    """
+    from excel_splitter_fixed import process_excel_file_safe
+
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        try:
+            success = bool(process_excel_file_safe(master, column, output, **options))
+        except Exception as e:
+            print(f"❌ 發生錯誤: {e}")
+            success = False
+    return success, buffer.getvalue().splitlines()[-LOG_LINES:]
+
+
+def options_fingerprint(options: Dict) -> Dict:
+    """
+    快取鍵用的選項內容：檔案選項以內容雜湊、資料夾選項以檔案清單（相對路徑、大小、修改時間）取代路徑
+    """
+    fingerprint = dict(options)
+    for name in FILE_OPTIONS:
+        path = options.get(name)
+        if path:
+            fingerprint[name] = [path, file_sha256(path) if os.path.isfile(path) else None]
+    for name in DIRECTORY_OPTIONS:
+        path = options.get(name)
+        if path:
+            listing = []
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for file_name in sorted(files):
+                    stat = os.stat(os.path.join(root, file_name))
+                    listing.append([os.path.relpath(os.path.join(root, file_name), path), stat.st_size,
+                                    stat.st_mtime_ns])
+            fingerprint[name] = [path, listing]
+    return fingerprint
+
+
+def outputs_intact(output_folder: str) -> bool:
+    """輸出清單存在，且其中成功的檔案仍在原位、大小與 SHA-256 都沒有改變"""
+    try:
+        manifest = load_output_manifest(output_folder)
+    except (OSError, ValueError):
+        return False
+    for entry in manifest.get('files', []):
+        if entry.get('status') != STATUS_OK:
+            continue
+        path = os.path.join(output_folder, *entry['folder'].split('/'), entry['filename'])
+        try:
+            if os.path.getsize(path) != entry['bytes'] or file_sha256(path) != entry['sha256']:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+class JobService:
+    """
+    分割工作佇列
+
+    Args:
+        workers: 常駐工作程序數
+    """
+
+    def __init__(self, workers: int = 2):
+        self.workers = max(1, workers)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        self.jobs: Dict[str, Dict] = {}
+        self.completed: Dict[str, str] = {}   # 工作鍵 → 成功的工作 id
+        self._futures = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        # 先送一個空工作讓所有程序啟動並載入模組
+        for _ in range(self.workers):
+            self.pool.submit(_warm_worker)
+
+    def submit(self, request: Dict) -> Dict:
+        """
+        送出工作
+
+        Raises:
+            ValueError: 缺少欄位、母檔不存在或含不支援的選項
+        """
+        master = request.get('master')
+        column = request.get('column')
+        if not master or not column:
+            raise ValueError("需要 master 與 column")
+        if not os.path.isfile(master):
+            raise ValueError(f"找不到母檔: {master}")
+        options = request.get('options') or {}
+        unknown = sorted(set(options) - set(JOB_OPTIONS))
+        if unknown:
+            raise ValueError(f"不支援的選項: {', '.join(unknown)}")
+        master = os.path.abspath(master)
+        output = os.path.abspath(request.get('output') or os.path.join(os.path.dirname(master), 'output'))
+
+        key = json.dumps([file_sha256(master), column, output, options_fingerprint(options)], sort_keys=True,
+                         ensure_ascii=False)
+        with self._lock:
+            job_id = f"job-{next(self._ids)}"
+            job = {'id': job_id, 'master': master, 'column': column, 'output': output, 'options': options,
+                   'status': JOB_QUEUED, 'cached': False, 'submitted': time.time(), 'started': None,
+                   'finished': None, 'log': [], 'error': ''}
+            self.jobs[job_id] = job
+            previous = self.jobs.get(self.completed.get(key, ''))
+
+        if previous and outputs_intact(output):
+            # 相同母檔與選項檔案內容、輸出位置已成功分割過，輸出檔也都沒有被移動或修改
+            with self._lock:
+                job.update(status=JOB_SUCCEEDED, cached=True, started=job['submitted'], finished=time.time(),
+                           log=[f"與 {previous['id']} 相同，沿用既有輸出"])
+            return self.snapshot(job_id)
+
+        future = self.pool.submit(run_split_job, master, column, output, options)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda done: self._finish(job_id, key, done))
+        return self.snapshot(job_id)
+
+    def _finish(self, job_id: str, key: str, future) -> None:
+        try:
+            success, log = future.result()
+            error = '' if success else '分割失敗，詳見 log'
+        except Exception as e:
+            success, log, error = False, [], str(e)
+        with self._lock:
+            self._futures.pop(job_id, None)
+            job = self.jobs[job_id]
+            job.update(status=JOB_SUCCEEDED if success else JOB_FAILED, finished=time.time(), log=log, error=error)
+            if job['started'] is None:
+                job['started'] = job['finished']
+            if success:
+                self.completed[key] = job_id
+
+    def snapshot(self, job_id: str) -> Optional[Dict]:
+        """工作狀態（複本）"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            future = self._futures.get(job_id)
+            if job['status'] == JOB_QUEUED and future is not None and future.running():
+                # 已交給工作程序（開始時間以第一次查詢到為準）
+                job.update(status=JOB_RUNNING, started=time.time())
+            result = dict(job)
+        if result['started'] and result['finished']:
+            result['seconds'] = round(result['finished'] - result['started'], 3)
+        return result
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            ids = list(self.jobs)
+        return [{k: v for k, v in self.snapshot(job_id).items() if k != 'log'} for job_id in ids]
+
+    def manifest(self, job_id: str) -> Optional[Dict]:
+        """成功工作的輸出清單；工作不存在或尚未成功時回傳 None"""
+        job = self.snapshot(job_id)
+        if job is None or job['status'] != JOB_SUCCEEDED:
+            return None
+        return load_output_manifest(job['output'])
+
+    def wait(self, job_id: str, timeout: float = 60.0) -> Optional[Dict]:
+        """等待工作結束（內嵌使用時以程式呼叫）"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.snapshot(job_id)
+            if job is None or job['status'] in (JOB_SUCCEEDED, JOB_FAILED):
+                return job
+            time.sleep(0.05)
+        return self.snapshot(job_id)
+
+    def build(self, request: Dict) -> Dict:
+        """
+        以快取的分割索引產生單一審查者的活頁簿（見 excel_build）
+
+        Raises:
+            ValueError: 缺少欄位、母檔不存在或找不到審查者
+        """
+        from excel_build import ReviewerBuilder
+
+        master = request.get('master')
+        column = request.get('column')
+        reviewer = request.get('reviewer')
+        if not master or not column or reviewer is None:
+            raise ValueError("需要 master、column 與 reviewer")
+        if not os.path.isfile(master):
+            raise ValueError(f"找不到母檔: {master}")
+        with self._build_lock:
+            builder = ReviewerBuilder(master, column, request.get('method', 'hide_rows'),
+                                      bool(request.get('multi_valued')), request.get('cache_dir'),
+                                      slim_output=bool(request.get('slim_output')),
+                                      strip_pivot_cache=bool(request.get('strip_pivot_cache')))
+            return builder.build(reviewer, request.get('output'))
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON API；service 由伺服器物件提供"""
+
+    server_version = 'ExcelSplitService/1.0'
+
+    def _send(self, status: int, payload) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        token = self.headers.get(TOKEN_HEADER, '')
+        if secrets.compare_digest(token.encode('utf-8'), self.server.token.encode('utf-8')):
+            return True
+        self._send(401, {'error': f'需要有效的 {TOKEN_HEADER} 標頭'})
+        return False
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path.rstrip('/') == '/health':
+            self._send(200, {'status': 'ok', 'workers': service.workers, 'jobs': len(service.jobs)})
+            return
+        if not self._authorized():
+            return
+        if self.path.rstrip('/') == '/jobs':
+            self._send(200, service.list_jobs())
+            return
+        match = _JOB_PATH_RE.match(self.path)
+        if not match:
+            self._send(404, {'error': '找不到路徑'})
+            return
+        job = service.snapshot(match.group(1))
+        if job is None:
+            self._send(404, {'error': '找不到工作'})
+        elif match.group(2):
+            try:
+                manifest = service.manifest(job['id'])
+            except (OSError, ValueError) as e:
+                self._send(500, {'error': f"無法讀取輸出清單: {e}"})
+                return
+            if manifest is None:
+                self._send(409, {'error': f"工作狀態為 {job['status']}，尚無輸出清單"})
+            else:
+                self._send(200, manifest)
+        else:
+            self._send(200, job)
+
+    def do_POST(self):
+        path = self.path.rstrip('/')
+        if path not in ('/jobs', '/build'):
+            self._send(404, {'error': '找不到路徑'})
+            return
+        if not self._authorized():
+            return
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._send(415, {'error': '需要 Content-Type: application/json'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("需要 JSON 物件")
+            if path == '/build':
+                self._send(200, self.server.service.build(request))
+            else:
+                self._send(202, self.server.service.submit(request))
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            # 例如母檔或輸出資料夾無法讀寫：回報錯誤而不是中斷連線
+            self._send(500, {'error': str(e) or type(e).__name__})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(host: str = '127.0.0.1', port: int = 8765, workers: int = 2,
+                  verbose: bool = True, token: Optional[str] = None) -> ThreadingHTTPServer:
+    """
+    建立伺服器（port=0 時自動選擇可用連接埠）
+
+    token 未提供時每次啟動隨機產生，存於 server.token
+    """
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.service = JobService(workers)
+    server.verbose = verbose
+    server.token = token or secrets.token_urlsafe(24)
+    return server
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='本機分割服務（JSON API）')
+    parser.add_argument('--host', default='127.0.0.1', help='監聽位址（預設只接受本機連線）')
+    parser.add_argument('--port', type=int, default=8765, help='連接埠（預設 8765）')
+    parser.add_argument('--workers', type=int, default=2, help='常駐工作程序數')
+    parser.add_argument('--token-file', help='將本次啟動的存取權杖寫入此檔案（權限 0600）')
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.workers)
+    host, port = server.server_address[:2]
+    if args.token_file:
+        fd = os.open(args.token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(server.token)
+    print(f"🚀 分割服務已啟動: http://{host}:{port}（{args.workers} 個工作程序）")
+    print(f"🔑 存取權杖: {server.token}")
+    print(f"   送出工作: curl -X POST http://{host}:{port}/jobs -H '{TOKEN_HEADER}: <權杖>' "
+          f"-H 'Content-Type: application/json' -d '{{\"master\": \"data.xlsx\", \"column\": \"Reviewer\"}}'")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ 停止服務")
+    finally:
+        server.server_close()
+        server.service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
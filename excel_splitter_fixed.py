@@ -10,10 +10,28 @@ import pandas as pd
 from pathlib import Path
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
-import glob
+from openpyxl.cell.cell import MergedCell
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import re
+import tempfile
+import time
+
+from excel_package_tools import (FINGERPRINT_COLUMN, ROW_ID_COLUMN, active_sheet_name, hide_rows_in_package,
+                                 normalize_package, package_timestamp, row_fingerprint, slim_workbook_package,
+                                 strip_pivot_caches)
+from excel_worksheet_analysis import ExcelWorksheetAnalyzer
+from excel_documents import (LINK_MODES, PDF_PATTERNS, WORD_PATTERNS, DocumentDistributor, distribute_files,
+                              resolve_documents)
+from excel_partition import (DEFAULT_SEPARATORS, NO_SPLIT, build_reviewer_incidence, build_rollup_partitions,
+                             incidence_to_partitions, load_delegate_table, load_org_hierarchy,
+                             load_routing_rules, split_reviewer_names)
+from excel_publish import StagedOutput
+from excel_manifest import STATUS_FAILED, STATUS_INVALID, STATUS_OK, manifest_entry, write_output_manifest
+from excel_roster import load_roster, normalize_person_name
+
+# 主管彙總檔的輸出子資料夾
+ROLLUP_FOLDER_NAME = '主管彙總'
 
 def sanitize_folder_name(name: str) -> str:
     """清理資料夾名稱，確保相容性"""
@@ -27,6 +45,10 @@ def sanitize_folder_name(name: str) -> str:
     if len(sanitized) > 255:
         sanitized = sanitized[:255].rstrip()
     
+    # 空白、. 與 .. 不是可用的資料夾名稱（.. 會指向上一層）
+    if sanitized in ('', '.', '..'):
+        sanitized = '_'
+    
     return sanitized
 
 def find_column(worksheet, column_name):
@@ -36,10 +58,55 @@ def find_column(worksheet, column_name):
             return col_idx
     raise ValueError(f"找不到 '{column_name}' 欄位！")
 
-def process_reviewer_excel_hide_rows(file_path, reviewer, column_name, output_folder):
+def add_fingerprint_columns(ws):
+    """
+    在工作表最右側附加隱藏的列編號與指紋欄位（依目前的原始值計算）
+
+    Returns:
+        (列編號欄位索引, 指紋欄位索引)
+    """
+    max_col = ws.max_column
+    row_id_col, fingerprint_col = max_col + 1, max_col + 2
+    ws.cell(row=1, column=row_id_col, value=ROW_ID_COLUMN)
+    ws.cell(row=1, column=fingerprint_col, value=FINGERPRINT_COLUMN)
+    for row, values in enumerate(ws.iter_rows(min_row=2, max_col=max_col, values_only=True), start=2):
+        ws.cell(row=row, column=row_id_col, value=row)
+        ws.cell(row=row, column=fingerprint_col, value=row_fingerprint(values))
+    for col in (row_id_col, fingerprint_col):
+        ws.column_dimensions[get_column_letter(col)].hidden = True
+    return row_id_col, fingerprint_col
+
+
+def write_fingerprinted_master(file_path, column_name, dest_dir):
+    """
+    在暫存資料夾建立附加指紋欄位的母檔副本（檔名不變，輸出檔名因此與原本相同）
+
+    所有標題列含審查者欄位的工作表都會加上指紋欄位
+    """
+    dest_path = os.path.join(dest_dir, os.path.basename(file_path))
+    wb = load_workbook(file_path, data_only=False, keep_vba=True, keep_links=True)
+    try:
+        sheets = 0
+        for ws in wb.worksheets:
+            if any(cell.value == column_name for cell in ws[1]):
+                add_fingerprint_columns(ws)
+                sheets += 1
+        wb.save(dest_path)
+    finally:
+        wb.close()
+    print(f"✓ 已寫入列指紋欄位: {sheets} 個工作表")
+    return dest_path
+
+
+def process_reviewer_excel_hide_rows(file_path, reviewer, column_name, output_folder, exclude_rows=False,
+                                     keep_rows=None):
     """
     使用隱藏列方法處理 Excel（保留檔案完整性）
     這是解決檔案格式問題的核心方法
+
+    exclude_rows=True 時另外清空被隱藏列的內容（列位置不變，不會破壞公式與資料驗證），
+    其他審查者的資料不會留在輸出檔中
+    keep_rows 為預先算好的保留列號（多值儲存格 / 代理人分派），提供時不再逐列比對審查者欄位
     """
     try:
         # 清理審查者名稱
@@ -68,17 +135,28 @@ def process_reviewer_excel_hide_rows(file_path, reviewer, column_name, output_fo
         col_idx = find_column(main_ws, column_name)
         
         # 隱藏不相關的列（而非刪除）
-        rows_to_hide = []
-        for row in range(2, main_ws.max_row + 1):
-            cell_value = main_ws.cell(row=row, column=col_idx).value
-            if str(cell_value) != str(reviewer):
-                rows_to_hide.append(row)
+        filter_values = [str(reviewer)]
+        if keep_rows is not None:
+            rows_to_hide = [row for row in range(2, main_ws.max_row + 1) if row not in keep_rows]
+            # 篩選條件改為保留列中實際出現的儲存格值（例如「Alice; Bob」）
+            kept_values = {str(main_ws.cell(row=row, column=col_idx).value) for row in keep_rows}
+            filter_values = sorted(kept_values) or filter_values
+        else:
+            rows_to_hide = []
+            for row in range(2, main_ws.max_row + 1):
+                cell_value = main_ws.cell(row=row, column=col_idx).value
+                if str(cell_value) != str(reviewer):
+                    rows_to_hide.append(row)
         
         print(f"  ✓ 找到 {len(rows_to_hide)} 列需要隱藏")
         
         # 隱藏非相關列
         for row in rows_to_hide:
             main_ws.row_dimensions[row].hidden = True
+            if exclude_rows:
+                for cell in main_ws[row]:
+                    if not isinstance(cell, MergedCell):
+                        cell.value = None
         
         # 設定自動篩選（可選）
         if main_ws.max_row > 1:
@@ -87,7 +165,7 @@ def process_reviewer_excel_hide_rows(file_path, reviewer, column_name, output_fo
             
             # 設定篩選條件
             try:
-                main_ws.auto_filter.add_filter_column(col_idx - 1, [str(reviewer)])
+                main_ws.auto_filter.add_filter_column(col_idx - 1, filter_values)
             except Exception as e:
                 print(f"  ⚠️ 無法設定自動篩選: {e}")
         
@@ -153,6 +231,137 @@ def process_reviewer_excel_minimal_impact(file_path, reviewer, column_name, outp
         print(f"❌ 處理 {reviewer} 的檔案時發生錯誤: {str(e)}")
         return False, None, None
 
+def process_reviewer_excel_xlsm_passthrough(file_path, reviewer, column_name, output_folder, exclude_rows=False,
+                                            keep_rows=None):
+    """
+    .xlsm 巨集保留快速路徑 - 只改寫資料工作表 XML
+    vbaProject.bin、數位簽章與 customUI 部件逐位元組保留，不經過 openpyxl
+    """
+    try:
+        reviewer_name = sanitize_folder_name(str(reviewer).strip())
+        reviewer_folder = os.path.join(output_folder, reviewer_name)
+        os.makedirs(reviewer_folder, exist_ok=True)
+        
+        base_name = os.path.basename(file_path)
+        name_without_ext = os.path.splitext(base_name)[0]
+        ext = os.path.splitext(base_name)[1]
+        new_filename = f"{name_without_ext} - {reviewer_name}{ext}"
+        dst_path = os.path.join(reviewer_folder, new_filename)
+        
+        stats = hide_rows_in_package(file_path, dst_path, column_name, reviewer, exclude_rows=exclude_rows,
+                                     keep_rows=keep_rows)
+        print(f"  ✓ 已建立檔案: {new_filename}")
+        print(f"  ✓ 找到 {stats['rows_hidden']} 列需要隱藏")
+        print(f"  ✓ 已處理完成，巨集與簽章部件原封保留")
+        
+        return True, reviewer_folder, new_filename
+        
+    except Exception as e:
+        print(f"❌ 處理 {reviewer} 的檔案時發生錯誤: {str(e)}")
+        return False, None, None
+
+def build_multi_sheet_partition(file_path, column_name, multi_valued=False, delegates=None):
+    """
+    多工作表分割索引 - 只載入母檔一次
+    
+    以 ExcelWorksheetAnalyzer 將工作表分為資料表與查詢表，並在同一次掃描中
+    記錄每個資料表各審查者所屬的列；所有資料列預設為隱藏，查詢表完全不動
+    multi_valued / delegates 啟用時，一個儲存格可分派給多位審查者及其代理人
+    
+    Returns:
+        {'workbook', 'data_sheets': {工作表: 欄位索引}, 'lookup_sheets',
+         'rows': {工作表: {審查者: [列號]}}, 'filter_values': {工作表: {審查者: [儲存格值]}}, 'reviewers'}
+    """
+    wb = load_workbook(file_path, data_only=False, keep_vba=True, keep_links=True)
+    analyzer = ExcelWorksheetAnalyzer(file_path, workbook=wb)
+    classification = analyzer.classify_sheets(column_name)
+    
+    if not classification['data_sheets']:
+        raise ValueError(f"找不到含 '{column_name}' 欄位的資料工作表！")
+    
+    rows = {}
+    filter_values = {}
+    reviewers = []
+    seen = set()
+    for sheet_name, col_idx in classification['data_sheets'].items():
+        ws = wb[sheet_name]
+        sheet_rows = {}
+        sheet_filters = {}
+        values = ws.iter_rows(min_row=2, min_col=col_idx, max_col=col_idx, values_only=True)
+        for row_idx, (value,) in enumerate(values, start=2):
+            ws.row_dimensions[row_idx].hidden = True
+            if value is None:
+                continue
+            keys = split_reviewer_names(value) if multi_valued else [str(value)]
+            for name in list(keys):
+                keys.extend(d for d in (delegates or {}).get(name, []) if d not in keys)
+            for key in keys:
+                sheet_rows.setdefault(key, []).append(row_idx)
+                key_filters = sheet_filters.setdefault(key, [])
+                if str(value) not in key_filters:
+                    key_filters.append(str(value))
+                if key not in seen:
+                    seen.add(key)
+                    reviewers.append(key if (multi_valued or delegates) else value)
+        rows[sheet_name] = sheet_rows
+        filter_values[sheet_name] = sheet_filters
+    
+    return {
+        'workbook': wb,
+        'data_sheets': classification['data_sheets'],
+        'lookup_sheets': classification['lookup_sheets'],
+        'rows': rows,
+        'filter_values': filter_values,
+        'reviewers': reviewers,
+    }
+
+def process_reviewer_excel_multi_sheet(partition, file_path, reviewer, output_folder):
+    """
+    多工作表隱藏列方法 - 沿用已載入的活頁簿與分割索引
+    只切換該審查者所屬列的隱藏狀態，所有資料表一次輸出到同一個檔案
+    """
+    wb = partition['workbook']
+    key = str(reviewer)
+    try:
+        reviewer_name = sanitize_folder_name(key.strip())
+        reviewer_folder = os.path.join(output_folder, reviewer_name)
+        os.makedirs(reviewer_folder, exist_ok=True)
+        
+        base_name = os.path.basename(file_path)
+        name_without_ext = os.path.splitext(base_name)[0]
+        ext = os.path.splitext(base_name)[1]
+        new_filename = f"{name_without_ext} - {reviewer_name}{ext}"
+        dst_path = os.path.join(reviewer_folder, new_filename)
+        
+        for sheet_name, col_idx in partition['data_sheets'].items():
+            ws = wb[sheet_name]
+            own_rows = partition['rows'][sheet_name].get(key, [])
+            for row in own_rows:
+                ws.row_dimensions[row].hidden = False
+            print(f"  ✓ {sheet_name}: 顯示 {len(own_rows)} 列")
+            
+            if ws.max_row > 1:
+                ws.auto_filter.ref = f"A1:{get_column_letter(ws.max_column)}{ws.max_row}"
+                ws.auto_filter.filterColumn = []
+                ws.auto_filter.add_filter_column(
+                    col_idx - 1, partition['filter_values'][sheet_name].get(key, [key]))
+        
+        wb.save(dst_path)
+        print(f"  ✓ 已建立檔案: {new_filename}")
+        
+        return True, reviewer_folder, new_filename
+        
+    except Exception as e:
+        print(f"❌ 處理 {reviewer} 的檔案時發生錯誤: {str(e)}")
+        return False, None, None
+    
+    finally:
+        # 還原為全部隱藏，供下一位審查者使用
+        for sheet_name in partition['data_sheets']:
+            ws = wb[sheet_name]
+            for row in partition['rows'][sheet_name].get(key, []):
+                ws.row_dimensions[row].hidden = True
+
 def validate_excel_file(file_path):
     """驗證 Excel 檔案的完整性"""
     try:
@@ -173,34 +382,29 @@ def validate_excel_file(file_path):
         print(f"檔案驗證失敗: {e}")
         return {'validation_error': str(e)}
 
-def copy_selected_documents(source_dir, dest_dir, copy_word=True, copy_pdf=True):
-    """複製選定的文件類型"""
-    copied_files = []
-    
-    if copy_word:
-        word_patterns = [
-            os.path.join(source_dir, "*.docx"),
-            os.path.join(source_dir, "*.doc")
-        ]
-        
-        for pattern in word_patterns:
-            for file in glob.glob(pattern):
-                if os.path.isfile(file):
-                    dest_path = os.path.join(dest_dir, os.path.basename(file))
-                    shutil.copy2(file, dest_path)
-                    copied_files.append(os.path.basename(file))
-    
-    if copy_pdf:
-        pdf_pattern = os.path.join(source_dir, "*.pdf")
-        for file in glob.glob(pdf_pattern):
-            if os.path.isfile(file):
-                dest_path = os.path.join(dest_dir, os.path.basename(file))
-                shutil.copy2(file, dest_path)
-                copied_files.append(os.path.basename(file))
-    
-    return copied_files
+def list_selected_documents(source_dir, copy_word=True, copy_pdf=True):
+    """列出選定類型的文件（每次處理只需 glob 一次）"""
+    patterns = (WORD_PATTERNS if copy_word else ()) + (PDF_PATTERNS if copy_pdf else ())
+    return resolve_documents(source_dir, patterns)
 
-def process_excel_file_safe(file_path, column_name, output_folder, processing_method='hide_rows'):
+def copy_selected_documents(source_dir, dest_dir, copy_word=True, copy_pdf=True, link_mode='copy', stats=None,
+                            documents=None):
+    """
+    複製選定的文件類型
+
+    link_mode 為 'auto' / 'reflink' / 'hardlink' 時以 reflink 或硬連結分發（不支援時改為一般複製），
+    stats（DistributionStats）會累計節省的寫入位元組數。
+    documents 為 list_selected_documents 的結果時不再重新 glob；目的檔大小與修改時間相同時略過。
+    """
+    if documents is None:
+        documents = list_selected_documents(source_dir, copy_word, copy_pdf)
+    return distribute_files(documents, dest_dir, link_mode, stats)
+
+def process_excel_file_safe(file_path, column_name, output_folder, processing_method='hide_rows',
+                            slim_output=False, strip_pivot_cache=False, multi_valued=False,
+                            delegates_file=None, org_hierarchy_file=None, routing_rules_file=None,
+                            fingerprint=False, stage=False, staging_root=None, roster_file=None,
+                            documents_dir=None, doc_link_mode='copy'):
     """
     安全的 Excel 處理主函數 - 避免檔案格式問題
     
@@ -208,12 +412,42 @@ def process_excel_file_safe(file_path, column_name, output_folder, processing_me
         file_path: Excel 檔案路徑
         column_name: 審查者欄位名稱
         output_folder: 輸出資料夾
-        processing_method: 處理方法 ('hide_rows', 'filter_only', 'minimal')
+        processing_method: 處理方法 ('hide_rows', 'exclude_rows', 'xlsm_passthrough', 'multi_sheet', 'filter_only', 'minimal')
+            .xlsm 檔案使用 hide_rows / exclude_rows 時自動改走 xlsm_passthrough 快速路徑
+            multi_sheet 會分割所有含審查者欄位的工作表，並完整保留被資料驗證引用的查詢表
+        slim_output: 是否對輸出檔瘦身（重建共用字串與樣式表、移除縮圖與孤立部件）
+        strip_pivot_cache: 是否移除樞紐分析表快取記錄與欄位項目（開啟時重新整理，不再內嵌完整資料；
+            工作表上樞紐分析表已顯示的儲存格值要等 Excel 開啟重新整理後才會更新）
+        multi_valued: 審查者儲存格可能列出多人（以分號或換行分隔），每人各得一份
+        delegates_file: 代理人對照表（CSV/Excel，欄位 Reviewer、Delegate），資料列同時分派給代理人
+        org_hierarchy_file: 組織階層表（CSV/Excel，欄位 Name、Manager），同一次執行另外輸出
+            每位主管的彙總檔（含所有直屬與間接部屬的資料列）至「主管彙總」資料夾
+        routing_rules_file: 路由規則表（CSV/Excel，欄位 Rule、Route，例如 "金額 > 30000" → 財務），
+            命中規則的資料列另外分派給規則指定的審查者
+        fingerprint: 輸出檔附加隱藏的 _row_id（母檔列號）與 _fingerprint（原始列值雜湊）欄位，
+            合併與稽核時不必載入母檔即可找出被修改的資料列
+        stage: 先在本機暫存資料夾產生所有輸出，完成後一次發佈到輸出資料夾（每個檔案原子替換），
+            適合輸出到 SharePoint / OneDrive 同步資料夾
+        staging_root: 暫存資料夾的位置（預設為系統暫存目錄；指定時隱含 stage）
+        roster_file: 審查者名冊（CSV/Excel，欄位 Name、Email），輸出清單的 Email 來源；
+            未提供時使用母檔的 Email Address 欄位（如有）
+        documents_dir: 附件文件資料夾，其中的 Word/PDF 文件會分發到每個輸出資料夾
+        doc_link_mode: 附件分發方式（'copy'、'auto'、'reflink'、'hardlink'）
+
+    完成後於輸出資料夾寫出 output_manifest.json / output_manifest.csv（每個輸出檔一筆：
+    資料夾、檔名、資料列數、位元組數、SHA-256、Email、附件與狀態），供上傳、分享與稽核工具直接讀取
     """
     print(f"📁 處理檔案: {os.path.basename(file_path)}")
     print(f"📊 審查者欄位: {column_name}")
     print(f"📂 輸出資料夾: {output_folder}")
     print(f"🔧 處理方法: {processing_method}")
+    if slim_output:
+        print("🗜️ 輸出瘦身: 開啟")
+    if strip_pivot_cache:
+        print("📊 移除樞紐分析表快取: 開啟")
+    stage = stage or bool(staging_root)
+    if stage:
+        print("📦 本機暫存後批次發佈: 開啟")
     print("=" * 50)
     
     # 驗證輸入檔案
@@ -227,57 +461,219 @@ def process_excel_file_safe(file_path, column_name, output_folder, processing_me
         print(f"❌ 檔案驗證失敗: {validation['validation_error']}")
         return False
     
+    # .xlsm 改走巨集保留快速路徑，避免 openpyxl 重寫破壞已簽章的 vbaProject
+    exclude_rows = processing_method == 'exclude_rows'
+    if os.path.splitext(file_path)[1].lower() == '.xlsm' and processing_method in ('hide_rows', 'exclude_rows'):
+        processing_method = 'xlsm_passthrough'
+        print("🔒 偵測到 .xlsm，改用巨集保留快速路徑")
+    
+    publish_folder = output_folder
+    staging = StagedOutput(output_folder, staging_root) if stage else None
+    if staging:
+        output_folder = staging.path
+    
+    fingerprint_dir = None
+    if fingerprint and processing_method == 'xlsm_passthrough':
+        print("⚠️ 巨集保留快速路徑不改寫儲存格，略過列指紋欄位")
+    elif fingerprint:
+        fingerprint_dir = tempfile.mkdtemp(prefix='fingerprint_')
+    
+    # 輸出檔的 docProps 時間取自母檔（在加入指紋欄位前讀取），相同母檔兩次分割的輸出逐位元組相同
+    package_time = package_timestamp(file_path)
+    distributor = None
+    
     try:
-        # 讀取 Excel 檔案
-        df = pd.read_excel(file_path, engine='openpyxl')
-        
-        if column_name not in df.columns:
-            print(f"❌ 找不到欄位 '{column_name}'")
-            print(f"可用欄位: {', '.join(df.columns)}")
-            return False
-        
-        # 取得唯一審查者
-        reviewers = df[column_name].dropna().unique().tolist()
+        if fingerprint_dir:
+            file_path = write_fingerprinted_master(file_path, column_name, fingerprint_dir)
+        
+        delegates = load_delegate_table(delegates_file) if delegates_file else None
+        if delegates:
+            print(f"✓ 載入代理人對照表: {sum(len(v) for v in delegates.values())} 筆")
+        hierarchy = load_org_hierarchy(org_hierarchy_file) if org_hierarchy_file else None
+        if hierarchy and processing_method not in ('hide_rows', 'exclude_rows', 'xlsm_passthrough'):
+            print(f"⚠️ {processing_method} 方法不支援主管彙總，略過組織階層表")
+            hierarchy = None
+        routing_rules = load_routing_rules(routing_rules_file) if routing_rules_file else None
+        if routing_rules and processing_method not in ('hide_rows', 'exclude_rows', 'xlsm_passthrough'):
+            print(f"⚠️ {processing_method} 方法不支援路由規則，略過路由規則表")
+            routing_rules = None
+        elif routing_rules:
+            print(f"✓ 載入路由規則: {len(routing_rules)} 條")
+        fan_out = multi_valued or bool(delegates) or bool(hierarchy) or bool(routing_rules)
+        partitions = None
+        reviewer_counts = None
+        emails = {}
+        
+        if processing_method == 'multi_sheet':
+            # 一次載入、一次掃描所有資料表
+            partition = build_multi_sheet_partition(file_path, column_name, multi_valued, delegates)
+            reviewers = partition['reviewers']
+            print(f"✓ 資料工作表: {', '.join(partition['data_sheets'])}")
+            if partition['lookup_sheets']:
+                print(f"✓ 保留查詢工作表: {', '.join(partition['lookup_sheets'])}")
+        else:
+            # 讀取作用中工作表（各審查者的列號套用在 openpyxl 的 wb.active 上，不一定是第一張工作表）
+            df = pd.read_excel(file_path, engine='openpyxl', sheet_name=active_sheet_name(file_path))
+            
+            if column_name not in df.columns:
+                print(f"❌ 找不到欄位 '{column_name}'")
+                print(f"可用欄位: {', '.join(df.columns)}")
+                return False
+            
+            if 'Email Address' in df.columns:
+                assigned = df[[column_name, 'Email Address']].dropna()
+                emails = {normalize_person_name(name): str(email).strip()
+                          for name, email in zip(assigned[column_name], assigned['Email Address'])}
+            
+            if fan_out:
+                # 一次建立資料列 ↔ 審查者關聯，之後每位審查者直接取用
+                separators = DEFAULT_SEPARATORS if multi_valued else NO_SPLIT
+                incidence = build_reviewer_incidence(df, column_name, delegates, separators, routing_rules)
+                if routing_rules:
+                    routed = incidence[incidence['source'] == 'rule'].groupby('reviewer', sort=False).size()
+                    for route, count in routed.items():
+                        print(f"  ↪ 規則分派 {route}: {count} 列")
+                partitions = incidence_to_partitions(incidence)
+                reviewers = list(partitions)
+            else:
+                # 取得唯一審查者
+                reviewers = df[column_name].dropna().unique().tolist()
+                reviewer_counts = df[column_name].value_counts()
         print(f"✓ 找到 {len(reviewers)} 位審查者")
         
+        # 輸出工作：(名稱, 輸出資料夾, 保留列)
+        jobs = [(reviewer, output_folder, set(partitions[reviewer]) if partitions is not None else None)
+                for reviewer in reviewers]
+        if hierarchy:
+            rollups = build_rollup_partitions(partitions, hierarchy)
+            rollup_folder = os.path.join(output_folder, ROLLUP_FOLDER_NAME)
+            jobs.extend((manager, rollup_folder, set(rows)) for manager, rows in rollups.items())
+            print(f"✓ 主管彙總: {len(rollups)} 位主管")
+        
+        if roster_file:
+            roster = load_roster(roster_file)
+            emails.update(zip(roster['key'], roster['email'].fillna('')))
+            print(f"✓ 載入審查者名冊: {len(roster)} 人")
+        
+        def job_rows(reviewer, keep_rows):
+            if keep_rows is not None:
+                return len(keep_rows)
+            if processing_method == 'multi_sheet':
+                return sum(len(sheet_rows.get(str(reviewer), [])) for sheet_rows in partition['rows'].values())
+            return int(reviewer_counts.get(reviewer, 0)) if reviewer_counts is not None else None
+        
+        # 附件文件只列出一次，由背景執行緒分發到各輸出資料夾
+        if documents_dir:
+            distributor = DocumentDistributor(list_selected_documents(documents_dir), doc_link_mode)
+            print(f"✓ 附件文件: {len(distributor.files)} 個")
+        
         # 處理每位審查者
         processed = 0
         failed = 0
+        bytes_saved = 0
+        manifest = []
+        document_folders = []
         
-        for i, reviewer in enumerate(reviewers):
-            print(f"\n📝 處理中: {reviewer} ({i+1}/{len(reviewers)})")
+        for i, (reviewer, job_folder, keep_rows) in enumerate(jobs):
+            print(f"\n📝 處理中: {reviewer} ({i+1}/{len(jobs)})")
             
             # 根據選擇的方法處理
             if processing_method == 'minimal':
                 success, folder_path, filename = process_reviewer_excel_minimal_impact(
                     file_path, reviewer, column_name, output_folder
                 )
+            elif processing_method == 'multi_sheet':
+                success, folder_path, filename = process_reviewer_excel_multi_sheet(
+                    partition, file_path, reviewer, output_folder
+                )
+            elif processing_method == 'xlsm_passthrough':
+                success, folder_path, filename = process_reviewer_excel_xlsm_passthrough(
+                    file_path, reviewer, column_name, job_folder, exclude_rows=exclude_rows,
+                    keep_rows=keep_rows
+                )
             else:  # 預設使用隱藏列方法
                 success, folder_path, filename = process_reviewer_excel_hide_rows(
-                    file_path, reviewer, column_name, output_folder
+                    file_path, reviewer, column_name, job_folder, exclude_rows=exclude_rows,
+                    keep_rows=keep_rows
                 )
             
             if success:
                 # 驗證輸出檔案
                 output_file_path = os.path.join(folder_path, filename)
+                
+                if strip_pivot_cache:
+                    try:
+                        pivot_stats = strip_pivot_caches(output_file_path)
+                        bytes_saved += pivot_stats['bytes_before'] - pivot_stats['bytes_after']
+                        if pivot_stats['caches_stripped']:
+                            print(f"  ✓ 已移除 {pivot_stats['caches_stripped']} 個樞紐分析表快取記錄")
+                    except Exception as e:
+                        print(f"  ⚠️ 樞紐分析表快取處理失敗: {e}")
+                
+                if slim_output:
+                    try:
+                        slim_stats = slim_workbook_package(output_file_path)
+                        saved = slim_stats['bytes_before'] - slim_stats['bytes_after']
+                        bytes_saved += saved
+                        print(f"  ✓ 已瘦身: {slim_stats['bytes_before']:,} → {slim_stats['bytes_after']:,} bytes")
+                    except Exception as e:
+                        print(f"  ⚠️ 瘦身失敗，保留原輸出: {e}")
+                
+                if processing_method != 'xlsm_passthrough':
+                    # 快速路徑已逐位元組保留母檔部件，不需再整理
+                    normalize_package(output_file_path, package_time)
+                
                 output_validation = validate_excel_file(output_file_path)
                 
                 if 'validation_error' in output_validation:
                     print(f"  ⚠️ 輸出檔案驗證失敗: {output_validation['validation_error']}")
                     failed += 1
+                    status, error = STATUS_INVALID, output_validation['validation_error']
                 else:
                     print(f"  ✓ 輸出檔案驗證通過")
                     processed += 1
+                    status, error = STATUS_OK, ''
             else:
                 failed += 1
+                status, error = STATUS_FAILED, '處理失敗'
+            
+            documents = []
+            if distributor and status == STATUS_OK:
+                if staging:
+                    # 暫存模式：發佈後直接分發到輸出資料夾，reflink / 硬連結不會在發佈時又被完整複製
+                    document_folders.append(os.path.join(publish_folder, os.path.relpath(folder_path, output_folder)))
+                    documents = [os.path.basename(path) for path in distributor.files]
+                else:
+                    documents = distributor.submit(folder_path)
+            manifest.append(manifest_entry(
+                output_folder, reviewer, folder_path if success else None, filename if success else None,
+                job_rows(reviewer, keep_rows), kind='rollup' if job_folder != output_folder else 'reviewer',
+                email=emails.get(normalize_person_name(reviewer), ''), documents=documents,
+                status=status, error=error))
+        
+        manifest_paths = write_output_manifest(manifest, output_folder, os.path.basename(file_path),
+                                               column_name, processing_method)
         
         # 總結
         print("\n" + "=" * 50)
         print(f"✅ 處理完成！")
-        print(f"📊 成功處理: {processed}/{len(reviewers)} 位審查者")
+        print(f"📊 成功處理: {processed}/{len(jobs)} 個檔案")
         if failed > 0:
             print(f"❌ 處理失敗: {failed} 位")
-        print(f"📁 輸出位置: {output_folder}")
+        if slim_output or strip_pivot_cache:
+            print(f"🗜️ 輸出檔共節省: {bytes_saved:,} bytes")
+        if staging and processed > 0:
+            publish_stats = staging.publish()
+            print(f"📦 已發佈 {publish_stats['published']} 個檔案（{publish_stats['bytes']:,} bytes），"
+                  f"{publish_stats['unchanged']} 個未變更略過")
+        if distributor:
+            for folder in document_folders:
+                distributor.submit(folder)
+            distributor.close()
+            for dest_path, error in distributor.errors:
+                print(f"  ⚠️ 附件複製失敗 {dest_path}: {error}")
+        print(f"📁 輸出位置: {publish_folder}")
+        print(f"🧾 輸出清單: {', '.join(os.path.basename(path) for path in manifest_paths)}")
         
         return processed > 0
         
@@ -286,6 +682,14 @@ def process_excel_file_safe(file_path, column_name, output_folder, processing_me
         import traceback
         traceback.print_exc()
         return False
+    
+    finally:
+        if distributor:
+            distributor.close()
+        if fingerprint_dir:
+            shutil.rmtree(fingerprint_dir, ignore_errors=True)
+        if staging:
+            staging.cleanup()
 
 # 測試函數
 def test_processing_methods():
@@ -294,6 +698,9 @@ def test_processing_methods():
     
     methods = [
         ('hide_rows', '隱藏列方法（推薦）'),
+        ('exclude_rows', '排除列方法（隱藏並清空其他審查者的資料）'),
+        ('xlsm_passthrough', '巨集保留快速路徑（只改寫工作表 XML，.xlsm 自動使用）'),
+        ('multi_sheet', '多工作表方法（分割所有資料表，保留查詢表）'),
         ('minimal', '最小影響方法（最安全）')
     ]
     
@@ -302,20 +709,101 @@ def test_processing_methods():
         print("  優點: 保持檔案完整性，避免格式問題")
         print("  缺點: 檔案大小不會減少")
 
+def benchmark_xlsm_fast_path(file_path, column_name, sample_size=3):
+    """
+    比較 openpyxl 隱藏列路徑與巨集保留快速路徑的處理速度
+    
+    Returns:
+        {'openpyxl': 每位審查者秒數, 'passthrough': 每位審查者秒數, 'speedup': 倍數}
+    """
+    df = pd.read_excel(file_path, engine='openpyxl', sheet_name=active_sheet_name(file_path), usecols=[column_name])
+    reviewers = df[column_name].dropna().unique().tolist()[:sample_size]
+    if not reviewers:
+        print("❌ 找不到任何審查者，無法測量")
+        return {}
+    
+    timings = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for label, processor in [('openpyxl', process_reviewer_excel_hide_rows),
+                                 ('passthrough', process_reviewer_excel_xlsm_passthrough)]:
+            start = time.perf_counter()
+            for reviewer in reviewers:
+                processor(file_path, reviewer, column_name, os.path.join(temp_dir, label))
+            timings[label] = (time.perf_counter() - start) / len(reviewers)
+    
+    timings['speedup'] = timings['openpyxl'] / timings['passthrough'] if timings['passthrough'] else 0.0
+    print("\n" + "=" * 50)
+    print(f"⏱️ openpyxl 路徑: {timings['openpyxl']:.3f} 秒/審查者")
+    print(f"⏱️ 快速路徑: {timings['passthrough']:.3f} 秒/審查者")
+    print(f"🚀 加速: {timings['speedup']:.1f}x（樣本 {len(reviewers)} 位審查者）")
+    return timings
+
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) < 3:
-        print("使用方式: python excel_splitter_fixed.py <Excel檔案> <審查者欄位> [輸出資料夾] [處理方法]")
-        print("範例: python excel_splitter_fixed.py data.xlsx Reviewer ./output hide_rows")
+    slim_output = '--slim' in sys.argv
+    strip_pivot_cache = '--strip-pivot' in sys.argv
+    benchmark = '--benchmark' in sys.argv
+    multi_valued = '--multi-valued' in sys.argv
+    fingerprint = '--fingerprint' in sys.argv
+    stage = '--stage' in sys.argv
+    staging_root = None
+    roster_file = None
+    documents_dir = None
+    doc_link_mode = 'copy'
+    delegates_file = None
+    org_hierarchy_file = None
+    routing_rules_file = None
+    args = []
+    remaining = iter(sys.argv[1:])
+    for arg in remaining:
+        if arg == '--delegates':
+            delegates_file = next(remaining, None)
+        elif arg == '--org':
+            org_hierarchy_file = next(remaining, None)
+        elif arg == '--rules':
+            routing_rules_file = next(remaining, None)
+        elif arg == '--staging-dir':
+            staging_root = next(remaining, None)
+        elif arg == '--roster':
+            roster_file = next(remaining, None)
+        elif arg == '--docs':
+            documents_dir = next(remaining, None)
+        elif arg == '--doc-links':
+            doc_link_mode = next(remaining, 'copy')
+            if doc_link_mode not in LINK_MODES:
+                print(f"❌ --doc-links 可用: {', '.join(LINK_MODES)}")
+                sys.exit(1)
+        elif arg not in ('--slim', '--strip-pivot', '--benchmark', '--multi-valued', '--fingerprint', '--stage'):
+            args.append(arg)
+    
+    if len(args) < 2:
+        print("使用方式: python excel_splitter_fixed.py <Excel檔案> <審查者欄位> [輸出資料夾] [處理方法] [--slim] [--strip-pivot] [--fingerprint]")
+        print("多值/代理人: python excel_splitter_fixed.py <Excel檔案> <審查者欄位> [輸出資料夾] --multi-valued [--delegates 代理人.csv]")
+        print("主管彙總: python excel_splitter_fixed.py <Excel檔案> <審查者欄位> [輸出資料夾] --org 組織階層.csv")
+        print("規則分派: python excel_splitter_fixed.py <Excel檔案> <審查者欄位> [輸出資料夾] --rules 路由規則.csv")
+        print("同步資料夾: python excel_splitter_fixed.py <Excel檔案> <審查者欄位> <同步資料夾> --stage [--staging-dir 本機暫存]")
+        print("附件與清單: python excel_splitter_fixed.py <Excel檔案> <審查者欄位> [輸出資料夾] --docs 文件資料夾 [--doc-links auto] [--roster 名冊.csv]")
+        print("測速: python excel_splitter_fixed.py <Excel檔案> <審查者欄位> --benchmark")
+        print("範例: python excel_splitter_fixed.py data.xlsx Reviewer ./output exclude_rows --slim")
         print("\n處理方法:")
         test_processing_methods()
         sys.exit(1)
     
-    file_path = sys.argv[1]
-    column_name = sys.argv[2]
-    output_folder = sys.argv[3] if len(sys.argv) > 3 else os.path.dirname(file_path)
-    method = sys.argv[4] if len(sys.argv) > 4 else 'hide_rows'
+    file_path = args[0]
+    column_name = args[1]
+    output_folder = args[2] if len(args) > 2 else os.path.dirname(file_path)
+    method = args[3] if len(args) > 3 else 'hide_rows'
+    
+    if benchmark:
+        timings = benchmark_xlsm_fast_path(file_path, column_name)
+        sys.exit(0 if timings else 1)
     
-    success = process_excel_file_safe(file_path, column_name, output_folder, method)
+    success = process_excel_file_safe(file_path, column_name, output_folder, method,
+                                      slim_output=slim_output, strip_pivot_cache=strip_pivot_cache,
+                                      multi_valued=multi_valued, delegates_file=delegates_file,
+                                      org_hierarchy_file=org_hierarchy_file,
+                                      routing_rules_file=routing_rules_file, fingerprint=fingerprint,
+                                      stage=stage, staging_root=staging_root, roster_file=roster_file,
+                                      documents_dir=documents_dir, doc_link_mode=doc_link_mode)
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+監看資料夾 - 母檔放入或更新後自動分割
+
+分析人員每天多次把更新後的母檔放進共用資料夾，過去要有人手動執行 Notebook。
+watch 模式持續監看資料夾：
+1. Linux 上使用 inotify（透過 ctypes，不需額外套件）；其他平台或網路磁碟以輪詢偵測
+2. 檔案大小與修改時間在 settle 秒內不再變動、且 ZIP 結構完整時才視為寫入完成（去抖動）
+3. 母檔內容雜湊與上次處理時相同則略過；分割工作交給處理程序池，同一母檔不會同時處理兩次；
+   處理程序異常結束時重建程序池並重新排入進行中的母檔，inotify 事件佇列溢位時重新掃描整個資料夾
+4. 每個母檔以本機暫存後批次發佈輸出到 <輸出資料夾>/<母檔名稱>，內容未變的輸出檔不會重寫
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Set, Tuple
+
+from excel_manifest import file_sha256
+
+MASTER_EXTENSIONS = ('.xlsx', '.xlsm')
+WATCH_STATE_NAME = '.watch_state.json'
+MAX_POOL_CRASHES = 2   # 同一母檔讓處理程序池異常結束的次數上限（超過時記為失敗，不再重新排入）
+
+# inotify 事件
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_master_candidate(name: str) -> bool:
+    """是否為需要處理的母檔（排除 Excel 鎖定檔、發佈暫存檔與隱藏檔）"""
+    base = os.path.basename(name)
+    return (base.lower().endswith(MASTER_EXTENSIONS)
+            and not base.startswith(('~$', '.')))
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """(大小, 修改時間 ns)；檔案不存在時回傳 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class PollingWatcher:
+    """以定期掃描偵測變動（網路磁碟、同步資料夾與非 Linux 平台）"""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.snapshot: Dict[str, Tuple[int, int]] = {}
+
+    def wait(self, timeout: float) -> Set[str]:
+        time.sleep(timeout)
+        return self.scan()
+
+    def scan(self) -> Set[str]:
+        current = {}
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            if is_master_candidate(name) and os.path.isfile(path):
+                current[path] = file_signature(path)
+        changed = {path for path, signature in current.items() if self.snapshot.get(path) != signature}
+        self.snapshot = current
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify 監看（只回報有事件的檔案，不必反覆掃描整個資料夾）"""
+
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, folder: str):
+        libc_name = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or not libc_name:
+            raise OSError('inotify 只支援 Linux')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.folder = folder
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失敗')
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(folder), self.MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f'無法監看 {folder}')
+
+    def wait(self, timeout: float) -> Set[str]:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        return self.parse(data)
+
+    def parse(self, data: bytes) -> Set[str]:
+        """解析 inotify 事件；事件佇列溢位（可能漏掉事件）時改為掃描整個資料夾"""
+        changed = set()
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            if mask & IN_Q_OVERFLOW:
+                print("⚠️ inotify 事件佇列溢位，重新掃描資料夾")
+                return self.scan()
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            offset += length
+            if name and is_master_candidate(name):
+                changed.add(os.path.join(self.folder, name))
+        return changed
+
+    def scan(self) -> Set[str]:
+        return {os.path.join(self.folder, name) for name in os.listdir(self.folder)
+                if is_master_candidate(name) and os.path.isfile(os.path.join(self.folder, name))}
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def create_watcher(folder: str, use_inotify: bool = True):
+    """優先使用 inotify，無法使用時改為輪詢"""
+    if use_inotify:
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(folder)
+
+
+def split_master(path: str, column_name: str, output_folder: str, options: Dict) -> bool:
+    """處理程序池中執行的分割工作（每個母檔輸出到 <輸出資料夾>/<母檔名稱>）"""
+    from excel_splitter_fixed import process_excel_file_safe
+
+    target = os.path.join(output_folder, os.path.splitext(os.path.basename(path))[0])
+    return process_excel_file_safe(path, column_name, target, stage=True, **options)
+
+
+class FolderWatcher:
+    """
+    監看資料夾並自動分割新增或更新的母檔
+
+    Args:
+        watch_folder: 監看的資料夾（分析人員放入母檔的位置）
+        column_name: 審查者欄位名稱
+        output_folder: 輸出資料夾
+        workers: 同時分割的母檔數
+        settle_seconds: 檔案大小與修改時間需維持不變的秒數
+        poll_interval: 輪詢間隔 / inotify 等待逾時（秒）
+        use_inotify: 是否使用 inotify（網路磁碟請關閉）
+        split_options: 傳給 process_excel_file_safe 的其他參數（例如 processing_method、multi_valued）
+    """
+
+    def __init__(self, watch_folder: str, column_name: str, output_folder: str, workers: int = 2,
+                 settle_seconds: float = 5.0, poll_interval: float = 2.0, use_inotify: bool = True,
+                 split_options: Optional[Dict] = None):
+        self.watch_folder = watch_folder
+        self.column_name = column_name
+        self.output_folder = output_folder
+        self.workers = max(1, workers)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.split_options = dict(split_options or {})
+        self.state_path = os.path.join(output_folder, WATCH_STATE_NAME)
+        self.state: Dict[str, str] = self._load_state()
+        self.stats = {'splits': 0, 'failed': 0, 'skipped': 0, 'restarts': 0}
+        self.pending: Dict[str, Tuple[Optional[Tuple[int, int]], float]] = {}
+        self.running: Dict[str, Tuple[object, str]] = {}
+        self.rerun: Set[str] = set()
+        self.crashes: Dict[str, int] = {}
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def _load_state(self) -> Dict[str, str]:
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self) -> None:
+        os.makedirs(self.output_folder, exist_ok=True)
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def _touch(self, paths, now: float) -> None:
+        for path in paths:
+            self.pending[path] = (file_signature(path), now)
+
+    def _ready(self, now: float):
+        """回傳已寫入完成的母檔（去抖動）"""
+        ready = []
+        for path, (signature, since) in list(self.pending.items()):
+            current = file_signature(path)
+            if current is None:
+                del self.pending[path]
+            elif current != signature:
+                self.pending[path] = (current, now)
+            elif now - since >= self.settle_seconds and zipfile.is_zipfile(path):
+                del self.pending[path]
+                ready.append(path)
+        return ready
+
+    def _dispatch(self, path: str) -> None:
+        if path in self.running:
+            self.rerun.add(path)  # 處理中又被更新：完成後再處理一次
+            return
+        key = os.path.basename(path)
+        try:
+            digest = file_sha256(path)
+        except OSError as e:
+            # 檢查後被刪除、更名或鎖定：略過，下次變動時再處理
+            self.pending.pop(path, None)
+            print(f"⚠️ 無法讀取 {key}: {e}")
+            return
+        if self.state.get(key) == digest:
+            self.stats['skipped'] += 1
+            return
+        print(f"📥 偵測到母檔: {key}，排入分割")
+        try:
+            future = self.pool.submit(split_master, path, self.column_name, self.output_folder, self.split_options)
+        except BrokenProcessPool:
+            self._restart_pool(time.monotonic())
+            future = self.pool.submit(split_master, path, self.column_name, self.output_folder, self.split_options)
+        self.running[path] = (future, digest)
+
+    def _restart_pool(self, now: float) -> None:
+        """處理程序異常結束（例如記憶體不足被終止）：重建程序池並重新排入進行中的母檔"""
+        print("⚠️ 分割處理程序異常結束，重建處理程序池")
+        self.stats['restarts'] += 1
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        for path in list(self.running):
+            del self.running[path]
+            self.rerun.discard(path)
+            self.crashes[path] = self.crashes.get(path, 0) + 1
+            if self.crashes[path] > MAX_POOL_CRASHES:
+                print(f"❌ {os.path.basename(path)} 分割失敗: 處理程序多次異常結束")
+                self.stats['failed'] += 1
+                del self.crashes[path]
+            else:
+                self._touch([path], now)
+
+    def _collect(self, now: float) -> None:
+        broken = False
+        for path, (future, digest) in list(self.running.items()):
+            if not future.done():
+                continue
+            if isinstance(future.exception(), BrokenProcessPool):
+                broken = True
+                continue
+            del self.running[path]
+            self.crashes.pop(path, None)
+            key = os.path.basename(path)
+            try:
+                success = future.result()
+            except Exception as e:
+                print(f"❌ {key} 分割失敗: {e}")
+                success = False
+            if success:
+                self.state[key] = digest
+                self.stats['splits'] += 1
+                self._save_state()
+                print(f"✅ {key} 分割完成")
+            else:
+                self.stats['failed'] += 1
+            if path in self.rerun:
+                self.rerun.discard(path)
+                self._touch([path], now)
+        if broken:
+            self._restart_pool(now)
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> Dict[str, int]:
+        """
+        持續監看直到 stop_event 被設定（或 Ctrl+C）
+
+        Returns:
+            統計資料（splits、failed、skipped、restarts）
+        """
+        stop_event = stop_event or threading.Event()
+        watcher = create_watcher(self.watch_folder, self.use_inotify)
+        mode = 'inotify' if isinstance(watcher, InotifyWatcher) else '輪詢'
+        print(f"👀 監看 {self.watch_folder}（{mode}），輸出至 {self.output_folder}")
+        # 啟動時先處理資料夾中既有的母檔（內容未變者依雜湊略過）
+        self._touch(watcher.scan(), time.monotonic())
+
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            while not stop_event.is_set():
+                changed = watcher.wait(self.poll_interval)
+                now = time.monotonic()
+                self._touch(changed, now)
+                for path in self._ready(now):
+                    self._dispatch(path)
+                self._collect(now)
+            # 等待進行中的工作結束
+            wait([future for future, _ in self.running.values()])
+            self._collect(time.monotonic())
+        except KeyboardInterrupt:
+            print("\n⏹️ 停止監看")
+        finally:
+            watcher.close()
+            self.pool.shutdown()
+        return self.stats
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='監看資料夾，自動分割新增或更新的母檔')
+    parser.add_argument('watch_folder', help='監看的資料夾')
+    parser.add_argument('column_name', help='審查者欄位名稱')
+    parser.add_argument('output_folder', help='輸出資料夾（每個母檔一個子資料夾）')
+    parser.add_argument('--method', default='hide_rows', help='處理方法（預設 hide_rows）')
+    parser.add_argument('--multi-valued', action='store_true', help='審查者儲存格可能列出多人')
+    parser.add_argument('--workers', type=int, default=2, help='同時分割的母檔數')
+    parser.add_argument('--settle', type=float, default=5.0, help='檔案需維持不變的秒數（預設 5）')
+    parser.add_argument('--interval', type=float, default=2.0, help='輪詢間隔秒數（預設 2）')
+    parser.add_argument('--poll', action='store_true', help='強制使用輪詢（網路磁碟、SharePoint 掛載路徑）')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.watch_folder):
+        print(f"❌ 找不到資料夾: {args.watch_folder}")
+        sys.exit(1)
+
+    watcher = FolderWatcher(args.watch_folder, args.column_name, args.output_folder, args.workers,
+                            args.settle, args.interval, use_inotify=not args.poll,
+                            split_options={'processing_method': args.method, 'multi_valued': args.multi_valued})
+    stats = watcher.run()
+    print(f"📊 分割 {stats['splits']} 次、失敗 {stats['failed']} 次、內容未變略過 {stats['skipped']} 次，"
+          f"重建處理程序池 {stats['restarts']} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,11 @@ Excel 工作表分析工具
 2. 檢測資料驗證規則
 3. 找出跨工作表依賴關係
 4. 提供修復建議
+5. 依審查者欄位與引用關係將工作表分類（資料表 / 查詢表）
 """
 
 import os
+import re
 import sys
 from typing import Dict, List, Set, Tuple, Optional
 
@@ -30,13 +32,22 @@ if sys.platform == 'win32':
 else:
     WIN32COM_AVAILABLE = False
 
+# 公式中的工作表引用：'Sheet Name'!A1 或 Sheet1!A1
+SHEET_REFERENCE_RE = re.compile(r"(?:'((?:[^']|'')+)'|([^\s'!=,()&+\-*/^<>:;\"]+))!")
+
 
 class ExcelWorksheetAnalyzer:
     """Excel 工作表分析器"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, workbook=None):
+        """
+        Args:
+            file_path: Excel 檔案路徑
+            workbook: 已載入的 openpyxl 活頁簿（提供時直接沿用，不再重新載入）
+        """
         self.file_path = file_path
-        self.workbook = None
+        self.workbook = workbook
+        self._shared_workbook = workbook is not None
         self.analysis_result = {}
     
     def analyze_with_openpyxl(self) -> Dict:
@@ -44,7 +55,8 @@ class ExcelWorksheetAnalyzer:
         print("🔍 使用 openpyxl 分析工作表...")
         
         try:
-            self.workbook = load_workbook(self.file_path, data_only=False)
+            if not self._shared_workbook:
+                self.workbook = load_workbook(self.file_path, data_only=False)
             result = {
                 'worksheets': {},
                 'data_validations': {},
@@ -63,6 +75,7 @@ class ExcelWorksheetAnalyzer:
                     'max_column': ws.max_column,
                     'data_validations': [],
                     'named_ranges': [],
+                    'headers': [cell.value for cell in ws[1]],
                     'has_data': ws.max_row > 1
                 }
                 
@@ -96,7 +109,7 @@ class ExcelWorksheetAnalyzer:
             return {}
         
         finally:
-            if self.workbook:
+            if self.workbook and not self._shared_workbook:
                 self.workbook.close()
     
     def analyze_data_validation(self, dv: DataValidation, sheet_name: str) -> Dict:
@@ -116,16 +129,67 @@ class ExcelWorksheetAnalyzer:
                 formula = str(formula)
                 if '!' in formula:
                     dv_info['has_cross_sheet_reference'] = True
-                    # 提取工作表名稱
-                    parts = formula.split('!')
-                    for part in parts[:-1]:
-                        # 清理工作表名稱
-                        sheet_ref = part.split("'")[-1] if "'" in part else part
-                        if sheet_ref and sheet_ref != sheet_name:
+                    # 提取工作表名稱（含單引號括住的名稱）
+                    for match in SHEET_REFERENCE_RE.finditer(formula):
+                        sheet_ref = (match.group(1) or match.group(2)).replace("''", "'")
+                        if sheet_ref and sheet_ref != sheet_name and sheet_ref not in dv_info['referenced_sheets']:
+                            dv_info['referenced_sheets'].append(sheet_ref)
+                else:
+                    # 命名範圍（例如 =StatusList）指向的工作表
+                    for sheet_ref in self.resolve_defined_name_sheets(formula):
+                        if sheet_ref != sheet_name and sheet_ref not in dv_info['referenced_sheets']:
+                            dv_info['has_cross_sheet_reference'] = True
                             dv_info['referenced_sheets'].append(sheet_ref)
         
         return dv_info
     
+    def resolve_defined_name_sheets(self, formula: str) -> List[str]:
+        """取得命名範圍所指向的工作表名稱"""
+        name = formula.lstrip('=').strip()
+        defined_names = getattr(self.workbook, 'defined_names', None)
+        if not defined_names or name not in defined_names:
+            return []
+        try:
+            return [sheet for sheet, _ in defined_names[name].destinations]
+        except Exception:
+            return []
+    
+    def classify_sheets(self, column_name: str, analysis: Optional[Dict] = None) -> Dict:
+        """
+        依審查者欄位與資料驗證引用將工作表分類
+        
+        - 資料表：標題列含審查者欄位，需要依審查者分割（即使同時被資料驗證引用，也不能整張給每位審查者）
+        - 查詢表：不含審查者欄位但被資料驗證引用，必須完整保留
+        - 其他：不處理
+        
+        同時被引用的資料表另列在 referenced_data_sheets：分割只隱藏列，清單驗證仍看得到所有值
+        
+        Returns:
+            {'data_sheets': {工作表名稱: 審查者欄位索引(1 起算)}, 'lookup_sheets': [...], 'other_sheets': [...],
+             'referenced_data_sheets': [...]}
+        """
+        if analysis is None:
+            analysis = self.analyze_with_openpyxl()
+        
+        referenced = set()
+        for ref in analysis.get('cross_sheet_references', []):
+            referenced.update(ref['validation_info'].get('referenced_sheets', []))
+        
+        result = {'data_sheets': {}, 'lookup_sheets': [], 'other_sheets': [], 'referenced_data_sheets': []}
+        for ws_name, ws_info in analysis.get('worksheets', {}).items():
+            headers = ws_info.get('headers', [])
+            if column_name in headers:
+                result['data_sheets'][ws_name] = headers.index(column_name) + 1
+                if ws_name in referenced:
+                    result['referenced_data_sheets'].append(ws_name)
+                    print(f"⚠️ 工作表 '{ws_name}' 含審查者欄位且被資料驗證引用，仍依審查者分割")
+            elif ws_name in referenced:
+                result['lookup_sheets'].append(ws_name)
+            else:
+                result['other_sheets'].append(ws_name)
+        
+        return result
+    
     def analyze_with_com(self) -> Dict:
         """使用 COM 分析工作表（更詳細）"""
         if not WIN32COM_AVAILABLE:
@@ -2,13 +2,85 @@
 
 import sys
 import os
-import shutil
 import pandas as pd
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 from pathlib import Path
 import glob
 import argparse
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import yaml
+except ImportError:  # YAML manifests are optional; CSV/XLSX always work
+    yaml = None
+
+from excel_documents import LINK_MODES, DocumentDistributor, distribute_files
+from excel_package_tools import active_sheet_name, normalize_package, package_timestamp
+from excel_splitter_fixed import add_fingerprint_columns, sanitize_folder_name
+from excel_publish import StagedOutput
+from excel_roster import (join_roster, load_roster, manifest_email_map, remove_unmatched_report, unmatched_reviewers,
+                          write_reviewer_manifest)
+
+
+class SplitError(Exception):
+    pass
+
+
+class BatchCache:
+    # Shared by the jobs of one batch worker: each master is read and each document pattern globbed once.
+    # Keys registered with expect() are dropped after that many release() calls, so a master
+    # DataFrame is only held while jobs that use it are still pending
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._values = {}
+        self._users = {}
+    
+    def expect(self, key, users=1):
+        with self._lock:
+            self._users[key] = self._users.get(key, 0) + users
+    
+    def release(self, key):
+        with self._lock:
+            remaining = self._users.get(key, 0) - 1
+            if remaining > 0:
+                self._users[key] = remaining
+                return
+            self._users.pop(key, None)
+            self._values.pop(key, None)
+            self._key_locks.pop(key, None)
+    
+    def get(self, key, loader):
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._values:
+                    return self._values[key]
+            value = loader()
+            with self._lock:
+                self._values[key] = value
+            return value
+    
+    def glob(self, pattern):
+        return self.get(('glob', pattern), lambda: sorted(glob.glob(pattern)))
+    
+    @staticmethod
+    def excel_key(file_path):
+        return ('excel', os.path.abspath(file_path))
+    
+    def read_excel(self, file_path):
+        return self.get(self.excel_key(file_path), lambda: read_master(file_path))
+
+
+def read_master(file_path):
+    # Row positions are applied to the active sheet (wb.active), which need not be the first sheet pandas reads
+    return pd.read_excel(file_path, engine='openpyxl', sheet_name=active_sheet_name(file_path))
 
 
 def find_column(worksheet, column_name):
@@ -18,35 +90,51 @@ def find_column(worksheet, column_name):
     raise ValueError(f"Cannot find '{column_name}' column! Please check column name")
 
 
-def copy_documents(source_dir, dest_dir, app_name):
+def filter_values(worksheet, col_idx, rows):
+    # AutoFilter values must match the cells as Excel shows them, not the stripped pandas strings
+    # (an int column with blanks reads as 1.0 in pandas, and padded names must keep their spaces)
+    values = []
+    for row in rows:
+        value = worksheet.cell(row=row, column=col_idx).value
+        if isinstance(value, bool):
+            text = 'TRUE' if value else 'FALSE'
+        elif isinstance(value, float) and value.is_integer():
+            text = str(int(value))
+        else:
+            text = str(value)
+        if text not in values:
+            values.append(text)
+    return values
+
+
+def find_documents(source_dir, app_name, docs_pattern=None, cache=None):
+    find = cache.glob if cache else glob.glob
+    if docs_pattern:
+        return [f for f in find(os.path.join(source_dir, docs_pattern)) if os.path.isfile(f)], []
+    
     word_pattern = os.path.join(source_dir, f"{app_name}*.docx")
-    word_files = glob.glob(word_pattern)
+    word_files = find(word_pattern)
     
     pdf_pattern = os.path.join(source_dir, f"{app_name}*permission*.pdf")
-    pdf_files = glob.glob(pdf_pattern)
+    pdf_files = find(pdf_pattern)
     
     # For testing, also look for .txt files
     if not word_files:
         word_pattern = os.path.join(source_dir, f"{app_name}*.txt")
-        word_files = [f for f in glob.glob(word_pattern) if "permission" not in f]
+        word_files = [f for f in find(word_pattern) if "permission" not in f]
     
     if not pdf_files:
         pdf_pattern = os.path.join(source_dir, f"{app_name}*permission*.txt")
-        pdf_files = glob.glob(pdf_pattern)
+        pdf_files = find(pdf_pattern)
     
-    copied_files = []
-    
-    for word_file in word_files:
-        dest_path = os.path.join(dest_dir, os.path.basename(word_file))
-        shutil.copy2(word_file, dest_path)
-        copied_files.append(os.path.basename(word_file))
-    
-    for pdf_file in pdf_files:
-        dest_path = os.path.join(dest_dir, os.path.basename(pdf_file))
-        shutil.copy2(pdf_file, dest_path)
-        copied_files.append(os.path.basename(pdf_file))
+    return word_files, pdf_files
+
+
+def copy_documents(source_dir, dest_dir, app_name, documents=None, link_mode='copy', stats=None):
+    word_files, pdf_files = documents if documents is not None else find_documents(source_dir, app_name)
     
-    return copied_files
+    # link_mode 'auto'/'reflink'/'hardlink' shares data blocks instead of writing every byte again
+    return distribute_files(list(word_files) + list(pdf_files), dest_dir, link_mode, stats)
 
 
 def create_sharepoint_sharing_script(base_dir, reviewer_emails):
@@ -79,87 +167,194 @@ def create_sharepoint_sharing_script(base_dir, reviewer_emails):
     return script_path
 
 
-def split_excel_enhanced(file_path, app_name):
+def build_partition_groups(df, key_columns):
+    # Single grouping pass over the key columns; values are 0-based row positions
+    groups = {}
+    for key, positions in df.groupby(key_columns, sort=False, dropna=True).indices.items():
+        key = key if isinstance(key, tuple) else (key,)
+        groups.setdefault(tuple(str(v).strip() for v in key), []).extend(positions.tolist())
+    return groups
+
+
+def partition_folders(groups):
+    # The AutoFilter uses the cell values (see filter_values); folder names are sanitized per component so a value
+    # like '../x' or 'R&D/Ops' cannot escape the application folder or add extra nesting
+    folders = {}
+    seen = {}
+    for key in groups:
+        folder = tuple(sanitize_folder_name(value) for value in key)
+        if folder in seen:
+            raise SplitError(f"Error: partitions {'/'.join(seen[folder])!r} and {'/'.join(key)!r} "
+                             f"map to the same folder {'/'.join(folder)!r}")
+        seen[folder] = key
+        folders[key] = folder
+    return folders
+
+
+def split_excel_enhanced(file_path, app_name, key_columns=None, roster_file=None,
+                         output_dir=None, docs_pattern=None, cache=None, fingerprint=False,
+                         link_mode='copy', doc_workers=4, stage=False, staging_root=None,
+                         distribute_documents=True):
+    key_columns = list(key_columns or ['Reviewer'])
+    
+    if stage or staging_root:
+        # Build the whole tree in a local staging folder, then publish it to the (synced) output in one pass
+        output_root = output_dir or os.path.dirname(file_path)
+        with StagedOutput(output_root, staging_root) as staging:
+            stats = split_excel_enhanced(file_path, app_name, key_columns, roster_file, staging.path, docs_pattern,
+                                         cache, fingerprint, link_mode, doc_workers, distribute_documents=False)
+        published = staging.stats
+        print(f"\n✓ Published {published['published']} files ({published['bytes']:,} bytes) to {output_root}, "
+              f"{published['unchanged']} unchanged")
+        stats['app_folder'] = os.path.join(output_root, app_name)
+        stats['published'] = published['published']
+        if roster_file and not stats['unmatched_report']:
+            # Publishing never deletes destination files, so drop the previous run's report here
+            remove_unmatched_report(stats['app_folder'])
+        elif stats['unmatched_report']:
+            stats['unmatched_report'] = os.path.join(stats['app_folder'], os.path.basename(stats['unmatched_report']))
+        stats['leaf_folders'] = [os.path.join(output_root, os.path.relpath(folder, staging.path))
+                                 for folder in stats['leaf_folders']]
+        # Documents go straight into the published folders, so reflinks/hardlinks are not copied again on publish
+        word_files, pdf_files = find_documents(os.path.dirname(file_path), app_name, docs_pattern, cache)
+        with DocumentDistributor(list(word_files) + list(pdf_files), link_mode, doc_workers) as distributor:
+            for folder in stats['leaf_folders']:
+                distributor.submit(folder)
+        if distributor.stats.bytes_total:
+            print(f"✓ Documents distributed ({link_mode}): {distributor.stats.summary()}")
+        for dest_path, error in distributor.errors:
+            print(f"✗ Error copying {dest_path}: {error}")
+        stats['bytes_saved'] = distributor.stats.bytes_saved
+        stats['document_errors'] = len(distributor.errors)
+        return stats
+    
     if not os.path.exists(file_path):
-        print(f"Error: File not found {file_path}")
-        sys.exit(1)
+        raise SplitError(f"Error: File not found {file_path}")
     
     print(f"Reading file: {file_path}")
     try:
-        df = pd.read_excel(file_path, engine='openpyxl')
+        df = cache.read_excel(file_path) if cache else read_master(file_path)
     except Exception as e:
-        print(f"Failed to read Excel: {e}")
-        sys.exit(1)
+        raise SplitError(f"Failed to read Excel: {e}")
     
-    if 'Reviewer' not in df.columns:
-        print("Error: Cannot find 'Reviewer' column in Excel")
-        sys.exit(1)
+    missing = [column for column in key_columns if column not in df.columns]
+    if missing:
+        raise SplitError(f"Error: Cannot find {', '.join(repr(c) for c in missing)} column in Excel")
     
-    reviewers = df['Reviewer'].dropna().unique().tolist()
-    print(f"Found {len(reviewers)} reviewers: {', '.join(str(r) for r in reviewers)}")
+    groups = build_partition_groups(df, key_columns)
+    folders = partition_folders(groups)
+    print(f"Found {len(groups)} partitions by {' / '.join(key_columns)}: "
+          f"{', '.join('/'.join(key) for key in groups)}")
     
-    # Check for Email Address column and create mapping
+    # Check for Email Address column and create mapping (keyed by relative folder path)
     reviewer_emails = {}
-    if 'Email Address' in df.columns:
+    has_email = 'Email Address' in df.columns
+    if has_email:
         print("✓ Found 'Email Address' column - will use for automatic sharing")
-        for reviewer in reviewers:
-            reviewer_data = df[df['Reviewer'] == reviewer]
-            if not reviewer_data.empty:
-                email = reviewer_data['Email Address'].iloc[0]
-                if pd.notna(email):
-                    reviewer_emails[str(reviewer).strip()] = str(email).strip()
-                else:
-                    reviewer_emails[str(reviewer).strip()] = 'N/A'
-    else:
+    elif not roster_file:
         print("ℹ No 'Email Address' column found - will prompt for emails during sharing")
-        reviewer_emails = {str(r).strip(): 'N/A' for r in reviewers}
+    for key, positions in groups.items():
+        email = df['Email Address'].iloc[positions[0]] if has_email else None
+        reviewer_emails['/'.join(folders[key])] = str(email).strip() if pd.notna(email) else 'N/A'
     
     base_dir = os.path.dirname(file_path)
-    app_folder = os.path.join(base_dir, app_name)
+    app_folder = os.path.join(output_dir or base_dir, app_name)
     os.makedirs(app_folder, exist_ok=True)
     print(f"Created application folder: {app_folder}")
     
+    unmatched_path = None
+    if roster_file:
+        # One hash join of every partition's reviewer against the local roster
+        try:
+            roster = cache.get(('roster', os.path.abspath(roster_file)), lambda: load_roster(roster_file)) \
+                if cache else load_roster(roster_file)
+        except Exception as e:
+            raise SplitError(f"Failed to read roster: {e}")
+        name_index = key_columns.index('Reviewer') if 'Reviewer' in key_columns else len(key_columns) - 1
+        manifest = join_roster((('/'.join(folders[key]), key[name_index]) for key in groups), roster)
+        # Fall back to the sheet's Email Address column for names missing from the roster
+        fallback = manifest['folder'].map(reviewer_emails).where(lambda emails: emails != 'N/A')
+        manifest['email'] = manifest['email'].where(manifest['matched'], fallback)
+        reviewer_emails = manifest_email_map(manifest)
+        manifest_path, unmatched_path = write_reviewer_manifest(manifest, app_folder)
+        print(f"✓ Roster matched {int(manifest['matched'].sum())}/{len(manifest)} partitions: {manifest_path}")
+        if unmatched_path:
+            print(f"⚠ Not in roster: {', '.join(unmatched_reviewers(manifest))} (see {unmatched_path})")
+    
     base_name = os.path.basename(file_path)
+    # Glob the documents folder once for the whole application
+    documents = find_documents(base_dir, app_name, docs_pattern, cache)
+    # Copies run in the background while the next workbook is saved; unchanged files are skipped
+    distributor = DocumentDistributor(list(documents[0]) + list(documents[1]) if distribute_documents else [],
+                                      link_mode, doc_workers)
+    written = 0
+    leaf_folders = []
     
-    for reviewer in reviewers:
-        reviewer_name = str(reviewer).strip()
-        
-        reviewer_folder = os.path.join(app_folder, reviewer_name)
-        os.makedirs(reviewer_folder, exist_ok=True)
-        
-        dst_path = os.path.join(reviewer_folder, base_name)
+    # Outputs carry the master's docProps time and fixed zip timestamps, so identical input gives identical bytes
+    package_time = package_timestamp(file_path)
+    
+    # Load the master once; every leaf workbook is produced by un-hiding its own rows
+    wb = load_workbook(file_path)
+    ws = wb.active
+    
+    try:
+        key_cols = [find_column(ws, column) for column in key_columns]
+    except ValueError as e:
+        wb.close()
+        distributor.close()
+        raise SplitError(f"Error: {e}")
+    
+    if fingerprint:
+        # Hidden _row_id / _fingerprint columns let merge and audit tools spot edited rows without the master
+        add_fingerprint_columns(ws)
+    
+    max_row = ws.max_row
+    max_col = ws.max_column
+    filter_range = f"A1:{get_column_letter(max_col)}{max_row}"
+    
+    # 隱藏所有資料行，再逐一顯示各分組的資料行
+    for row in range(2, max_row + 1):
+        ws.row_dimensions[row].hidden = True
+    
+    for key, positions in groups.items():
+        leaf_folder = os.path.join(app_folder, *folders[key])
+        os.makedirs(leaf_folder, exist_ok=True)
         
-        wb = load_workbook(file_path)
-        ws = wb.active
+        dst_path = os.path.join(leaf_folder, base_name)
+        rows = [int(position) + 2 for position in positions]
         
         try:
-            reviewer_col = find_column(ws, 'Reviewer')
-            
-            max_row = ws.max_row
-            max_col = ws.max_column
-            
-            filter_range = f"A1:{get_column_letter(max_col)}{max_row}"
             ws.auto_filter.ref = filter_range
+            ws.auto_filter.filterColumn = []
+            for col_idx in key_cols:
+                ws.auto_filter.add_filter_column(col_idx - 1, filter_values(ws, col_idx, rows))
             
-            ws.auto_filter.add_filter_column(reviewer_col - 1, [reviewer_name])
-            
-            # 隱藏不屬於此 reviewer 的資料行
-            for row in range(2, max_row + 1):  # 從第2行開始（跳過標題）
-                cell_value = ws.cell(row=row, column=reviewer_col).value
-                if cell_value != reviewer_name:
-                    ws.row_dimensions[row].hidden = True
+            for row in rows:
+                ws.row_dimensions[row].hidden = False
             
             wb.save(dst_path)
-            print(f"✓ Created filtered Excel for {reviewer_name}")
+            normalize_package(dst_path, package_time)
+            written += 1
+            leaf_folders.append(leaf_folder)
+            print(f"✓ Created filtered Excel for {'/'.join(key)} ({len(rows)} rows)")
             
-            copied_docs = copy_documents(base_dir, reviewer_folder, app_name)
+            copied_docs = distributor.submit(leaf_folder)
             if copied_docs:
-                print(f"  ✓ Copied documents: {', '.join(copied_docs)}")
+                print(f"  ✓ Queued documents: {', '.join(copied_docs)}")
             
         except Exception as e:
-            print(f"✗ Error processing {reviewer_name}: {e}")
+            print(f"✗ Error processing {'/'.join(key)}: {e}")
         finally:
-            wb.close()
+            for row in rows:
+                ws.row_dimensions[row].hidden = True
+    
+    wb.close()
+    
+    doc_stats = distributor.close()
+    if doc_stats.bytes_total:
+        print(f"\n✓ Documents distributed ({link_mode}): {doc_stats.summary()}")
+    for dest_path, error in distributor.errors:
+        print(f"✗ Error copying {dest_path}: {error}")
     
     script_path = create_sharepoint_sharing_script(app_folder, reviewer_emails)
     print(f"\n✓ Created SharePoint sharing script: {script_path}")
@@ -179,16 +374,177 @@ def split_excel_enhanced(file_path, app_name):
     print("1. Upload the entire folder structure to SharePoint")
     print("2. Run the PowerShell script 'share_folders.ps1' to set permissions")
     print("3. The script will prompt for reviewer email addresses")
+    
+    return {
+        'app_folder': app_folder,
+        'partitions': len(groups),
+        'workbooks': written,
+        'leaf_folders': leaf_folders,
+        'documents': len(documents[0]) + len(documents[1]),
+        'bytes_saved': doc_stats.bytes_saved,
+        'document_errors': len(distributor.errors),
+        'unmatched_report': unmatched_path,
+    }
+
+
+def load_batch_manifest(manifest_path):
+    # One entry per application: app_name, master, keys (comma-separated), docs (optional glob)
+    ext = os.path.splitext(manifest_path)[1].lower()
+    if ext in ('.yml', '.yaml'):
+        if yaml is None:
+            raise SplitError("YAML manifests need PyYAML (pip install pyyaml); use a CSV manifest instead")
+        with open(manifest_path, encoding='utf-8') as f:
+            data = yaml.safe_load(f) or []
+        entries = data.get('applications', []) if isinstance(data, dict) else data
+    elif ext == '.csv':
+        entries = pd.read_csv(manifest_path, dtype=str).to_dict('records')
+    else:
+        entries = pd.read_excel(manifest_path, engine='openpyxl', dtype=str).to_dict('records')
+    
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = []
+    for number, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            raise SplitError(f"Manifest entry {number} must be a mapping, got {type(entry).__name__}")
+        # Empty CSV/XLSX cells arrive as NaN and empty YAML values as None: treat both as missing
+        entry = {k: v for k, v in entry.items() if v is not None and v == v and v != ''}
+        for field in ('app_name', 'master', 'docs'):
+            if field in entry and not isinstance(entry[field], str):
+                raise SplitError(f"Manifest entry {number}: {field} must be a string, "
+                                 f"got {type(entry[field]).__name__}")
+        if 'app_name' not in entry or 'master' not in entry:
+            raise SplitError(f"Manifest entry {number} needs app_name and master")
+        keys = entry.get('keys', 'Reviewer')
+        if isinstance(keys, str):
+            keys = [column.strip() for column in keys.split(',') if column.strip()]
+        elif not isinstance(keys, list) or not all(isinstance(column, str) for column in keys):
+            raise SplitError(f"Manifest entry {number}: keys must be a comma-separated string or a list of columns")
+        else:
+            keys = [column.strip() for column in keys if column.strip()]
+        master = entry['master'].strip()
+        jobs.append({
+            'app_name': entry['app_name'].strip(),
+            'master': master if os.path.isabs(master) else os.path.join(base_dir, master),
+            'keys': keys,
+            'docs': entry.get('docs', '').strip() or None,
+        })
+    return jobs
+
+
+def run_batch_job(job, cache, options):
+    started = time.perf_counter()
+    result = {'app_name': job['app_name'], 'master': job['master'], 'keys': ','.join(job['keys']),
+              'status': 'ok', 'partitions': 0, 'workbooks': 0, 'documents': 0, 'bytes_saved': 0, 'error': ''}
+    try:
+        stats = split_excel_enhanced(job['master'], job['app_name'], job['keys'], docs_pattern=job['docs'],
+                                     cache=cache, **options)
+        result.update(partitions=stats['partitions'], workbooks=stats['workbooks'],
+                      documents=stats['documents'], bytes_saved=stats['bytes_saved'])
+        if stats['workbooks'] < stats['partitions'] or stats['document_errors']:
+            result['status'] = 'partial'
+    except Exception as e:
+        result.update(status='failed', error=str(e))
+    finally:
+        # Drop the master DataFrame once the last application using it is done
+        cache.release(cache.excel_key(job['master']))
+    result['seconds'] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def run_master_jobs(jobs, options):
+    # Runs in a worker process: every application cut from one master shares a single read of it
+    cache = BatchCache()
+    for _, job in jobs:
+        cache.expect(cache.excel_key(job['master']))
+    return [(index, run_batch_job(job, cache, options)) for index, job in jobs]
+
+
+def run_batch(manifest_path, output_dir=None, roster_file=None, workers=4, fingerprint=False, link_mode='copy',
+              doc_workers=4, stage=False, staging_root=None):
+    jobs = load_batch_manifest(manifest_path)
+    # Workbook building is CPU-bound openpyxl work, so masters run in separate processes;
+    # applications that share a master stay together so it is still read once
+    by_master = {}
+    for index, job in enumerate(jobs):
+        by_master.setdefault(os.path.abspath(job['master']), []).append((index, job))
+    options = {'roster_file': roster_file, 'output_dir': output_dir, 'fingerprint': fingerprint,
+               'link_mode': link_mode, 'doc_workers': doc_workers, 'stage': stage, 'staging_root': staging_root}
+    print(f"Batch: {len(jobs)} applications from {manifest_path} ({workers} workers)")
+    
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(by_master)))) as pool:
+        futures = [(group, pool.submit(run_master_jobs, group, options)) for group in by_master.values()]
+        for group, future in futures:
+            try:
+                for index, result in future.result():
+                    results[index] = result
+            except Exception as e:
+                # A worker process died; report its applications instead of losing the whole batch
+                for index, job in group:
+                    results[index] = {'app_name': job['app_name'], 'master': job['master'],
+                                      'keys': ','.join(job['keys']), 'status': 'failed', 'partitions': 0,
+                                      'workbooks': 0, 'documents': 0, 'bytes_saved': 0, 'seconds': 0,
+                                      'error': f"Worker failed: {e}"}
+    
+    summary = pd.DataFrame(results, columns=['app_name', 'master', 'keys', 'status', 'partitions',
+                                             'workbooks', 'documents', 'bytes_saved', 'seconds', 'error'])
+    summary_dir = output_dir or os.path.dirname(os.path.abspath(manifest_path))
+    os.makedirs(summary_dir, exist_ok=True)
+    summary_path = os.path.join(summary_dir, 'batch_summary.csv')
+    summary.to_csv(summary_path, index=False, encoding='utf-8-sig')
+    
+    print("\n" + "=" * 60)
+    print("Batch summary")
+    for row in summary.itertuples(index=False):
+        mark = '✓' if row.status == 'ok' else '✗'
+        detail = row.error if row.error else f"{row.workbooks}/{row.partitions} workbooks, {row.documents} documents"
+        print(f"{mark} {row.app_name}: {detail} ({row.seconds}s)")
+    ok = int((summary['status'] == 'ok').sum())
+    print(f"\n{ok}/{len(summary)} applications succeeded, {int(summary['workbooks'].sum())} workbooks written")
+    if summary['bytes_saved'].sum():
+        print(f"Document writes saved by linking: {int(summary['bytes_saved'].sum()):,} bytes")
+    print(f"Summary: {summary_path}")
+    return summary
 
 
 def main():
     parser = argparse.ArgumentParser(description='Split Excel by reviewer with enhanced features')
-    parser.add_argument('excel_file', help='Path to the Excel file')
-    parser.add_argument('app_name', help='Application name for the main folder')
+    parser.add_argument('excel_file', nargs='?', help='Path to the Excel file')
+    parser.add_argument('app_name', nargs='?', help='Application name for the main folder')
+    parser.add_argument('--keys', default='Reviewer',
+                        help='Comma-separated partition columns, outermost folder first (e.g. Application,Reviewer)')
+    parser.add_argument('--roster', help='Roster CSV/XLSX (Name, Email, Department, Manager) used to resolve reviewer emails')
+    parser.add_argument('--batch', metavar='MANIFEST',
+                        help='CSV/XLSX/YAML manifest (app_name, master, keys, docs) to split many applications in one run')
+    parser.add_argument('--output', help='Base folder for application folders (default: next to each master)')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel applications in batch mode')
+    parser.add_argument('--doc-links', choices=LINK_MODES, default='copy',
+                        help='How supporting documents are placed: auto/reflink share blocks (copy-on-write), '
+                             'hardlink shares one file (read-only documents only), copy writes full copies')
+    parser.add_argument('--doc-workers', type=int, default=4, help='Parallel document copies per application')
+    parser.add_argument('--stage', action='store_true',
+                        help='Build output in a local staging folder and publish it to the output folder in one '
+                             'pass (recommended for SharePoint/OneDrive synced folders)')
+    parser.add_argument('--staging-dir', help='Local staging location (implies --stage; default: system temp)')
+    parser.add_argument('--fingerprint', action='store_true',
+                        help='Add hidden _row_id and _fingerprint columns to every output')
     
     args = parser.parse_args()
     
-    split_excel_enhanced(args.excel_file, args.app_name)
+    try:
+        if args.batch:
+            summary = run_batch(args.batch, args.output, args.roster, args.workers, args.fingerprint,
+                                args.doc_links, args.doc_workers, args.stage, args.staging_dir)
+            sys.exit(0 if (summary['status'] == 'ok').all() else 1)
+        if not args.excel_file or not args.app_name:
+            parser.error('excel_file and app_name are required unless --batch is given')
+        key_columns = [column.strip() for column in args.keys.split(',') if column.strip()]
+        split_excel_enhanced(args.excel_file, args.app_name, key_columns, roster_file=args.roster,
+                             output_dir=args.output, fingerprint=args.fingerprint, link_mode=args.doc_links,
+                             doc_workers=args.doc_workers, stage=args.stage, staging_root=args.staging_dir)
+    except SplitError as e:
+        print(e)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
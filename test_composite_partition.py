@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test composite partition keys in splitter_enhanced (nested folders from one grouping pass)
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from splitter_enhanced import SplitError, build_partition_groups, split_excel_enhanced
+
+
+def _sample_frame():
+    return pd.DataFrame({
+        'User_ID': [f'USR-{i:04d}' for i in range(8)],
+        'Application': ['SAP', 'SAP', 'Slack', 'SAP', 'Slack', None, 'SAP', 'Slack'],
+        'Reviewer': ['John Doe', 'Jane Smith', 'John Doe', 'John Doe ', 'Jane Smith', 'John Doe', 'Jane Smith', 'John Doe'],
+    })
+
+
+def test_build_partition_groups():
+    """Groups are keyed by stripped values in first-seen order, rows with missing keys are dropped"""
+    print("Testing composite partition groups...")
+
+    groups = build_partition_groups(_sample_frame(), ['Application', 'Reviewer'])
+
+    assert list(groups) == [('SAP', 'John Doe'), ('SAP', 'Jane Smith'), ('Slack', 'John Doe'), ('Slack', 'Jane Smith')]
+    assert sorted(groups[('SAP', 'John Doe')]) == [0, 3]
+    assert groups[('Slack', 'John Doe')] == [2, 7]
+    print(f"✓ {len(groups)} partitions")
+
+
+def test_split_with_composite_keys():
+    """Each (Application, Reviewer) leaf gets a nested folder showing only its rows"""
+    print("\nTesting nested split by Application / Reviewer...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, 'user_listing.xlsx')
+        _sample_frame().to_excel(excel_path, index=False)
+
+        split_excel_enhanced(excel_path, 'Quarterly', ['Application', 'Reviewer'])
+
+        expected = {
+            ('SAP', 'John Doe'): ['USR-0000', 'USR-0003'],
+            ('SAP', 'Jane Smith'): ['USR-0001', 'USR-0006'],
+            ('Slack', 'John Doe'): ['USR-0002', 'USR-0007'],
+            ('Slack', 'Jane Smith'): ['USR-0004'],
+        }
+        for (app, reviewer), user_ids in expected.items():
+            path = os.path.join(temp_dir, 'Quarterly', app, reviewer, 'user_listing.xlsx')
+            ws = load_workbook(path).active
+            visible = [ws.cell(row=r, column=1).value for r in range(2, ws.max_row + 1)
+                       if not ws.row_dimensions[r].hidden]
+            assert visible == user_ids, (app, reviewer, visible)
+            assert len(ws.auto_filter.filterColumn) == 2
+
+        with open(os.path.join(temp_dir, 'Quarterly', 'share_folders.ps1'), encoding='utf-8') as f:
+            assert "Join-Path $baseFolder 'Slack/Jane Smith'" in f.read()
+
+    print("✓ Nested folders created from precomputed groups")
+
+
+def test_key_values_sanitized_for_folders():
+    """Key values with path separators or '..' stay inside the application folder; filters keep raw values"""
+    print("\nTesting folder names from unsafe key values...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, 'user_listing.xlsx')
+        pd.DataFrame({
+            'User_ID': ['USR-0001', 'USR-0002', 'USR-0003'],
+            'Application': ['R&D/Ops', '..', 'SAP'],
+            'Reviewer': ['../../Evil', 'John Doe', 'C:\\Temp'],
+        }).to_excel(excel_path, index=False)
+
+        split_excel_enhanced(excel_path, 'Quarterly', ['Application', 'Reviewer'])
+
+        app_folder = os.path.join(temp_dir, 'Quarterly')
+        leaves = sorted(os.path.relpath(root, app_folder) for root, _, names in os.walk(app_folder)
+                        if 'user_listing.xlsx' in names)
+        assert leaves == sorted([os.path.join('R&D_Ops', '.._.._Evil'), os.path.join('_', 'John Doe'),
+                                 os.path.join('SAP', 'C__Temp')]), leaves
+        assert sorted(os.listdir(temp_dir)) == ['Quarterly', 'user_listing.xlsx']
+        ws = load_workbook(os.path.join(app_folder, 'R&D_Ops', '.._.._Evil', 'user_listing.xlsx')).active
+        assert [column.filters.filter for column in ws.auto_filter.filterColumn] == [['R&D/Ops'], ['../../Evil']]
+
+        # Two keys that clean up to the same folder would overwrite each other
+        pd.DataFrame({'Reviewer': ['A/B', 'A_B']}).to_excel(excel_path, index=False)
+        try:
+            split_excel_enhanced(excel_path, 'Clash')
+            assert False, "colliding folder names should raise"
+        except SplitError as e:
+            assert 'A_B' in str(e)
+
+    print("✓ Unsafe key values mapped to safe folder names")
+
+
+def test_filter_values_match_cells():
+    """AutoFilter values come from the sheet cells: no '1.0' for int columns with blanks, padding kept"""
+    print("\nTesting AutoFilter values from sheet cells...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, 'user_listing.xlsx')
+        pd.DataFrame({
+            'User_ID': ['USR-0001', 'USR-0002', 'USR-0003', 'USR-0004'],
+            'Region': [1, None, 1, 2],
+            'Reviewer': ['John Doe', 'Jane Smith', ' John Doe ', 'Jane Smith'],
+        }).to_excel(excel_path, index=False)
+
+        split_excel_enhanced(excel_path, 'Quarterly', ['Region', 'Reviewer'])
+
+        ws = load_workbook(os.path.join(temp_dir, 'Quarterly', '1.0', 'John Doe', 'user_listing.xlsx')).active
+        visible = [r for r in range(2, ws.max_row + 1) if not ws.row_dimensions[r].hidden]
+        assert visible == [2, 4]
+        filters = {column.colId: column.filters.filter for column in ws.auto_filter.filterColumn}
+        assert filters == {1: ['1'], 2: ['John Doe', ' John Doe ']}
+        for row in visible:
+            assert str(ws.cell(row=row, column=2).value) in filters[1]
+            assert ws.cell(row=row, column=3).value in filters[2]
+
+    print("✓ Filter values match the cells they select")
+
+
+if __name__ == "__main__":
+    tests = [test_build_partition_groups, test_split_with_composite_keys, test_key_values_sanitized_for_folders,
+             test_filter_values_match_cells]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
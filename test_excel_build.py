@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+測試單一審查者按需產生：輸出與完整分割逐位元組相同、分割索引快取、LRU 快取與預覽
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from excel_build import ReviewerBuilder
+from excel_manifest import file_sha256
+from excel_splitter_fixed import process_excel_file_safe
+from test_excel_package_tools import build_excel_like_package
+
+
+def _master(path):
+    pd.DataFrame({
+        'Reviewer': ['張三', '李四', 'Alice Chen', '張三', '李四; Alice Chen'],
+        '金額': [100, 200, 300, 400, 500],
+    }).to_excel(path, index=False)
+
+
+def test_build_matches_full_split():
+    """單獨產生的檔案與完整分割的輸出相同，第二次直接取自快取"""
+    print("Testing single reviewer build...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = os.path.join(temp_dir, 'SAP.xlsx')
+        _master(master)
+        full = os.path.join(temp_dir, 'full')
+        assert process_excel_file_safe(master, 'Reviewer', full)
+
+        builder = ReviewerBuilder(master, 'Reviewer')
+        result = builder.build('張三', os.path.join(temp_dir, 'single'))
+        assert result['rows'] == 2 and not result['cached'] and builder.stats['index_built']
+        assert result['path'] == os.path.join(temp_dir, 'single', '張三', 'SAP - 張三.xlsx')
+        assert file_sha256(result['path']) == file_sha256(os.path.join(full, '張三', 'SAP - 張三.xlsx'))
+
+        # 新的 builder 直接讀取分割索引，檔案取自 LRU 快取
+        again = ReviewerBuilder(master, 'Reviewer')
+        result = again.build('張三')
+        assert result['cached'] and not again.stats['index_built']
+        assert result['path'].startswith(os.path.join(temp_dir, '.split_cache'))
+
+        # 母檔變更後索引與快取失效
+        pd.DataFrame({'Reviewer': ['張三'], '金額': [1]}).to_excel(master, index=False)
+        changed = ReviewerBuilder(master, 'Reviewer')
+        assert changed.build('張三')['rows'] == 1 and changed.stats['index_built']
+
+    print("✓ Build matches full split, index and file cached")
+
+
+def test_build_cleanup_options():
+    """瘦身與樞紐分析表快取選項納入快取鍵，輸出與相同選項的完整分割相同"""
+    print("Testing build cleanup options...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 巨集活頁簿走保留部件的快速路徑，縮圖與樞紐分析表快取會留在輸出中
+        master = os.path.join(temp_dir, 'SAP.xlsm')
+        rows = [['ID', 'Reviewer', 'Amount']] + [[f'REQ-{i:04d}', ['張三', '李四'][i % 2], i] for i in range(10)]
+        build_excel_like_package(master, rows, vba_project=b'VBA' * 10, pivot_cache=True)
+        full = os.path.join(temp_dir, 'full')
+        assert process_excel_file_safe(master, 'Reviewer', full, slim_output=True, strip_pivot_cache=True)
+        expected = file_sha256(os.path.join(full, '張三', 'SAP - 張三.xlsm'))
+
+        plain = ReviewerBuilder(master, 'Reviewer').build('張三')
+        assert file_sha256(plain['path']) != expected
+
+        cleaned = ReviewerBuilder(master, 'Reviewer', slim_output=True, strip_pivot_cache=True).build('張三')
+        assert not cleaned['cached']
+        assert file_sha256(cleaned['path']) == expected
+        assert ReviewerBuilder(master, 'Reviewer').build('張三')['cached']
+
+    print("✓ Cleanup options match the full split and key the cache")
+
+
+def test_lru_eviction_and_preview():
+    """超過快取上限時移除最久未使用的檔案；名稱比對忽略大小寫；預覽只回傳該審查者的資料列"""
+    print("Testing LRU cache and preview...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = os.path.join(temp_dir, 'SAP.xlsx')
+        _master(master)
+        cache_dir = os.path.join(temp_dir, 'cache')
+
+        builder = ReviewerBuilder(master, 'Reviewer', multi_valued=True, cache_dir=cache_dir, max_cached_files=2)
+        assert builder.resolve('alice  chen') == 'Alice Chen'
+        try:
+            builder.resolve('王五')
+            assert False, "unknown reviewer should raise"
+        except ValueError:
+            pass
+
+        assert builder.build('alice chen')['rows'] == 2
+        builder.build('李四')
+        builder.build('Alice Chen')          # 更新使用順序
+        builder.build('張三')                 # 移除最久未使用的 李四
+        assert builder.stats == {'index_built': True, 'hits': 1, 'builds': 3, 'evicted': 1}
+        assert len(os.listdir(os.path.join(cache_dir, 'files'))) == 2
+        assert not builder.build('李四')['cached']
+        assert builder.build('張三')['cached']
+
+        preview = builder.preview('李四')
+        assert list(preview.index) == [3, 6]
+        assert list(preview['金額']) == [200, 500]
+
+    print("✓ LRU eviction and preview work")
+
+
+if __name__ == "__main__":
+    tests = [test_build_matches_full_split, test_build_cleanup_options, test_lru_eviction_and_preview]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
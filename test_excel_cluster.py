@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+測試多機分割佇列：多個 worker 分工完成同一工作、逾期租約由其他 worker 接手、有效租約不會被搶、
+被接手的 worker 不會更新或刪除新租約、一直失敗的批次在嘗試上限後記錄為失敗
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from excel_cluster import ClusterWorker, Lease, LeaseLost, job_status, submit_job, wait_for_job
+from excel_manifest import load_output_manifest
+
+
+def _master(path, reviewers):
+    pd.DataFrame({'Reviewer': reviewers, '金額': range(len(reviewers)),
+                  'Email Address': [f"{name}@example.com" for name in reviewers]}).to_excel(path, index=False)
+
+
+def test_workers_share_job():
+    """兩個 worker 分工處理兩個母檔"""
+    print("Testing workers sharing one job...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue_dir = os.path.join(temp_dir, 'queue')
+        output = os.path.join(temp_dir, 'out')
+        sap = os.path.join(temp_dir, 'SAP.xlsx')
+        hr = os.path.join(temp_dir, 'HR.xlsx')
+        _master(sap, ['張三', '李四', '張三', '王五'])
+        _master(hr, ['李四', '趙六'])
+
+        job_id = submit_job(queue_dir, [sap, hr], 'Reviewer', output, chunk_size=1)
+        assert job_status(queue_dir, job_id)['tasks'] == 5
+        assert job_status(queue_dir, job_id)['pending'] == 5
+
+        workers = [ClusterWorker(queue_dir, worker_id=f"host{n}") for n in range(2)]
+        threads = [threading.Thread(target=worker.run, kwargs={'exit_when_idle': True}) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(worker.stats['tasks'] for worker in workers) == 5
+        assert sum(worker.stats['files'] for worker in workers) == 5
+        assert wait_for_job(queue_dir, job_id, poll_interval=0.1, timeout=5)
+
+        manifest = load_output_manifest(os.path.join(output, 'SAP'))
+        entries = {entry['reviewer']: entry for entry in manifest['files']}
+        assert sorted(entries) == ['張三', '李四', '王五']
+        assert entries['張三']['rows'] == 2 and entries['張三']['email'] == '張三@example.com'
+        assert entries['張三']['folder'] == '張三'
+        assert os.path.exists(os.path.join(output, 'SAP', '張三', 'SAP - 張三.xlsx'))
+        assert load_output_manifest(os.path.join(output, 'HR'))['totals']['files'] == 2
+
+    print("✓ Tasks split between workers and manifests written")
+
+
+def test_expired_lease_requeued():
+    """租約逾期的批次由其他 worker 接手；有效租約不會被搶"""
+    print("Testing lease expiry...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue_dir = os.path.join(temp_dir, 'queue')
+        master = os.path.join(temp_dir, 'SAP.xlsx')
+        _master(master, ['張三', '李四'])
+        job_id = submit_job(queue_dir, [master], 'Reviewer', os.path.join(temp_dir, 'out'), chunk_size=1)
+        job_dir = os.path.join(queue_dir, job_id)
+
+        # 一批被當機的 worker 持有（心跳停在 10 分鐘前），另一批被仍在執行的 worker 持有
+        dead, alive = sorted(name[:-5] for name in os.listdir(os.path.join(job_dir, 'tasks')))
+        for task_id in (dead, alive):
+            with open(os.path.join(job_dir, 'leases', f"{task_id}.lease"), 'w') as f:
+                json.dump({'worker': 'other'}, f)
+        stale = time.time() - 600
+        os.utime(os.path.join(job_dir, 'leases', f"{dead}.lease"), (stale, stale))
+        status = job_status(queue_dir, job_id, lease_seconds=60)
+        assert status['expired'] == 1 and status['running'] == 1
+
+        worker = ClusterWorker(queue_dir, worker_id='rescuer', lease_seconds=60)
+        stats = worker.run(exit_when_idle=True)
+        assert stats['requeued'] == 1 and stats['tasks'] == 1
+        assert os.path.exists(os.path.join(job_dir, 'done', f"{dead}.json"))
+        assert not os.path.exists(os.path.join(job_dir, 'done', f"{alive}.json"))
+        assert os.listdir(os.path.join(job_dir, 'leases')) == [f"{alive}.lease"]
+        assert not wait_for_job(queue_dir, job_id, poll_interval=0.05, lease_seconds=60, timeout=0.1)
+
+    print("✓ Expired lease taken over, live lease left alone")
+
+
+def test_lost_lease_left_alone():
+    """租約被接手後，原持有者的心跳與釋放不會動到新租約，發佈前中止"""
+    print("Testing lost lease...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue_dir = os.path.join(temp_dir, 'queue')
+        output = os.path.join(temp_dir, 'out')
+        master = os.path.join(temp_dir, 'SAP.xlsx')
+        _master(master, ['張三'])
+        job_id = submit_job(queue_dir, [master], 'Reviewer', output)
+        job_dir = os.path.join(queue_dir, job_id)
+        task_id = os.listdir(os.path.join(job_dir, 'tasks'))[0][:-5]
+
+        slow = ClusterWorker(queue_dir, worker_id='slow')
+        lease = slow.claim(job_dir, task_id)
+        assert lease is not None and lease.renew()
+
+        # 心跳停頓被視為逾期：另一個 worker 接手並建立自己的租約
+        stale = time.time() - 600
+        os.utime(lease.path, (stale, stale))
+        rescuer = ClusterWorker(queue_dir, worker_id='rescuer', lease_seconds=60)
+        new_lease = rescuer.claim(job_dir, task_id)
+        assert new_lease is not None and rescuer.stats['requeued'] == 1
+
+        assert not lease.owned() and new_lease.owned()
+        assert not lease.renew() and lease.lost.is_set()
+        try:
+            slow.process_task(_read(job_dir, 'job.json'), job_dir, task_id, lease)
+            assert False, "租約遺失時應中止"
+        except LeaseLost:
+            pass
+        assert not os.path.exists(os.path.join(output, 'SAP'))
+        lease.release()
+        assert os.path.exists(new_lease.path) and new_lease.owned()
+
+        new_lease.release()
+        assert not os.path.exists(new_lease.path)
+
+    print("✓ Lost lease not renewed or released, nothing published")
+
+
+def test_poison_task_capped():
+    """一直失敗的批次在 max_attempts 次後記錄為失敗，工作可以結束"""
+    print("Testing poison task...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue_dir = os.path.join(temp_dir, 'queue')
+        output = os.path.join(temp_dir, 'out')
+        master = os.path.join(temp_dir, 'SAP.xlsx')
+        _master(master, ['張三', '李四'])
+        job_id = submit_job(queue_dir, [master], 'Reviewer', output)
+        with open(output, 'w') as f:   # 輸出位置被檔案佔住：每次發佈都失敗
+            f.write('not a folder')
+
+        worker = ClusterWorker(queue_dir, worker_id='w', max_attempts=2)
+        stop = threading.Event()
+        thread = threading.Thread(target=worker.run, kwargs={'stop_event': stop, 'poll_interval': 0.05})
+        thread.start()
+        try:
+            deadline = time.monotonic() + 10
+            while job_status(queue_dir, job_id)['done'] < 1 and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            stop.set()
+            thread.join()
+
+        assert worker.stats['errors'] == 2 and worker.stats['abandoned'] == 1
+        job_dir = os.path.join(queue_dir, job_id)
+        entries = _read(job_dir, os.path.join('done', os.listdir(os.path.join(job_dir, 'done'))[0]))['entries']
+        assert sorted(entry['reviewer'] for entry in entries) == ['張三', '李四']
+        assert all(entry['status'] == 'failed' and '2 次' in entry['error'] for entry in entries)
+        assert os.listdir(os.path.join(job_dir, 'leases')) == []
+
+    print("✓ Poison task recorded as failed after max attempts")
+
+
+def _read(job_dir, name):
+    with open(os.path.join(job_dir, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    tests = [test_workers_share_job, test_expired_lease_requeued, test_lost_lease_left_alone,
+             test_poison_task_capped]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+測試跨母檔合併：每位審查者一個活頁簿，每個應用程式一個工作表
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from excel_consolidate import (consolidate_reviewer_workbooks, parse_master_arguments, reviewer_folder_collisions,
+                               sheet_title_for)
+
+
+def test_sheet_title_for():
+    """工作表名稱去除非法字元、限制長度並避免重複"""
+    used = set()
+    assert sheet_title_for('SAP/ERP', used) == 'SAP_ERP'
+    assert sheet_title_for('sap_erp', used) == 'sap_erp (2)'
+    assert len(sheet_title_for('A' * 40, used)) == 31
+
+
+def test_consolidate_reviewer_workbooks():
+    """每個母檔只讀一次，審查者檔案數等於審查者人數"""
+    print("Testing consolidation...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sap = os.path.join(temp_dir, 'sap.xlsx')
+        pd.DataFrame({'User_ID': ['S1', 'S2', 'S3'], 'Reviewer': ['張三', '李四', '張三']}).to_excel(sap, index=False)
+        slack = os.path.join(temp_dir, 'slack.xlsx')
+        pd.DataFrame({'Reviewer': ['張三', None, '王五'], 'User_ID': ['K1', 'K2', 'K3']}).to_excel(slack, index=False)
+        broken = os.path.join(temp_dir, 'broken.xlsx')
+        pd.DataFrame({'Owner': ['張三']}).to_excel(broken, index=False)
+        output_folder = os.path.join(temp_dir, 'out')
+
+        masters = parse_master_arguments([f'SAP={sap}', slack, f'HR={broken}'])
+        assert list(masters) == ['SAP', 'slack', 'HR']
+
+        stats = consolidate_reviewer_workbooks(masters, 'Reviewer', output_folder)
+
+        assert stats['files'] == 3
+        assert stats['files_without_consolidation'] == 4
+        assert stats['failed_masters'] == ['HR']
+        assert stats['collisions'] == {}
+
+        wb = load_workbook(os.path.join(output_folder, '張三', '張三.xlsx'))
+        assert wb.sheetnames == ['SAP', 'slack']
+        assert [row for row in wb['SAP'].iter_rows(values_only=True)] == [
+            ('User_ID', 'Reviewer'), ('S1', '張三'), ('S3', '張三')]
+        assert [row for row in wb['slack'].iter_rows(values_only=True)] == [('Reviewer', 'User_ID'), ('張三', 'K1')]
+        assert wb['SAP'].auto_filter.ref == 'A1:B3'
+
+        assert load_workbook(os.path.join(output_folder, '王五', '王五.xlsx')).sheetnames == ['slack']
+
+    print("✓ One workbook per reviewer")
+
+
+def test_reviewer_folder_collisions():
+    """清理後資料夾名稱相同的審查者不輸出，並回報衝突"""
+    print("\nTesting reviewer folder collisions...")
+
+    assert reviewer_folder_collisions(['R&D/Ops', 'R&D:Ops', 'Alice', 'ALICE', '張三']) == {
+        'R&D_Ops': ['R&D/Ops', 'R&D:Ops'], 'Alice': ['Alice', 'ALICE']}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sap = os.path.join(temp_dir, 'sap.xlsx')
+        pd.DataFrame({'User_ID': ['S1', 'S2', 'S3'], 'Reviewer': ['R&D/Ops', 'R&D:Ops', '張三']}).to_excel(
+            sap, index=False)
+        output_folder = os.path.join(temp_dir, 'out')
+
+        stats = consolidate_reviewer_workbooks({'SAP': sap}, 'Reviewer', output_folder)
+
+        assert stats['collisions'] == {'R&D_Ops': ['R&D/Ops', 'R&D:Ops']}
+        assert stats['files'] == 1
+        assert sorted(os.listdir(output_folder)) == ['張三']
+
+    print("✓ Colliding reviewers reported, nothing overwritten")
+
+
+if __name__ == "__main__":
+    tests = [test_sheet_title_for, test_consolidate_reviewer_workbooks, test_reviewer_folder_collisions]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+測試期間異動：鍵欄位雜湊合併，只輸出新增、變更與移除的資料列
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from excel_delta import (CHANGE_COLUMN, CHANGED_FIELDS_COLUMN, compute_cycle_delta, hash_rows,
+                         process_cycle_delta)
+
+
+def _cycles():
+    previous = pd.DataFrame({
+        'User_ID': ['U1', 'U2', 'U3', 'U4'],
+        'Reviewer': ['張三', '李四', '張三', '王五'],
+        'Access_Level': ['Read', 'Admin', 'Write', 'Read'],
+        '金額': [100, 200, 300, None],
+    })
+    current = pd.DataFrame({
+        'User_ID': ['U5', 'U1', 'U2', 'U4'],
+        'Reviewer': ['李四', '張三', '李四', '王五'],
+        'Access_Level': ['Read', 'Read', 'Read', 'Read'],
+        '金額': [500, 100, 250, None],
+    })
+    return current, previous
+
+
+def test_hash_rows_ignores_dtype():
+    """同樣的值在不同型別下雜湊一致"""
+    left = pd.DataFrame({'a': [1, 2], 'b': ['x', None]})
+    right = pd.DataFrame({'a': ['1', '2'], 'b': ['x', None]})
+    assert hash_rows(left, ['a', 'b']).tolist() == hash_rows(right, ['a', 'b']).tolist()
+
+
+def test_float_columns_from_blank_cells():
+    """只有一期因空白儲存格變成浮點數欄位時，不會誤判為新增/移除或變更"""
+    previous = pd.DataFrame({'ID': [1, 2, 3], 'Reviewer': ['張三', '李四', '張三'], '金額': [10, 20, 30]})
+    current = pd.DataFrame({'ID': [1, 2, 3, None], 'Reviewer': ['張三', '李四', '張三', '李四'],
+                            '金額': [10, 25, None, 40]})
+    assert current['ID'].dtype == float and current['金額'].dtype == float
+
+    delta = compute_cycle_delta(current, previous, 'ID')
+    assert delta[CHANGE_COLUMN].tolist() == ['變更', '變更']
+    assert delta['ID'].tolist() == [2, 3]
+    assert delta[CHANGED_FIELDS_COLUMN].tolist() == ['金額', '金額']
+
+
+def test_compute_cycle_delta():
+    """新增、變更（含變更欄位）與移除；未變動的列不輸出"""
+    current, previous = _cycles()
+    delta = compute_cycle_delta(current, previous, 'User_ID')
+
+    assert delta['User_ID'].tolist() == ['U5', 'U2', 'U3']
+    assert delta[CHANGE_COLUMN].tolist() == ['新增', '變更', '移除']
+    assert delta.loc[1, CHANGED_FIELDS_COLUMN] == 'Access_Level, 金額'
+    assert delta.loc[2, 'Reviewer'] == '張三'
+
+
+def test_duplicate_keys_rejected():
+    current, previous = _cycles()
+    current.loc[0, 'User_ID'] = 'U1'
+    try:
+        compute_cycle_delta(current, previous, 'User_ID')
+        assert False, "duplicate keys should raise"
+    except ValueError as e:
+        assert 'U1' in str(e)
+
+
+def test_process_cycle_delta():
+    """每位審查者只收到自己的異動列"""
+    print("Testing cycle delta workbooks...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        current, previous = _cycles()
+        current_path = os.path.join(temp_dir, 'Q3.xlsx')
+        previous_path = os.path.join(temp_dir, 'Q2.xlsx')
+        current.to_excel(current_path, index=False)
+        previous.to_excel(previous_path, index=False)
+        output_folder = os.path.join(temp_dir, 'delta')
+
+        stats = process_cycle_delta(current_path, previous_path, 'User_ID', 'Reviewer', output_folder)
+
+        assert (stats['new'], stats['modified'], stats['removed'], stats['unchanged']) == (1, 1, 1, 2)
+        assert stats['reviewers'] == {'李四': 2, '張三': 1}
+        assert sorted(os.listdir(output_folder)) == sorted(['李四', '張三'])
+        rows = pd.read_excel(os.path.join(output_folder, '李四', 'Q3 - 李四 - 異動.xlsx'))
+        assert rows['User_ID'].tolist() == ['U5', 'U2']
+
+    print("✓ Delta workbooks only carry changed rows")
+
+
+if __name__ == "__main__":
+    tests = [test_hash_rows_ignores_dtype, test_float_columns_from_blank_cells, test_compute_cycle_delta, test_duplicate_keys_rejected,
+             test_process_cycle_delta]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+測試附件文件分發：硬連結共用同一檔案、reflink 不支援時改為一般複製、統計節省的位元組數；
+分發階段只 glob 一次、平行複製並略過未變動的檔案
+"""
+
+import os
+import sys
+import tempfile
+
+from excel_documents import (DistributionStats, DocumentDistributor, distribute_file, distribute_files,
+                             is_up_to_date)
+from excel_splitter_fixed import copy_selected_documents, list_selected_documents
+
+
+def _write(path, size):
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    return path
+
+
+def test_hardlink_shares_file():
+    """硬連結：目的檔與來源為同一個 inode，重複執行也不會出錯"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        src = _write(os.path.join(temp_dir, 'guide.pdf'), 4096)
+        dst = os.path.join(temp_dir, 'copy.pdf')
+        assert distribute_file(src, dst, 'hardlink') == ('hardlink', 4096)
+        assert os.stat(src).st_ino == os.stat(dst).st_ino
+        assert distribute_file(src, dst, 'hardlink')[0] == 'hardlink'
+
+        # 改回一般複製時不可覆寫來源檔本身
+        dest_dir = os.path.join(temp_dir, 'out')
+        os.makedirs(dest_dir)
+        distribute_files([src], dest_dir, 'hardlink')
+        distribute_files([src], dest_dir, 'copy')
+        assert os.stat(src).st_ino != os.stat(os.path.join(dest_dir, 'guide.pdf')).st_ino
+        assert os.path.getsize(src) == 4096
+
+
+def test_auto_falls_back_to_copy():
+    """auto：reflink 成功時節省寫入，否則內容相同的一般複製"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        src = _write(os.path.join(temp_dir, 'guide.docx'), 10000)
+        dst = os.path.join(temp_dir, 'clone.docx')
+        method, saved = distribute_file(src, dst, 'auto')
+        assert method in ('reflink', 'copy')
+        assert saved == (10000 if method == 'reflink' else 0)
+        with open(src, 'rb') as a, open(dst, 'rb') as b:
+            assert a.read() == b.read()
+
+        try:
+            distribute_file(src, dst, 'symlink')
+            assert False, "unknown mode should raise"
+        except ValueError:
+            pass
+
+
+def test_copy_selected_documents_stats():
+    """每位審查者資料夾都拿到文件，統計累計節省的位元組"""
+    print("Testing document distribution...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        _write(os.path.join(temp_dir, 'App_Guide.docx'), 2048)
+        _write(os.path.join(temp_dir, 'App_permission.pdf'), 1024)
+        stats = DistributionStats()
+        for reviewer in ('張三', '李四'):
+            folder = os.path.join(temp_dir, reviewer)
+            os.makedirs(folder)
+            copied = copy_selected_documents(temp_dir, folder, link_mode='hardlink', stats=stats)
+            assert sorted(copied) == ['App_Guide.docx', 'App_permission.pdf']
+
+        assert stats.methods['hardlink'] == 4
+        assert (stats.bytes_saved, stats.bytes_total) == (6144, 6144)
+        assert '6,144' in stats.summary()
+
+    print("✓ Documents linked into every reviewer folder")
+
+
+def test_document_distributor_skips_unchanged():
+    """分發階段：每個資料夾都拿到文件；重跑時大小與修改時間相同的檔案略過"""
+    print("\nTesting document distribution stage...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, 'source')
+        os.makedirs(source)
+        _write(os.path.join(source, 'App_Guide.docx'), 2048)
+        _write(os.path.join(source, 'App_permission.pdf'), 1024)
+        _write(os.path.join(source, 'notes.txt'), 10)
+        files = list_selected_documents(source)
+        assert [os.path.basename(f) for f in files] == ['App_Guide.docx', 'App_permission.pdf']
+        assert list_selected_documents(source, copy_word=False) == files[1:]
+
+        folders = [os.path.join(temp_dir, f"reviewer{i}") for i in range(10)]
+        for folder in folders:
+            os.makedirs(folder)
+
+        with DocumentDistributor(files, workers=3) as distributor:
+            for folder in folders:
+                assert distributor.submit(folder) == ['App_Guide.docx', 'App_permission.pdf']
+        assert distributor.errors == []
+        assert distributor.stats.methods['copy'] == 20
+        assert all(is_up_to_date(files[0], os.path.join(folder, 'App_Guide.docx')) for folder in folders)
+
+        # 修改其中一份副本：只有它會被重新複製
+        _write(os.path.join(folders[0], 'App_Guide.docx'), 100)
+        with DocumentDistributor(files, workers=3) as distributor:
+            for folder in folders:
+                distributor.submit(folder)
+        assert distributor.stats.methods['copy'] == 1
+        assert distributor.stats.methods['skipped'] == 19
+        assert os.path.getsize(os.path.join(folders[0], 'App_Guide.docx')) == 2048
+
+        # 來源檔不存在時只記錄錯誤，不中斷其他資料夾
+        with DocumentDistributor(files + [os.path.join(source, 'gone.pdf')]) as distributor:
+            distributor.submit(folders[1])
+        assert len(distributor.errors) == 1 and distributor.stats.methods['skipped'] == 2
+
+    print("✓ Documents globbed once, copied in parallel, unchanged files skipped")
+
+
+if __name__ == "__main__":
+    tests = [test_hardlink_shares_file, test_auto_falls_back_to_copy, test_copy_selected_documents_stats,
+             test_document_distributor_skips_unchanged]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+測試輸出清單：每個輸出檔一筆（資料夾、檔名、資料列數、位元組數、雜湊、Email、附件、狀態），
+JSON 與 CSV 內容一致，相同輸入重跑時清單不變
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from excel_manifest import file_sha256, load_output_manifest
+from excel_splitter_fixed import process_excel_file_safe
+
+
+def _create_master(path):
+    pd.DataFrame({
+        'User_ID': ['U1', 'U2', 'U3', 'U4'],
+        'Reviewer': ['張三', '李四', '張三', '王五'],
+        'Email Address': ['zhang@example.com', 'li@example.com', 'zhang@example.com', None],
+    }).to_excel(path, index=False)
+    return path
+
+
+def test_output_manifest():
+    """清單記錄每位審查者的輸出檔；名冊 Email 優先，其次為母檔 Email Address 欄位"""
+    print("Testing output manifest...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = _create_master(os.path.join(temp_dir, 'master.xlsx'))
+        docs = os.path.join(temp_dir, 'docs')
+        os.makedirs(docs)
+        with open(os.path.join(docs, 'Guide.pdf'), 'wb') as f:
+            f.write(b'%PDF guide')
+        roster = os.path.join(temp_dir, 'roster.csv')
+        pd.DataFrame({'Name': ['王五'], 'Email': ['wang@example.com']}).to_csv(roster, index=False)
+        output_folder = os.path.join(temp_dir, 'out')
+
+        assert process_excel_file_safe(master, 'Reviewer', output_folder, roster_file=roster, documents_dir=docs)
+
+        manifest = load_output_manifest(output_folder)
+        assert (manifest['source'], manifest['column'], manifest['method']) == ('master.xlsx', 'Reviewer', 'hide_rows')
+        assert manifest['totals'] == {'files': 3, 'failed': 0, 'rows': 4,
+                                      'bytes': sum(entry['bytes'] for entry in manifest['files'])}
+        entries = {entry['reviewer']: entry for entry in manifest['files']}
+        zhang = entries['張三']
+        assert (zhang['folder'], zhang['filename'], zhang['rows']) == ('張三', 'master - 張三.xlsx', 2)
+        assert zhang['email'] == 'zhang@example.com'
+        assert entries['王五']['email'] == 'wang@example.com'
+        assert zhang['documents'] == ['Guide.pdf']
+        assert os.path.exists(os.path.join(output_folder, '張三', 'Guide.pdf'))
+        output_file = os.path.join(output_folder, zhang['folder'], zhang['filename'])
+        assert zhang['sha256'] == file_sha256(output_file)
+        assert zhang['bytes'] == os.path.getsize(output_file)
+        assert {entry['status'] for entry in manifest['files']} == {'ok'}
+
+        table = pd.read_csv(os.path.join(output_folder, 'output_manifest.csv'), encoding='utf-8-sig')
+        assert table['reviewer'].tolist() == list(entries)
+        assert table.loc[0, 'documents'] == 'Guide.pdf'
+
+        # 輸出位元組穩定，重跑時清單內容相同
+        with open(os.path.join(output_folder, 'output_manifest.json'), 'rb') as f:
+            first = f.read()
+        assert process_excel_file_safe(master, 'Reviewer', output_folder, roster_file=roster, documents_dir=docs)
+        with open(os.path.join(output_folder, 'output_manifest.json'), 'rb') as f:
+            assert f.read() == first
+
+    print("✓ Manifest lists every output with hash, email and documents")
+
+
+if __name__ == "__main__":
+    tests = [test_output_manifest]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+測試 Excel 封裝層工具（輸出檔瘦身、樞紐分析表快取、.xlsm 快速路徑、穩定輸出位元組）
+使用手工組成、與 Excel 存檔格式相同（共用字串表）的活頁簿
+"""
+
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+from openpyxl import load_workbook
+
+import pandas as pd
+
+from excel_package_tools import (CONTENT_TYPES_PART, DEFAULT_FILE_MODE, FIXED_ZIP_TIMESTAMP, hide_rows_in_package,
+                                 normalize_package, package_timestamp, read_package, slim_workbook_package,
+                                 strip_pivot_cache_records, strip_pivot_caches, write_package)
+from excel_splitter_fixed import process_excel_file_safe
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def _column_letter(index):
+    return chr(ord('A') + index)
+
+
+def build_excel_like_package(path, rows, extra_strings=(), extra_xfs=0, thumbnail=True,
+                             orphan=True, vba_project=None, pivot_cache=False):
+    """
+    組出一個使用共用字串表的活頁簿（Excel 本身存檔的格式）
+
+    Args:
+        rows: 二維串列，第一列為標題
+        extra_strings: 額外放進共用字串表、但沒有儲存格引用的字串
+        extra_xfs: 額外放進 cellXfs、但沒有儲存格引用的樣式數
+        vba_project: 若提供位元組內容，則輸出 .xlsm 結構並帶入 vbaProject.bin
+        pivot_cache: 是否加入內含所有資料列的樞紐分析表快取（定義 + 記錄）
+    """
+    strings = []
+    index = {}
+    sheet_rows = []
+    for r, row in enumerate(rows, start=1):
+        cells = []
+        for c, value in enumerate(row):
+            ref = f"{_column_letter(c)}{r}"
+            style = ' s="1"' if r == 1 else ''
+            if isinstance(value, str):
+                if value not in index:
+                    index[value] = len(strings)
+                    strings.append(value)
+                cells.append(f'<c r="{ref}"{style} t="s"><v>{index[value]}</v></c>')
+            elif value is not None:
+                cells.append(f'<c r="{ref}"{style}><v>{value}</v></c>')
+        sheet_rows.append(f'<row r="{r}">{"".join(cells)}</row>')
+    strings.extend(s for s in extra_strings if s not in index)
+
+    last = f"{_column_letter(len(rows[0]) - 1)}{len(rows)}"
+    sheet = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+             f'<worksheet xmlns="{MAIN_NS}" xmlns:r="{REL_NS}"><dimension ref="A1:{last}"/>'
+             f'<sheetData>{"".join(sheet_rows)}</sheetData></worksheet>')
+    sst = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+           f'<sst xmlns="{MAIN_NS}" count="{len(strings)}" uniqueCount="{len(strings)}">'
+           + ''.join(f'<si><t>{escape(s)}</t></si>' for s in strings) + '</sst>')
+    xfs = ['<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>',
+           '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>']
+    xfs += ['<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'] * extra_xfs
+    styles = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+              f'<styleSheet xmlns="{MAIN_NS}">'
+              '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+              '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+              '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+              '<fill><patternFill patternType="gray125"/></fill></fills>'
+              '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+              '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+              f'<cellXfs count="{len(xfs)}">{"".join(xfs)}</cellXfs>'
+              '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+              '</styleSheet>')
+
+    workbook_ct = ('application/vnd.ms-excel.sheet.macroEnabled.main+xml' if vba_project is not None
+                   else 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml')
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Default Extension="jpeg" ContentType="image/jpeg"/>'
+        '<Default Extension="png" ContentType="image/png"/>'
+        '<Default Extension="bin" ContentType="application/vnd.ms-office.vbaProject"/>'
+        f'<Override PartName="/xl/workbook.xml" ContentType="{workbook_ct}"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+        + ('<Override PartName="/xl/pivotCache/pivotCacheDefinition1.xml" ContentType="application/'
+           'vnd.openxmlformats-officedocument.spreadsheetml.pivotCacheDefinition+xml"/>'
+           '<Override PartName="/xl/pivotCache/pivotCacheRecords1.xml" ContentType="application/'
+           'vnd.openxmlformats-officedocument.spreadsheetml.pivotCacheRecords+xml"/>' if pivot_cache else '')
+        + '</Types>')
+    root_rels = [f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>']
+    if thumbnail:
+        root_rels.append(f'<Relationship Id="rId2" Type="{PKG_REL_NS}/metadata/thumbnail" '
+                         'Target="docProps/thumbnail.jpeg"/>')
+    workbook_rels = [
+        f'<Relationship Id="rId1" Type="{REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>',
+        f'<Relationship Id="rId2" Type="{REL_NS}/styles" Target="styles.xml"/>',
+        f'<Relationship Id="rId3" Type="{REL_NS}/sharedStrings" Target="sharedStrings.xml"/>',
+    ]
+    if pivot_cache:
+        workbook_rels.append(f'<Relationship Id="rId5" Type="{REL_NS}/pivotCacheDefinition" '
+                             'Target="pivotCache/pivotCacheDefinition1.xml"/>')
+    if vba_project is not None:
+        workbook_rels.append('<Relationship Id="rId4" Type="http://schemas.microsoft.com/office/2006/'
+                             'relationships/vbaProject" Target="vbaProject.bin"/>')
+
+    parts = {
+        '[Content_Types].xml': content_types,
+        '_rels/.rels': f'<Relationships xmlns="{PKG_REL_NS}">{"".join(root_rels)}</Relationships>',
+        'xl/workbook.xml': (f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}"><sheets>'
+                            '<sheet name="Data" sheetId="1" r:id="rId1"/></sheets>'
+                            + ('<pivotCaches><pivotCache cacheId="1" r:id="rId5"/></pivotCaches>' if pivot_cache else '')
+                            + '</workbook>'),
+        'xl/_rels/workbook.xml.rels': f'<Relationships xmlns="{PKG_REL_NS}">{"".join(workbook_rels)}</Relationships>',
+        'xl/worksheets/sheet1.xml': sheet,
+        'xl/styles.xml': styles,
+        'xl/sharedStrings.xml': sst,
+    }
+    if thumbnail:
+        parts['docProps/thumbnail.jpeg'] = b'\xff\xd8\xff' + b'\x00' * 4096
+    if orphan:
+        parts['xl/media/image1.png'] = b'\x89PNG' + b'\x00' * 4096
+    if vba_project is not None:
+        parts['xl/vbaProject.bin'] = vba_project
+    if pivot_cache:
+        records = ''.join(
+            '<r>' + ''.join(f'<s v="{escape(str(v))}"/>' if isinstance(v, str) else f'<n v="{v}"/>' for v in row) + '</r>'
+            for row in rows[1:])
+        parts['xl/pivotCache/pivotCacheDefinition1.xml'] = (
+            f'<pivotCacheDefinition xmlns="{MAIN_NS}" xmlns:r="{REL_NS}" r:id="rId1" refreshOnLoad="0" '
+            f'recordCount="{len(rows) - 1}"><cacheSource type="worksheet">'
+            f'<worksheetSource ref="A1:{last}" sheet="Data"/></cacheSource>'
+            f'<cacheFields count="{len(rows[0])}">'
+            + ''.join(f'<cacheField name="{escape(h)}" numFmtId="0"><sharedItems/></cacheField>' for h in rows[0])
+            + '</cacheFields></pivotCacheDefinition>')
+        parts['xl/pivotCache/_rels/pivotCacheDefinition1.xml.rels'] = (
+            f'<Relationships xmlns="{PKG_REL_NS}"><Relationship Id="rId1" Type="{REL_NS}/pivotCacheRecords" '
+            'Target="pivotCacheRecords1.xml"/></Relationships>')
+        parts['xl/pivotCache/pivotCacheRecords1.xml'] = (
+            f'<pivotCacheRecords xmlns="{MAIN_NS}" count="{len(rows) - 1}">{records}</pivotCacheRecords>')
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in parts.items():
+            zf.writestr(name, data)
+    return path
+
+
+def _sample_rows():
+    rows = [['ID', 'Reviewer', 'Amount']]
+    for i in range(30):
+        rows.append([f'REQ-{i:04d}', ['張三', '李四', '王五'][i % 3], i * 100])
+    return rows
+
+
+def test_slim_removes_unused_strings_styles_and_parts():
+    """瘦身後只保留被引用的字串與樣式，且縮圖與孤立部件被移除"""
+    print("Testing workbook package slimming...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = build_excel_like_package(
+            os.path.join(temp_dir, 'master.xlsx'), _sample_rows(),
+            extra_strings=[f'unused-{i}' for i in range(500)], extra_xfs=20)
+
+        before = load_workbook(path)
+        before_values = [[c.value for c in row] for row in before.active.iter_rows()]
+        before_bold = before.active['A1'].font.b
+        before.close()
+
+        stats = slim_workbook_package(path)
+        print(f"✓ {stats['bytes_before']:,} → {stats['bytes_after']:,} bytes")
+
+        assert stats['strings_removed'] == 500
+        assert stats['styles_removed'] == 20
+        assert stats['parts_removed'] == 2
+        assert stats['bytes_after'] < stats['bytes_before']
+
+        parts = read_package(path)
+        assert 'docProps/thumbnail.jpeg' not in parts
+        assert 'xl/media/image1.png' not in parts
+        assert b'thumbnail' not in parts['_rels/.rels']
+        assert b'uniqueCount="36"' in parts['xl/sharedStrings.xml']
+
+        after = load_workbook(path)
+        after_values = [[c.value for c in row] for row in after.active.iter_rows()]
+        assert after_values == before_values
+        assert after.active['A1'].font.b == before_bold
+        after.close()
+
+    print("✓ Slimmed workbook keeps identical values and styles")
+
+
+def test_slim_is_noop_when_nothing_unused():
+    """沒有多餘內容時不改動字串與樣式表"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = build_excel_like_package(
+            os.path.join(temp_dir, 'clean.xlsx'), _sample_rows(), thumbnail=False, orphan=False)
+        original = read_package(path)
+
+        stats = slim_workbook_package(path)
+
+        assert stats['strings_removed'] == 0
+        assert stats['styles_removed'] == 0
+        assert stats['parts_removed'] == 0
+        assert read_package(path) == original
+
+
+def test_strip_pivot_cache_records():
+    """移除快取記錄後改為開啟時重新整理，記錄部件與其 Override 一併移除"""
+    print("Testing pivot cache stripping...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = build_excel_like_package(
+            os.path.join(temp_dir, 'pivot.xlsx'), _sample_rows(), thumbnail=False, orphan=False,
+            pivot_cache=True)
+
+        stats = strip_pivot_caches(path)
+
+        assert stats['caches_stripped'] == 1
+        assert stats['parts_removed'] == 1
+        parts = read_package(path)
+        assert 'xl/pivotCache/pivotCacheRecords1.xml' not in parts
+        assert b'pivotCacheRecords1' not in parts['[Content_Types].xml']
+        assert b'pivotCacheRecords' not in parts['xl/pivotCache/_rels/pivotCacheDefinition1.xml.rels']
+        definition = parts['xl/pivotCache/pivotCacheDefinition1.xml']
+        assert b'refreshOnLoad="1"' in definition
+        assert b'saveData="0"' in definition
+        assert b'r:id=' not in definition
+
+        # 再執行一次不應有任何變更
+        assert strip_pivot_caches(path)['parts_removed'] == 0
+
+    print("✓ Pivot cache records removed, cache set to refresh on open")
+
+
+def test_strip_pivot_cache_shared_items():
+    """快取欄位的 sharedItems 清空，使用該快取的樞紐分析表項目索引重設"""
+    print("Testing pivot cache shared items...")
+
+    parts = {
+        'xl/pivotCache/pivotCacheDefinition1.xml': (
+            f'<pivotCacheDefinition xmlns="{MAIN_NS}" refreshOnLoad="1" recordCount="3"><cacheFields count="2">'
+            '<cacheField name="Reviewer"><sharedItems count="2"><s v="張三"/><s v="李四"/></sharedItems></cacheField>'
+            '<cacheField name="金額"><sharedItems containsNumber="1" minValue="100" maxValue="900"/></cacheField>'
+            '</cacheFields></pivotCacheDefinition>').encode('utf-8'),
+        'xl/pivotTables/pivotTable1.xml': (
+            f'<pivotTableDefinition xmlns="{MAIN_NS}" cacheId="1"><pivotFields count="2">'
+            '<pivotField axis="axisRow"><items count="3"><item x="0"/><item x="1" h="1"/><item t="default"/></items>'
+            '</pivotField><pivotField axis="axisPage"><items count="1"><item x="0"/></items></pivotField></pivotFields>'
+            '<rowItems count="2"><i><x/></i><i t="grand"><x/></i></rowItems><colItems count="1"><i/></colItems>'
+            '<pageFields count="1"><pageField fld="1" item="0" hier="-1"/></pageFields></pivotTableDefinition>'
+        ).encode('utf-8'),
+        'xl/pivotTables/_rels/pivotTable1.xml.rels': (
+            f'<Relationships xmlns="{PKG_REL_NS}"><Relationship Id="rId1" Type="{REL_NS}/pivotCacheDefinition" '
+            'Target="../pivotCache/pivotCacheDefinition1.xml"/></Relationships>').encode('utf-8'),
+    }
+
+    assert strip_pivot_cache_records(parts) == ['xl/pivotCache/pivotCacheDefinition1.xml']
+    definition = parts['xl/pivotCache/pivotCacheDefinition1.xml'].decode('utf-8')
+    assert '張三' not in definition and '李四' not in definition and '900' not in definition
+    assert 'recordCount' not in definition
+    assert '<sharedItems count="0"/>' in definition
+    assert '<sharedItems containsNumber="1" count="0"/>' in definition
+    table = parts['xl/pivotTables/pivotTable1.xml'].decode('utf-8')
+    assert '<pivotField axis="axisRow"><items count="1"><item t="default"/></items></pivotField>' in table
+    assert '<pivotField axis="axisPage"></pivotField>' in table
+    assert 'rowItems' not in table and 'colItems' not in table
+    assert '<pageField fld="1" hier="-1"/>' in table
+
+    # 再執行一次結果不變
+    again = dict(parts)
+    strip_pivot_cache_records(again)
+    assert again == parts
+
+    print("✓ Shared items emptied and pivot item indexes reset")
+
+
+def test_xlsm_fast_path_keeps_vba_project_bytes():
+    """快速路徑只改寫工作表，vbaProject.bin 逐位元組保留"""
+    print("Testing .xlsm passthrough fast path...")
+    vba = bytes(range(256)) * 64
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = build_excel_like_package(
+            os.path.join(temp_dir, 'master.xlsm'), _sample_rows(), thumbnail=False, orphan=False,
+            vba_project=vba)
+        dest = os.path.join(temp_dir, 'out.xlsm')
+
+        stats = hide_rows_in_package(source, dest, 'Reviewer', '李四')
+
+        assert stats == {'rows_hidden': 20, 'rows_kept': 10, 'max_row': 31}
+        original, output = read_package(source), read_package(dest)
+        assert output['xl/vbaProject.bin'] == vba
+        changed = [name for name in original if original[name] != output[name]]
+        assert changed == ['xl/worksheets/sheet1.xml']
+
+        wb = load_workbook(dest, keep_vba=True)
+        ws = wb.active
+        visible = [ws.cell(row=r, column=2).value for r in range(2, ws.max_row + 1)
+                   if not ws.row_dimensions[r].hidden]
+        assert visible == ['李四'] * 10
+        assert ws.auto_filter.ref == 'A1:C31'
+        wb.close()
+
+    print("✓ Only the data sheet XML was rewritten")
+
+
+def test_fast_path_exclude_rows_on_openpyxl_output():
+    """openpyxl 產生的行內字串檔案也能走快速路徑，排除列不留下其他審查者資料"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, 'master.xlsx')
+        pd.DataFrame({'Reviewer': ['A', 'B', 'A', 'C'], 'Data': ['a1', 'b1', 'a2', 'c1']}).to_excel(
+            source, index=False)
+        dest = os.path.join(temp_dir, 'out.xlsx')
+
+        hide_rows_in_package(source, dest, 'Reviewer', 'A', exclude_rows=True)
+
+        values = pd.read_excel(dest)['Data'].dropna().tolist()
+        assert values == ['a1', 'a2']
+
+
+def test_process_excel_file_safe_routes_xlsm_to_fast_path():
+    """.xlsm 母檔在 hide_rows 模式下自動改走快速路徑"""
+    vba = b'signed-vba-project' * 100
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = build_excel_like_package(
+            os.path.join(temp_dir, 'master.xlsm'), _sample_rows(), thumbnail=False, orphan=False,
+            vba_project=vba)
+        output_folder = os.path.join(temp_dir, 'out')
+
+        assert process_excel_file_safe(source, 'Reviewer', output_folder, 'hide_rows')
+
+        for reviewer in ['張三', '李四', '王五']:
+            output = read_package(os.path.join(output_folder, reviewer, f'master - {reviewer}.xlsm'))
+            assert output['xl/vbaProject.bin'] == vba
+
+
+def test_xlsm_exclude_rows_leaves_no_other_reviewer_strings():
+    """.xlsm 排除列模式：其他審查者的文字不會留在共用字串表或任何部件中"""
+    rows = [['Reviewer', 'Note'], ['Alice', 'SECRET-ALICE'], ['Bob', 'SECRET-BOB'], ['Alice', 'shared']]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = build_excel_like_package(os.path.join(temp_dir, 'master.xlsm'), rows, thumbnail=False,
+                                          orphan=False, vba_project=b'vba' * 10)
+        output_folder = os.path.join(temp_dir, 'out')
+
+        assert process_excel_file_safe(source, 'Reviewer', output_folder, 'exclude_rows')
+
+        output = read_package(os.path.join(output_folder, 'Alice', 'master - Alice.xlsm'))
+        for name, data in output.items():
+            assert b'SECRET-BOB' not in data and b'Bob' not in data, name
+        assert b'SECRET-ALICE' in output['xl/sharedStrings.xml']
+        values = pd.read_excel(os.path.join(output_folder, 'Alice', 'master - Alice.xlsm'))['Note'].dropna()
+        assert values.tolist() == ['SECRET-ALICE', 'shared']
+
+
+def test_split_output_is_byte_identical():
+    """同一份母檔分割兩次，輸出檔逐位元組相同；docProps 時間取自母檔"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = os.path.join(temp_dir, 'master.xlsx')
+        pd.DataFrame({'Reviewer': ['張三', '李四', '張三'], '金額': [1, 2, 3]}).to_excel(master, index=False)
+
+        outputs = []
+        for run in ('run1', 'run2'):
+            folder = os.path.join(temp_dir, run)
+            assert process_excel_file_safe(master, 'Reviewer', folder, fingerprint=True)
+            with open(os.path.join(folder, '張三', 'master - 張三.xlsx'), 'rb') as f:
+                outputs.append(f.read())
+            time.sleep(1.1)  # 跨過 docProps 的秒級時間
+        assert outputs[0] == outputs[1]
+
+        output = os.path.join(temp_dir, 'run1', '張三', 'master - 張三.xlsx')
+        with zipfile.ZipFile(output) as zf:
+            infos = zf.infolist()
+            core = zf.read('docProps/core.xml').decode('utf-8')
+        assert infos[0].filename == CONTENT_TYPES_PART
+        assert {info.date_time for info in infos} == {FIXED_ZIP_TIMESTAMP}
+        assert package_timestamp(output) == package_timestamp(master)
+        assert core.count(package_timestamp(master)) == 2
+        assert {info.external_attr >> 16 for info in infos} == {0o644}
+
+
+def test_write_package_keeps_file_mode():
+    """改寫封裝時保留目的檔權限；新檔案使用一般權限（不是暫存檔的 0600）"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = os.path.join(temp_dir, 'master.xlsx')
+        pd.DataFrame({'Reviewer': ['張三'], '金額': [1]}).to_excel(master, index=False)
+        new_path = os.path.join(temp_dir, 'new.xlsx')
+        write_package(new_path, read_package(master))
+        assert os.stat(new_path).st_mode & 0o777 == os.stat(master).st_mode & 0o777 == DEFAULT_FILE_MODE
+
+        os.chmod(master, 0o640)
+        normalize_package(master)
+        assert os.stat(master).st_mode & 0o777 == 0o640
+
+
+if __name__ == "__main__":
+    tests = [
+        test_slim_removes_unused_strings_styles_and_parts,
+        test_slim_is_noop_when_nothing_unused,
+        test_strip_pivot_cache_records,
+        test_strip_pivot_cache_shared_items,
+        test_xlsm_fast_path_keeps_vba_project_bytes,
+        test_fast_path_exclude_rows_on_openpyxl_output,
+        test_process_excel_file_safe_routes_xlsm_to_fast_path,
+        test_xlsm_exclude_rows_leaves_no_other_reviewer_strings,
+        test_split_output_is_byte_identical,
+        test_write_package_keeps_file_mode,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
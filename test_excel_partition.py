@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+測試分割索引：多值審查者儲存格、代理人分派、主管彙總與規則分派
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from excel_partition import (build_reviewer_incidence, build_rollup_partitions, evaluate_routing_rules,
+                             incidence_to_partitions, load_delegate_table, load_org_hierarchy,
+                             parse_routing_rule, split_reviewer_names)
+from excel_splitter_fixed import ROLLUP_FOLDER_NAME, process_excel_file_safe
+
+
+def _sample_frame():
+    return pd.DataFrame({
+        'User_ID': ['USR-0001', 'USR-0002', 'USR-0003', 'USR-0004', 'USR-0005'],
+        'Reviewer': ['Alice Chen; Bob Johnson', 'Bob Johnson', None, 'Alice Chen；Mike Wilson', 'Mike Wilson\nAlice Chen'],
+    })
+
+
+def _output_folders(folder):
+    """輸出資料夾中的子資料夾（不含 output_manifest 清單檔）"""
+    return [name for name in os.listdir(folder) if os.path.isdir(os.path.join(folder, name))]
+
+
+def test_split_reviewer_names():
+    """分號、全形分號與換行都能拆分，並去除空白與重複"""
+    assert split_reviewer_names('Alice Chen; Bob Johnson') == ['Alice Chen', 'Bob Johnson']
+    assert split_reviewer_names('張三；李四\n張三') == ['張三', '李四']
+    assert split_reviewer_names(float('nan')) == []
+    assert split_reviewer_names(None) == []
+
+
+def test_incidence_with_delegates():
+    """一次建立關聯表：多值儲存格展開，代理人取得被代理者的資料列"""
+    print("Testing reviewer incidence...")
+
+    incidence = build_reviewer_incidence(_sample_frame(), 'Reviewer', delegates={'Bob Johnson': ['Jane Smith']})
+    partitions = incidence_to_partitions(incidence)
+
+    assert partitions == {
+        'Alice Chen': [2, 5, 6],
+        'Bob Johnson': [2, 3],
+        'Jane Smith': [2, 3],
+        'Mike Wilson': [5, 6],
+    }
+    assert set(incidence[incidence['reviewer'] == 'Jane Smith']['source']) == {'delegate'}
+    print(f"✓ {len(incidence)} row/reviewer pairs")
+
+
+def test_load_delegate_table():
+    """代理人對照表支援 CSV，略過空白與自己代理自己"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'delegates.csv')
+        pd.DataFrame({
+            'Reviewer': ['Bob Johnson', 'Bob Johnson', 'Alice Chen', 'Mike Wilson'],
+            'Delegate': ['Jane Smith', ' Jane Smith ', 'Alice Chen', None],
+        }).to_csv(path, index=False)
+
+        assert load_delegate_table(path) == {'Bob Johnson': ['Jane Smith']}
+
+
+def test_process_with_multi_valued_cells():
+    """多值儲存格的資料列出現在每位審查者（及代理人）的檔案中"""
+    print("\nTesting multi-valued split...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, 'master.xlsx')
+        _sample_frame().to_excel(excel_path, index=False)
+        delegates_path = os.path.join(temp_dir, 'delegates.csv')
+        pd.DataFrame({'Reviewer': ['Bob Johnson'], 'Delegate': ['Jane Smith']}).to_csv(delegates_path, index=False)
+        output_folder = os.path.join(temp_dir, 'out')
+
+        assert process_excel_file_safe(excel_path, 'Reviewer', output_folder, 'hide_rows',
+                                       multi_valued=True, delegates_file=delegates_path)
+
+        expected = {
+            'Alice Chen': ['USR-0001', 'USR-0004', 'USR-0005'],
+            'Bob Johnson': ['USR-0001', 'USR-0002'],
+            'Jane Smith': ['USR-0001', 'USR-0002'],
+            'Mike Wilson': ['USR-0004', 'USR-0005'],
+        }
+        assert sorted(_output_folders(output_folder)) == sorted(expected)
+        for reviewer, user_ids in expected.items():
+            ws = load_workbook(os.path.join(output_folder, reviewer, f'master - {reviewer}.xlsx')).active
+            visible = [ws.cell(row=r, column=1).value for r in range(2, ws.max_row + 1)
+                       if not ws.row_dimensions[r].hidden]
+            assert visible == user_ids, (reviewer, visible)
+
+    print("✓ Rows fanned out to every listed reviewer and delegate")
+
+
+def test_partition_uses_active_sheet():
+    """分割索引讀取作用中工作表（列號套用在 wb.active 上），不是第一張工作表"""
+    print("\nTesting split when the active sheet is not the first sheet...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, 'master.xlsx')
+        with pd.ExcelWriter(excel_path) as writer:
+            pd.DataFrame({'Reviewer': ['Bob Johnson', 'Mike Wilson', 'Alice Chen']}).to_excel(
+                writer, sheet_name='Summary', index=False)
+            _sample_frame().to_excel(writer, sheet_name='Data', index=False)
+        wb = load_workbook(excel_path)
+        wb.active = wb['Data']
+        wb.save(excel_path)
+        output_folder = os.path.join(temp_dir, 'out')
+
+        assert process_excel_file_safe(excel_path, 'Reviewer', output_folder, 'hide_rows', multi_valued=True)
+
+        expected = {
+            'Alice Chen': ['USR-0001', 'USR-0004', 'USR-0005'],
+            'Bob Johnson': ['USR-0001', 'USR-0002'],
+            'Mike Wilson': ['USR-0004', 'USR-0005'],
+        }
+        assert sorted(_output_folders(output_folder)) == sorted(expected)
+        for reviewer, user_ids in expected.items():
+            ws = load_workbook(os.path.join(output_folder, reviewer, f'master - {reviewer}.xlsx')).active
+            assert ws.title == 'Data'
+            visible = [ws.cell(row=r, column=1).value for r in range(2, ws.max_row + 1)
+                       if not ws.row_dimensions[r].hidden]
+            assert visible == user_ids, (reviewer, visible)
+
+    print("✓ Rows taken from the active sheet")
+
+
+def test_rollup_partitions():
+    """主管取得本人與所有直屬、間接部屬的資料列；循環不會無限展開"""
+    partitions = {'Alice': [2, 5], 'Bob': [3], 'Carol': [4, 6], 'Dave': [7]}
+    hierarchy = {'Alice': 'Erin', 'Bob': 'Erin', 'Carol': 'Bob', 'Erin': 'Frank', 'Dave': 'Grace',
+                 'Heidi': 'Frank'}
+
+    assert build_rollup_partitions(partitions, hierarchy) == {
+        'Erin': [2, 3, 4, 5, 6],
+        'Bob': [3, 4, 6],
+        'Frank': [2, 3, 4, 5, 6],
+        'Grace': [7],
+    }
+    cyclic = build_rollup_partitions({'A': [2], 'B': [3]}, {'A': 'B', 'B': 'A'})
+    assert set(cyclic['A']) | set(cyclic['B']) == {2, 3}
+
+
+def test_process_with_org_rollup():
+    """同一次執行輸出審查者檔與主管彙總檔"""
+    print("\nTesting manager roll-up split...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, 'master.xlsx')
+        pd.DataFrame({
+            'User_ID': ['USR-0001', 'USR-0002', 'USR-0003', 'USR-0004'],
+            'Reviewer': ['Alice Chen', 'Bob Johnson', 'Mike Wilson', 'Alice Chen'],
+        }).to_excel(excel_path, index=False)
+        org_path = os.path.join(temp_dir, 'org.csv')
+        pd.DataFrame({
+            'Name': ['Alice Chen', 'Bob Johnson', 'Mike Wilson', 'Sarah Lee'],
+            'Manager': ['Sarah Lee', 'Sarah Lee', 'Tom Hsu', 'Tom Hsu'],
+        }).to_csv(org_path, index=False)
+        output_folder = os.path.join(temp_dir, 'out')
+
+        assert load_org_hierarchy(org_path)['Sarah Lee'] == 'Tom Hsu'
+        assert process_excel_file_safe(excel_path, 'Reviewer', output_folder, 'hide_rows',
+                                       org_hierarchy_file=org_path)
+
+        assert sorted(_output_folders(output_folder)) == sorted(['Alice Chen', 'Bob Johnson', 'Mike Wilson',
+                                                            ROLLUP_FOLDER_NAME])
+        rollup_folder = os.path.join(output_folder, ROLLUP_FOLDER_NAME)
+        expected = {
+            'Sarah Lee': ['USR-0001', 'USR-0002', 'USR-0004'],
+            'Tom Hsu': ['USR-0001', 'USR-0002', 'USR-0003', 'USR-0004'],
+        }
+        assert sorted(os.listdir(rollup_folder)) == sorted(expected)
+        for manager, user_ids in expected.items():
+            ws = load_workbook(os.path.join(rollup_folder, manager, f'master - {manager}.xlsx')).active
+            visible = [ws.cell(row=r, column=1).value for r in range(2, ws.max_row + 1)
+                       if not ws.row_dimensions[r].hidden]
+            assert visible == user_ids, (manager, visible)
+
+    print("✓ Manager roll-ups written alongside reviewer files")
+
+
+def test_routing_rules():
+    """路由條件解析與整欄比對：字串、數值、in；無法轉成數字的儲存格不符合"""
+    assert parse_routing_rule("Access_Level == 'Admin'") == {'column': 'Access_Level', 'operator': '==', 'value': 'Admin'}
+    assert parse_routing_rule('金額 > 30000') == {'column': '金額', 'operator': '>', 'value': 30000.0}
+    assert parse_routing_rule('狀態 in 待審核|退回')['value'] == ['待審核', '退回']
+
+    df = pd.DataFrame({
+        'Access_Level': ['Admin', 'Read', ' Admin ', None],
+        '金額': [50000, 1200, 'N/A', 30001],
+        '狀態': ['待審核', '已核准', '退回', '待審核'],
+    })
+    rules = [dict(parse_routing_rule(expression), route=route) for expression, route in [
+        ("Access_Level == 'Admin'", 'Security Team'),
+        ('金額 > 30000', 'Finance'),
+        ('狀態 in 退回|已駁回', 'Audit'),
+    ]]
+    routed = evaluate_routing_rules(df, rules)
+    assert routed.groupby('reviewer')['row'].apply(list).to_dict() == {
+        'Security Team': [0, 2], 'Finance': [0, 3], 'Audit': [2]}
+
+
+def test_process_with_routing_rules():
+    """規則命中的資料列另外輸出給規則指定的審查者，原審查者檔不受影響"""
+    print("\nTesting rule-based routing...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, 'master.xlsx')
+        pd.DataFrame({
+            'ID': ['A001', 'A002', 'A003', 'A004'],
+            'Approver': ['張三', '李四', '張三', '王五'],
+            '金額': [12000, 45000, 31000, 800],
+        }).to_excel(excel_path, index=False)
+        rules_path = os.path.join(temp_dir, 'rules.csv')
+        pd.DataFrame({'Rule': ['金額 > 30000'], 'Route': ['財務主管']}).to_csv(rules_path, index=False)
+        output_folder = os.path.join(temp_dir, 'out')
+
+        assert process_excel_file_safe(excel_path, 'Approver', output_folder, 'hide_rows',
+                                       routing_rules_file=rules_path)
+
+        expected = {'張三': ['A001', 'A003'], '李四': ['A002'], '王五': ['A004'], '財務主管': ['A002', 'A003']}
+        assert sorted(_output_folders(output_folder)) == sorted(expected)
+        for reviewer, ids in expected.items():
+            ws = load_workbook(os.path.join(output_folder, reviewer, f'master - {reviewer}.xlsx')).active
+            visible = [ws.cell(row=r, column=1).value for r in range(2, ws.max_row + 1)
+                       if not ws.row_dimensions[r].hidden]
+            assert visible == ids, (reviewer, visible)
+
+    print("✓ Routed rows written to the rule's reviewer")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_split_reviewer_names,
+        test_incidence_with_delegates,
+        test_load_delegate_table,
+        test_process_with_multi_valued_cells,
+        test_partition_uses_active_sheet,
+        test_rollup_partitions,
+        test_process_with_org_rollup,
+        test_routing_rules,
+        test_process_with_routing_rules,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+測試分割 → 驗證 → 上傳 → 分享管線：階段重疊執行、佇列背壓、失敗的工作不往下游傳遞
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from excel_pipeline import PipelineStage, run_pipeline, split_upload_share
+
+
+def test_stages_overlap_with_backpressure():
+    """上傳第一個工作時後面的工作仍在建立；佇列不超過上限"""
+    events = []
+    lock = threading.Lock()
+
+    def log(name):
+        def step(job):
+            with lock:
+                events.append((name, job['item'], 'start'))
+            time.sleep(0.02)
+            with lock:
+                events.append((name, job['item'], 'end'))
+        return step
+
+    summary = run_pipeline(range(8), [PipelineStage('build', log('build')),
+                                      PipelineStage('upload', log('upload'), workers=3)], queue_size=2)
+
+    assert [job['item'] for job in summary['results']] == list(range(8))
+    assert all(job['status'] == 'ok' for job in summary['results'])
+    first_upload = events.index(('upload', 0, 'start'))
+    last_build = events.index(('build', 7, 'end'))
+    assert first_upload < last_build
+    assert all(entry['max_queue'] <= 2 for entry in summary['stages'].values())
+    assert summary['stages']['upload']['processed'] == 8
+
+
+def test_failed_jobs_stop_at_their_stage():
+    """失敗的工作記錄失敗階段，不進入下游"""
+    uploaded = []
+
+    def build(job):
+        if job['item'] == 'bad':
+            raise ValueError('broken')
+
+    summary = run_pipeline(['a', 'bad', 'b'], [PipelineStage('build', build),
+                                               PipelineStage('upload', lambda job: uploaded.append(job['item']))])
+    failed = summary['results'][1]
+    assert (failed['status'], failed['stage'], failed['error']) == ('failed', 'build', 'broken')
+    assert sorted(uploaded) == ['a', 'b']
+    assert summary['stages']['build']['failed'] == 1
+
+
+def test_split_upload_share():
+    """分割後的檔案依序上傳並分享給母檔 Email Address 欄位中的 Email"""
+    print("Testing split/upload/share pipeline...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = os.path.join(temp_dir, 'master.xlsx')
+        pd.DataFrame({
+            'Reviewer': ['張三', '李四', '張三', '王五'],
+            'Email Address': ['zhang@example.com', 'li@example.com', 'zhang@example.com', None],
+            '金額': [1, 2, 3, 4],
+        }).to_excel(master, index=False)
+        uploads, shares = [], []
+
+        def upload(path, folder):
+            uploads.append((os.path.basename(path), folder))
+            return True
+
+        def share(folder, email):
+            shares.append((folder, email))
+            return True
+
+        summary = split_upload_share(master, 'Reviewer', os.path.join(temp_dir, 'out'), upload, share,
+                                     upload_workers=2)
+
+        assert sorted(uploads) == sorted([('master - 張三.xlsx', '張三'), ('master - 李四.xlsx', '李四'),
+                                          ('master - 王五.xlsx', '王五')])
+        assert sorted(shares) == [('張三', 'zhang@example.com'), ('李四', 'li@example.com')]
+        wang = summary['results'][2]
+        assert (wang['item'], wang['stage'], wang['error']) == ('王五', 'share', '沒有 Email')
+        assert list(summary['stages']) == ['build', 'validate', 'upload', 'share']
+
+    print("✓ Reviewers uploaded and shared while the next ones were being built")
+
+
+if __name__ == "__main__":
+    tests = [test_stages_overlap_with_backpressure, test_failed_jobs_stop_at_their_stage, test_split_upload_share]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
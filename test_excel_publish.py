@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+測試本機暫存與批次發佈：完整輸出樹一次發佈、未變更的檔案略過（不讀取目的檔）、不留下暫存檔、
+暫存模式的附件直接連結到輸出資料夾
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+import excel_publish
+from excel_publish import PARTIAL_PREFIX, PUBLISH_RECORD_NAME, StagedOutput, publish_file, publish_tree
+from excel_splitter_fixed import process_excel_file_safe
+from splitter_enhanced import split_excel_enhanced
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def _tree(folder):
+    """資料夾中的檔案（不含發佈紀錄）"""
+    return sorted(os.path.relpath(os.path.join(root, name), folder)
+                  for root, _, names in os.walk(folder) for name in names if name != PUBLISH_RECORD_NAME)
+
+
+def test_publish_tree():
+    """新檔與變更的檔案發佈，內容相同的略過，目的地其他檔案保留"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        staging = os.path.join(temp_dir, 'staging')
+        dest = os.path.join(temp_dir, 'synced')
+        _write(os.path.join(staging, '張三', 'a.xlsx'), 'new')
+        _write(os.path.join(staging, '李四', 'b.xlsx'), 'same')
+        _write(os.path.join(staging, '李四', 'c.xlsx'), 'changed')
+        _write(os.path.join(dest, '李四', 'b.xlsx'), 'same')
+        _write(os.path.join(dest, '李四', 'c.xlsx'), 'old')
+        _write(os.path.join(dest, 'keep.txt'), 'keep')
+        # 沒有發佈紀錄時以大小與修改時間判斷
+        same = os.stat(os.path.join(staging, '李四', 'b.xlsx'))
+        os.utime(os.path.join(dest, '李四', 'b.xlsx'), ns=(same.st_atime_ns, same.st_mtime_ns))
+
+        stats = publish_tree(staging, dest, move=False)
+        assert (stats['published'], stats['unchanged'], stats['directories']) == (2, 1, 1)
+        assert os.path.exists(os.path.join(dest, PUBLISH_RECORD_NAME))
+        assert _tree(dest) == sorted(['keep.txt', os.path.join('張三', 'a.xlsx'), os.path.join('李四', 'b.xlsx'),
+                                      os.path.join('李四', 'c.xlsx')])
+        with open(os.path.join(dest, '李四', 'c.xlsx'), encoding='utf-8') as f:
+            assert f.read() == 'changed'
+        assert os.path.exists(os.path.join(staging, '張三', 'a.xlsx'))
+
+
+def _stage(staging, contents):
+    """重新產生暫存區（每次都是新的修改時間，與實際分割相同）"""
+    for relative, text in contents.items():
+        _write(os.path.join(staging, relative), text)
+        os.utime(os.path.join(staging, relative), ns=(0, os.stat(os.path.join(staging, relative)).st_mtime_ns
+                                                      + 5 * 10 ** 9))
+
+
+def test_publish_tree_uses_record():
+    """依發佈紀錄略過未變更的檔案；被外部修改的目的檔重新發佈"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        staging = os.path.join(temp_dir, 'staging')
+        dest = os.path.join(temp_dir, 'synced')
+        contents = {os.path.join('張三', name): 'same' for name in ('a.xlsx', 'b.xlsx', 'c.xlsx')}
+        _stage(staging, contents)
+        assert publish_tree(staging, dest, move=False)['published'] == 3
+
+        # 暫存檔是新寫的（修改時間不同），內容相同者仍略過
+        _stage(staging, contents)
+        _write(os.path.join(dest, '張三', 'c.xlsx'), 'edit')   # 大小相同但內容被改過
+        stats = publish_tree(staging, dest, move=True)
+        assert (stats['published'], stats['unchanged']) == (1, 2)
+        with open(os.path.join(dest, '張三', 'c.xlsx'), encoding='utf-8') as f:
+            assert f.read() == 'same'
+
+        _stage(staging, contents)
+        assert publish_tree(staging, dest, move=False)['published'] == 0
+
+
+def test_publish_tree_interrupted():
+    """輸出清單最後發佈；中斷後發佈紀錄不變，下次重新發佈尚未更新的檔案"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        staging = os.path.join(temp_dir, 'staging')
+        dest = os.path.join(temp_dir, 'synced')
+        _stage(staging, {'output_manifest.json': 'v1', os.path.join('張三', 'a.xlsx'): 'old',
+                         os.path.join('李四', 'b.xlsx'): 'old'})
+        publish_tree(staging, dest, move=False)
+        with open(os.path.join(dest, PUBLISH_RECORD_NAME), encoding='utf-8') as f:
+            record = f.read()
+
+        _stage(staging, {'output_manifest.json': 'v2', os.path.join('張三', 'a.xlsx'): 'new',
+                         os.path.join('李四', 'b.xlsx'): 'new'})
+        published = []
+
+        def fail_on_b(src, dst, move=False):
+            if os.path.basename(dst) == 'b.xlsx':
+                raise OSError('network drive went away')
+            published.append(os.path.basename(dst))
+            original_publish_file(src, dst, move)
+
+        original_publish_file = excel_publish.publish_file
+        excel_publish.publish_file = fail_on_b
+        try:
+            publish_tree(staging, dest, move=False)
+            assert False, "interrupted publish should raise"
+        except OSError:
+            pass
+        finally:
+            excel_publish.publish_file = original_publish_file
+        assert published == ['a.xlsx']
+        with open(os.path.join(dest, 'output_manifest.json'), encoding='utf-8') as f:
+            assert f.read() == 'v1'
+        with open(os.path.join(dest, PUBLISH_RECORD_NAME), encoding='utf-8') as f:
+            assert f.read() == record
+
+        stats = publish_tree(staging, dest, move=False)
+        assert (stats['published'], stats['unchanged']) == (2, 1)
+        for relative in (os.path.join('張三', 'a.xlsx'), os.path.join('李四', 'b.xlsx')):
+            with open(os.path.join(dest, relative), encoding='utf-8') as f:
+                assert f.read() == 'new'
+
+
+def test_publish_file_cleans_partial():
+    """複製失敗時不留下 ~$publish- 暫存檔，也不動到原目的檔"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dst = os.path.join(temp_dir, 'out.xlsx')
+        _write(dst, 'original')
+        try:
+            publish_file(os.path.join(temp_dir, 'missing.xlsx'), dst)
+            assert False, "missing source should raise"
+        except OSError:
+            pass
+        assert os.listdir(temp_dir) == ['out.xlsx']
+        assert not any(name.startswith(PARTIAL_PREFIX) for name in os.listdir(temp_dir))
+
+
+def test_staged_output_discards_on_error():
+    """處理途中發生錯誤時不發佈任何檔案"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dest = os.path.join(temp_dir, 'synced')
+        try:
+            with StagedOutput(dest, os.path.join(temp_dir, 'stage')) as staging:
+                _write(os.path.join(staging.path, 'a.xlsx'), 'half')
+                raise RuntimeError('boom')
+        except RuntimeError:
+            pass
+        assert not os.path.exists(dest)
+        assert os.listdir(os.path.join(temp_dir, 'stage')) == []
+
+
+def test_splitters_stage_and_publish():
+    """兩種分割工具以 stage 產生的輸出與直接輸出相同，暫存資料夾最後清除"""
+    print("Testing staged publish...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = os.path.join(temp_dir, 'master.xlsx')
+        pd.DataFrame({'Reviewer': ['張三', '李四', '張三'], '金額': [1, 2, 3]}).to_excel(master, index=False)
+        staging_root = os.path.join(temp_dir, 'stage')
+        documents = os.path.join(temp_dir, 'docs')
+        _write(os.path.join(documents, 'guide.pdf'), 'guide')
+        _write(os.path.join(temp_dir, 'App guide.docx'), 'app guide')
+
+        direct = os.path.join(temp_dir, 'direct')
+        synced = os.path.join(temp_dir, 'synced')
+        assert process_excel_file_safe(master, 'Reviewer', direct)
+        assert process_excel_file_safe(master, 'Reviewer', synced, staging_root=staging_root)
+        assert _tree(synced) == _tree(direct)
+        assert os.listdir(staging_root) == []
+
+        # 附件在發佈後直接分發到輸出資料夾（硬連結保留，不經暫存區複製）
+        assert process_excel_file_safe(master, 'Reviewer', synced, staging_root=staging_root,
+                                       documents_dir=documents, doc_link_mode='hardlink')
+        assert os.path.samefile(os.path.join(synced, '張三', 'guide.pdf'), os.path.join(documents, 'guide.pdf'))
+
+        stats = split_excel_enhanced(master, 'App', output_dir=synced, stage=True, link_mode='hardlink')
+        assert stats['app_folder'] == os.path.join(synced, 'App')
+        assert stats['published'] == 3
+        assert os.path.exists(os.path.join(synced, 'App', '張三', 'master.xlsx'))
+        assert os.path.samefile(os.path.join(synced, 'App', '李四', 'App guide.docx'),
+                                os.path.join(temp_dir, 'App guide.docx'))
+        assert os.path.exists(os.path.join(synced, 'App', 'share_folders.ps1'))
+        # 暫存檔每次都是新的，重新分割時依發佈紀錄略過未變更的檔案
+        stats = split_excel_enhanced(master, 'App', output_dir=synced, stage=True, link_mode='hardlink')
+        assert stats['published'] == 0
+
+    print("✓ Output built locally and published in one pass")
+
+
+if __name__ == "__main__":
+    tests = [test_publish_tree, test_publish_tree_uses_record, test_publish_tree_interrupted,
+             test_publish_file_cleans_partial, test_staged_output_discards_on_error, test_splitters_stage_and_publish]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+測試審查流程指令：merge 將審查者修改合併回母檔並回報衝突；列指紋找出被修改的資料列；
+status 彙整完成進度
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from excel_package_tools import changed_visible_rows
+from excel_review import collect_review_status, key_text, merge_review_files, values_equal
+from excel_splitter_fixed import process_excel_file_safe
+from splitter_enhanced import split_excel_enhanced
+
+
+def _create_master(path):
+    pd.DataFrame({
+        'User_ID': ['USR-0001', 'USR-0002', 'USR-0003', 'USR-0004'],
+        'Reviewer': ['張三', '李四', '張三', '王五'],
+        'Status': [None, None, None, None],
+        '金額': [100, 200, 300, 400],
+    }).to_excel(path, index=False)
+    return path
+
+
+def _edit(path, updates):
+    """模擬審查者在輸出檔中編輯儲存格 {(列, 欄): 值}"""
+    wb = load_workbook(path)
+    for (row, col), value in updates.items():
+        wb.active.cell(row=row, column=col).value = value
+    wb.save(path)
+
+
+def test_value_helpers():
+    assert key_text(1001.0) == '1001'
+    assert key_text('  ') is None
+    assert values_equal(100, 100.0)
+    assert values_equal(None, '')
+    assert not values_equal('Approve', 'Revoke')
+
+
+def test_merge_review_files():
+    """修改合併回母檔；隱藏列不參與比對；衝突不寫入並列入報告"""
+    print("Testing merge back...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = _create_master(os.path.join(temp_dir, 'master.xlsx'))
+        output_folder = os.path.join(temp_dir, 'out')
+        assert process_excel_file_safe(master, 'Reviewer', output_folder, 'hide_rows')
+
+        # 張三核准自己的兩列；李四修改金額，並在隱藏的張三列上亂改（應忽略）
+        _edit(os.path.join(output_folder, '張三', 'master - 張三.xlsx'), {(2, 3): 'Approve', (4, 3): 'Revoke'})
+        _edit(os.path.join(output_folder, '李四', 'master - 李四.xlsx'), {(3, 4): 250, (2, 3): 'Hacked'})
+        # 代理人檔案與張三對同一儲存格給出不同值 → 衝突
+        delegate_folder = os.path.join(output_folder, '代理人')
+        os.makedirs(delegate_folder)
+        delegate_file = os.path.join(delegate_folder, 'master - 代理人.xlsx')
+        pd.DataFrame({'User_ID': ['USR-0003', 'USR-9999'], 'Status': ['Approve', 'Approve']}).to_excel(
+            delegate_file, index=False)
+
+        stats = merge_review_files(master, output_folder, 'User_ID', workers=2)
+
+        assert stats['files'] == 4
+        assert stats['changes'] == 2
+        assert stats['conflicts'] == 1
+        assert stats['unmatched'] == 1
+
+        ws = load_workbook(stats['output']).active
+        assert [ws.cell(row=r, column=3).value for r in range(2, 6)] == ['Approve', None, None, None]
+        assert ws.cell(row=3, column=4).value == 250
+
+        conflicts = pd.read_excel(stats['report'], sheet_name='衝突')
+        assert set(conflicts['審查值']) == {'Revoke', 'Approve'}
+        assert set(conflicts['User_ID']) == {'USR-0003'}
+
+    print("✓ Edits merged, conflicts reported")
+
+
+def test_reviewer_filter_rows():
+    """審查者自行篩選隱藏的資料列：指定審查者欄位時仍合併，否則不合併並回報警告"""
+    print("\nTesting reviewer-applied filters...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = _create_master(os.path.join(temp_dir, 'master.xlsx'))
+        output_folder = os.path.join(temp_dir, 'out')
+        assert process_excel_file_safe(master, 'Reviewer', output_folder, 'hide_rows')
+
+        # 張三修改第 4 列後，在 Status 欄篩選只顯示 Approve（第 4 列因此被隱藏）
+        zhang = os.path.join(output_folder, '張三', 'master - 張三.xlsx')
+        wb = load_workbook(zhang)
+        ws = wb.active
+        ws.cell(row=2, column=3).value = 'Approve'
+        ws.cell(row=4, column=3).value = 'Revoke'
+        ws.auto_filter.add_filter_column(2, ['Approve'])
+        ws.row_dimensions[4].hidden = True
+        wb.save(zhang)
+        _edit(os.path.join(output_folder, '李四', 'master - 李四.xlsx'), {(2, 3): 'Hacked'})
+
+        stats = merge_review_files(master, output_folder, 'User_ID', workers=1)
+        assert stats['changes'] == 1 and stats['warnings'] == 1
+        assert pd.read_excel(stats['report'], sheet_name='警告')['檔案'].tolist() == [
+            os.path.join('張三', 'master - 張三.xlsx')]
+
+        stats = merge_review_files(master, output_folder, 'User_ID', workers=1, reviewer_column='Reviewer')
+        assert stats['changes'] == 2 and stats['warnings'] == 0
+        ws = load_workbook(stats['output']).active
+        assert [ws.cell(row=r, column=3).value for r in range(2, 6)] == ['Approve', None, 'Revoke', None]
+
+    print("✓ Filtered rows merged by reviewer partition")
+
+
+def test_fingerprint_columns():
+    """分割時寫入隱藏的列編號與指紋；未修改的列指紋相符，修改後只回傳該列"""
+    print("\nTesting row fingerprints...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = _create_master(os.path.join(temp_dir, 'master.xlsx'))
+        output_folder = os.path.join(temp_dir, 'out')
+        assert process_excel_file_safe(master, 'Reviewer', output_folder, 'hide_rows', fingerprint=True)
+
+        path = os.path.join(output_folder, '張三', 'master - 張三.xlsx')
+        ws = load_workbook(path).active
+        assert [ws.cell(row=1, column=c).value for c in (5, 6)] == ['_row_id', '_fingerprint']
+        assert ws.column_dimensions['E'].hidden and ws.column_dimensions['F'].hidden
+        assert [ws.cell(row=r, column=5).value for r in range(2, 6)] == [2, 3, 4, 5]
+        assert load_workbook(master).active.max_column == 4
+
+        header, changed = changed_visible_rows(path)
+        assert changed == []
+
+        _edit(path, {(4, 3): 'Approve'})
+        header, changed = changed_visible_rows(path)
+        assert [row_id for row_id, _ in changed] == [4]
+
+        stats = merge_review_files(master, output_folder, 'User_ID', workers=1)
+        assert stats['changes'] == 1
+        assert load_workbook(stats['output']).active.cell(row=4, column=3).value == 'Approve'
+
+        # splitter_enhanced 也能寫入相同的指紋欄位
+        split_excel_enhanced(master, 'App', fingerprint=True)
+        header, changed = changed_visible_rows(os.path.join(temp_dir, 'App', '李四', 'master.xlsx'))
+        assert '_fingerprint' in header.values() and changed == []
+
+    print("✓ Fingerprints detect edited rows without the master")
+
+
+def test_collect_review_status():
+    """只計算可見列的狀態；未變動的檔案沿用快取"""
+    print("\nTesting review status...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = _create_master(os.path.join(temp_dir, 'master.xlsx'))
+        output_folder = os.path.join(temp_dir, 'out')
+        assert process_excel_file_safe(master, 'Reviewer', output_folder, 'hide_rows')
+        zhang = os.path.join(output_folder, '張三', 'master - 張三.xlsx')
+        _edit(zhang, {(2, 3): 'Approve', (3, 3): 'Hidden edit'})
+
+        summary = collect_review_status(output_folder, workers=2)
+        assert summary['totals'] == {'files': 3, 'rows': 4, 'completed': 1, 'pending': 3,
+                                     'completion_rate': 0.25, 'errors': 0, 'warnings': 0}
+        assert summary['statuses'] == {'Approve': 1}
+        assert summary['read'] == 3
+        by_reviewer = {entry['審查者']: entry for entry in summary['files']}
+        assert (by_reviewer['張三']['資料列'], by_reviewer['張三']['已完成']) == (2, 1)
+        assert os.path.exists(summary['json'])
+        assert pd.read_excel(summary['report'], sheet_name='審查進度')['檔案'].size == 3
+
+        _edit(zhang, {(4, 3): 'Revoke'})
+        summary = collect_review_status(output_folder, workers=2)
+        assert (summary['read'], summary['cached']) == (1, 2)
+        assert summary['totals']['completed'] == 2
+
+    print("✓ Status aggregated with cache")
+
+
+def test_status_with_reviewer_filter():
+    """審查者只篩選出未完成的列時，指定審查者欄位仍計入被篩選隱藏的已完成列"""
+    print("\nTesting review status with reviewer filter...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = _create_master(os.path.join(temp_dir, 'master.xlsx'))
+        output_folder = os.path.join(temp_dir, 'out')
+        assert process_excel_file_safe(master, 'Reviewer', output_folder, 'hide_rows')
+
+        # 張三完成第 2 列後，在 Status 欄篩選只顯示空白（第 2 列因此被隱藏）
+        zhang = os.path.join(output_folder, '張三', 'master - 張三.xlsx')
+        wb = load_workbook(zhang)
+        ws = wb.active
+        ws.cell(row=2, column=3).value = 'Approve'
+        ws.auto_filter.add_filter_column(2, [], blank=True)
+        ws.row_dimensions[2].hidden = True
+        wb.save(zhang)
+
+        summary = collect_review_status(output_folder, workers=1, use_cache=False)
+        by_reviewer = {entry['審查者']: entry for entry in summary['files']}
+        assert (by_reviewer['張三']['資料列'], by_reviewer['張三']['已完成']) == (1, 0)
+        assert summary['totals']['warnings'] == 1
+
+        summary = collect_review_status(output_folder, workers=1, reviewer_column='Reviewer')
+        by_reviewer = {entry['審查者']: entry for entry in summary['files']}
+        assert (by_reviewer['張三']['資料列'], by_reviewer['張三']['已完成']) == (2, 1)
+        assert summary['totals'] == {'files': 3, 'rows': 4, 'completed': 1, 'pending': 3,
+                                     'completion_rate': 0.25, 'errors': 0, 'warnings': 0}
+
+    print("✓ Filtered rows counted by reviewer partition")
+
+
+if __name__ == "__main__":
+    tests = [test_value_helpers, test_merge_review_files, test_reviewer_filter_rows, test_fingerprint_columns,
+             test_collect_review_status, test_status_with_reviewer_filter]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
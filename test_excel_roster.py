@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+測試審查者名冊對照：一次合併、未對應報告、分享腳本使用名冊 Email
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from excel_roster import join_roster, load_reviewer_manifest, load_roster, manifest_email_map
+from splitter_enhanced import split_excel_enhanced
+
+
+def _write_roster(path):
+    pd.DataFrame({
+        'Name': ['John Doe', 'Jane  Smith', 'Mike Wilson', 'john doe'],
+        'Email': ['john.doe@company.com', 'jane.smith@company.com', None, 'duplicate@company.com'],
+        'Department': ['IT', 'Finance', 'HR', 'IT'],
+        'Manager': ['Sarah Lee', 'Tom Hsu', 'Tom Hsu', 'Sarah Lee'],
+    }).to_csv(path, index=False)
+    return path
+
+
+def test_join_roster():
+    """姓名比對忽略大小寫與多餘空白；名冊沒有 Email 的人視為未對應"""
+    print("Testing roster join...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        roster = load_roster(_write_roster(os.path.join(temp_dir, 'roster.csv')))
+        assert len(roster) == 3
+
+        manifest = join_roster([('SAP/John Doe', 'John Doe '), ('SAP/Jane Smith', 'jane smith'),
+                                ('Slack/Mike Wilson', 'Mike Wilson'), ('Slack/Ghost', 'Ghost')], roster)
+
+        assert manifest['matched'].tolist() == [True, True, False, False]
+        assert manifest_email_map(manifest) == {
+            'SAP/John Doe': 'john.doe@company.com',
+            'SAP/Jane Smith': 'jane.smith@company.com',
+            'Slack/Mike Wilson': 'N/A',
+            'Slack/Ghost': 'N/A',
+        }
+        assert manifest.loc[1, 'manager'] == 'Tom Hsu'
+
+    print("✓ Roster joined in one pass")
+
+
+def test_split_with_roster():
+    """分割時寫出審查者清單與未對應報告，分享腳本直接帶入名冊 Email"""
+    print("\nTesting split with roster...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, 'user_listing.xlsx')
+        pd.DataFrame({
+            'User_ID': ['USR-0001', 'USR-0002', 'USR-0003'],
+            'Reviewer': ['John Doe', 'Jane Smith', 'Unknown Person'],
+        }).to_excel(excel_path, index=False)
+        roster_path = _write_roster(os.path.join(temp_dir, 'roster.csv'))
+
+        split_excel_enhanced(excel_path, 'TestApp', roster_file=roster_path)
+
+        app_folder = os.path.join(temp_dir, 'TestApp')
+        manifest = load_reviewer_manifest(os.path.join(app_folder, 'reviewer_manifest.csv'))
+        assert manifest['folder'].tolist() == ['John Doe', 'Jane Smith', 'Unknown Person']
+        assert manifest['matched'].tolist() == [True, True, False]
+
+        unmatched = pd.read_csv(os.path.join(app_folder, 'unmatched_reviewers.csv'), encoding='utf-8-sig')
+        assert unmatched['reviewer'].tolist() == ['Unknown Person']
+
+        with open(os.path.join(app_folder, 'share_folders.ps1'), encoding='utf-8') as f:
+            script = f.read()
+        assert "$userEmail = 'jane.smith@company.com'" in script
+        assert "Read-Host 'Enter email for Unknown Person'" in script
+
+        # 補齊名冊後重新分割，上次的未對應報告不應留下
+        roster = pd.read_csv(roster_path)
+        roster.loc[len(roster)] = ['Unknown Person', 'unknown@company.com', 'IT', 'Sarah Lee']
+        roster.to_csv(roster_path, index=False)
+        split_excel_enhanced(excel_path, 'TestApp', roster_file=roster_path)
+        assert load_reviewer_manifest(os.path.join(app_folder, 'reviewer_manifest.csv'))['matched'].all()
+        assert not os.path.exists(os.path.join(app_folder, 'unmatched_reviewers.csv'))
+
+    print("✓ Manifest and unmatched report written")
+
+
+def test_staged_split_removes_stale_report():
+    """暫存後發佈時，全部對應成功也會移除發佈資料夾中上次留下的未對應報告"""
+    print("\nTesting staged split with roster...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, 'user_listing.xlsx')
+        pd.DataFrame({'User_ID': ['USR-0001', 'USR-0002'], 'Reviewer': ['John Doe', 'Unknown Person']}).to_excel(
+            excel_path, index=False)
+        roster_path = _write_roster(os.path.join(temp_dir, 'roster.csv'))
+        output_dir = os.path.join(temp_dir, 'synced')
+        report_path = os.path.join(output_dir, 'TestApp', 'unmatched_reviewers.csv')
+
+        stats = split_excel_enhanced(excel_path, 'TestApp', roster_file=roster_path, output_dir=output_dir,
+                                     stage=True)
+        assert stats['unmatched_report'] == report_path and os.path.exists(report_path)
+
+        roster = pd.read_csv(roster_path)
+        roster.loc[len(roster)] = ['Unknown Person', 'unknown@company.com', 'IT', 'Sarah Lee']
+        roster.to_csv(roster_path, index=False)
+        stats = split_excel_enhanced(excel_path, 'TestApp', roster_file=roster_path, output_dir=output_dir,
+                                     stage=True)
+        assert stats['unmatched_report'] is None
+        assert not os.path.exists(report_path)
+
+    print("✓ Stale report removed from the published folder")
+
+
+if __name__ == "__main__":
+    tests = [test_join_roster, test_split_with_roster, test_staged_split_removes_stale_report]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+測試本機分割服務：送出工作、查詢狀態、取得輸出清單；相同工作沿用既有輸出；錯誤請求回報 400；單一審查者立即產生；
+沒有權杖或非 JSON 的請求被拒絕
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+from excel_service import create_server, options_fingerprint, outputs_intact
+from excel_splitter_fixed import process_excel_file_safe
+
+
+TOKEN = 'test-token'
+
+
+def _call(base, path, payload=None, token=TOKEN, content_type='application/json'):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    headers = {'Content-Type': content_type}
+    if token:
+        headers['X-Split-Token'] = token
+    request = urllib.request.Request(base + path, data=data, headers=headers, method='POST' if data else 'GET')
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _wait(base, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, job = _call(base, f'/jobs/{job_id}')
+        if job['status'] in ('succeeded', 'failed'):
+            return job
+        time.sleep(0.1)
+    raise AssertionError('job did not finish')
+
+
+def test_job_service():
+    """透過 HTTP API 送出分割工作並取得輸出清單"""
+    print("Testing split job service...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        master = os.path.join(temp_dir, 'master.xlsx')
+        pd.DataFrame({'Reviewer': ['張三', '李四', '張三'], '金額': [1, 2, 3]}).to_excel(master, index=False)
+        output = os.path.join(temp_dir, 'out')
+
+        server = create_server(port=0, workers=1, verbose=False, token=TOKEN)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            assert _call(base, '/health', token=None) == (200, {'status': 'ok', 'workers': 1, 'jobs': 0})
+
+            # 沒有權杖或不是 JSON 的請求（例如網頁送出的 text/plain 表單）一律拒絕
+            request = {'master': master, 'column': 'Reviewer', 'output': output}
+            assert _call(base, '/jobs', request, token=None)[0] == 401
+            assert _call(base, '/jobs', request, token='wrong')[0] == 401
+            assert _call(base, '/jobs', token=None)[0] == 401
+            assert _call(base, '/jobs', request, content_type='text/plain')[0] == 415
+            assert _call(base, '/jobs')[1] == []
+
+            status, job = _call(base, '/jobs', {'master': master, 'column': 'Reviewer', 'output': output,
+                                                'options': {'processing_method': 'hide_rows'}})
+            assert status == 202 and job['status'] in ('queued', 'running')
+            job = _wait(base, job['id'])
+            assert job['status'] == 'succeeded', job
+            assert any('處理完成' in line for line in job['log'])
+
+            status, manifest = _call(base, f"/jobs/{job['id']}/manifest")
+            assert status == 200
+            assert sorted(entry['reviewer'] for entry in manifest['files']) == ['張三', '李四']
+
+            # 相同母檔、選項與輸出位置：直接沿用
+            status, again = _call(base, '/jobs', {'master': master, 'column': 'Reviewer', 'output': output,
+                                                  'options': {'processing_method': 'hide_rows'}})
+            assert status == 202 and again['status'] == 'succeeded' and again['cached']
+
+            # 輸出檔被刪除：重新分割
+            os.remove(os.path.join(output, '李四', 'master - 李四.xlsx'))
+            status, rerun = _call(base, '/jobs', {'master': master, 'column': 'Reviewer', 'output': output,
+                                                  'options': {'processing_method': 'hide_rows'}})
+            assert not rerun['cached'] and _wait(base, rerun['id'])['status'] == 'succeeded'
+            assert os.path.exists(os.path.join(output, '李四', 'master - 李四.xlsx'))
+
+            # 錯誤請求
+            assert _call(base, '/jobs', {'master': master, 'column': 'Reviewer',
+                                         'options': {'delete_everything': True}})[0] == 400
+            assert _call(base, '/jobs', {'master': os.path.join(temp_dir, 'missing.xlsx'),
+                                         'column': 'Reviewer'})[0] == 400
+            assert _call(base, '/jobs/job-999')[0] == 404
+
+            # 找不到欄位：工作失敗，沒有輸出清單
+            status, bad = _call(base, '/jobs', {'master': master, 'column': 'Approver',
+                                                'output': os.path.join(temp_dir, 'bad')})
+            bad = _wait(base, bad['id'])
+            assert bad['status'] == 'failed'
+            assert _call(base, f"/jobs/{bad['id']}/manifest")[0] == 409
+            assert len(_call(base, '/jobs')[1]) == 4
+
+            # 單一審查者立即產生
+            status, built = _call(base, '/build', {'master': master, 'column': 'Reviewer', 'reviewer': '李四',
+                                                   'output': os.path.join(temp_dir, 'single')})
+            assert status == 200 and built['rows'] == 1
+            assert os.path.exists(built['path'])
+            assert _call(base, '/build', {'master': master, 'column': 'Reviewer', 'reviewer': '王五'})[0] == 400
+            # 輸出位置無法寫入：回報 500 而不是中斷連線
+            status, error = _call(base, '/build', {'master': master, 'column': 'Reviewer', 'reviewer': '李四',
+                                                   'output': master})
+            assert status == 500 and error['error']
+        finally:
+            server.shutdown()
+            server.server_close()
+            server.service.shutdown()
+
+    print("✓ Jobs submitted, tracked and manifests served")
+
+
+def test_cache_key_follows_option_file_contents():
+    """選項檔案與附件資料夾以內容作為快取鍵；輸出檔被修改時不再視為完整"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        roster = os.path.join(temp_dir, 'roster.csv')
+        documents = os.path.join(temp_dir, 'docs')
+        os.makedirs(documents)
+        with open(roster, 'w', encoding='utf-8') as f:
+            f.write('Name,Email\n張三,a@example.com\n')
+        options = {'roster_file': roster, 'documents_dir': documents}
+        before = options_fingerprint(options)
+
+        with open(roster, 'a', encoding='utf-8') as f:
+            f.write('李四,b@example.com\n')
+        assert options_fingerprint(options) != before
+        edited = options_fingerprint(options)
+        with open(os.path.join(documents, 'policy.pdf'), 'wb') as f:
+            f.write(b'%PDF')
+        assert options_fingerprint(options) != edited
+
+        master = os.path.join(temp_dir, 'master.xlsx')
+        pd.DataFrame({'Reviewer': ['張三'], '金額': [1]}).to_excel(master, index=False)
+        output = os.path.join(temp_dir, 'out')
+        assert not outputs_intact(output)
+        assert process_excel_file_safe(master, 'Reviewer', output)
+        assert outputs_intact(output)
+        with open(os.path.join(output, '張三', 'master - 張三.xlsx'), 'ab') as f:
+            f.write(b'x')
+        assert not outputs_intact(output)
+
+
+if __name__ == "__main__":
+    tests = [test_job_service, test_cache_key_follows_option_file_contents]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
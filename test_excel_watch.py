@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+測試監看資料夾：既有與新放入的母檔自動分割、寫到一半的檔案等寫完才處理、內容未變的母檔略過、
+讀不到的母檔略過、處理程序異常結束後重建程序池、inotify 溢位時重新掃描
+"""
+
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+import excel_watch
+from excel_watch import (IN_Q_OVERFLOW, FolderWatcher, InotifyWatcher, PollingWatcher, create_watcher,
+                         is_master_candidate)
+
+
+def _wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _master(path, reviewers):
+    pd.DataFrame({'Reviewer': reviewers, '金額': range(len(reviewers))}).to_excel(path, index=False)
+
+
+def test_is_master_candidate():
+    assert is_master_candidate('Q3 listing.xlsx')
+    assert is_master_candidate('macro.XLSM')
+    assert not is_master_candidate('~$Q3 listing.xlsx')
+    assert not is_master_candidate('.hidden.xlsx')
+    assert not is_master_candidate('notes.csv')
+
+
+def test_create_watcher_fallback():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        watcher = create_watcher(temp_dir, use_inotify=False)
+        assert isinstance(watcher, PollingWatcher)
+        watcher.close()
+        if sys.platform.startswith('linux'):
+            watcher = create_watcher(temp_dir)
+            assert isinstance(watcher, InotifyWatcher)
+            open(os.path.join(temp_dir, 'new.xlsx'), 'wb').close()
+            assert watcher.wait(2) == {os.path.join(temp_dir, 'new.xlsx')}
+            watcher.close()
+
+
+def _run_watch(use_inotify):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        inbox = os.path.join(temp_dir, 'inbox')
+        output = os.path.join(temp_dir, 'out')
+        os.makedirs(inbox)
+        _master(os.path.join(inbox, 'SAP.xlsx'), ['張三', '李四'])
+
+        watcher = FolderWatcher(inbox, 'Reviewer', output, workers=1, settle_seconds=0.3, poll_interval=0.1,
+                                use_inotify=use_inotify)
+        stop = threading.Event()
+        thread = threading.Thread(target=watcher.run, args=(stop,))
+        thread.start()
+        try:
+            # 啟動時既有的母檔
+            assert _wait_for(lambda: watcher.stats['splits'] == 1)
+            assert os.path.exists(os.path.join(output, 'SAP', '張三', 'SAP - 張三.xlsx'))
+
+            # 寫到一半（還不是完整 ZIP）的檔案不處理，寫完後才分割
+            staging = os.path.join(temp_dir, 'HR.xlsx')
+            _master(staging, ['王五'])
+            with open(staging, 'rb') as f:
+                data = f.read()
+            target = os.path.join(inbox, 'HR.xlsx')
+            with open(target, 'wb') as f:
+                f.write(data[:100])
+            time.sleep(0.6)
+            assert watcher.stats['splits'] == 1
+            with open(target, 'wb') as f:
+                f.write(data)
+            assert _wait_for(lambda: watcher.stats['splits'] == 2)
+            assert os.path.exists(os.path.join(output, 'HR', '王五', 'HR - 王五.xlsx'))
+
+            # 重新複製相同內容：依雜湊略過
+            shutil.copy(target, os.path.join(temp_dir, 'copy.xlsx'))
+            shutil.copy(os.path.join(temp_dir, 'copy.xlsx'), target)
+            assert _wait_for(lambda: watcher.stats['skipped'] >= 1)
+
+            # 更新內容：重新分割
+            _master(os.path.join(inbox, 'SAP.xlsx'), ['張三', '李四', '趙六'])
+            assert _wait_for(lambda: watcher.stats['splits'] == 3)
+            assert os.path.exists(os.path.join(output, 'SAP', '趙六', 'SAP - 趙六.xlsx'))
+        finally:
+            stop.set()
+            thread.join()
+        assert watcher.stats['failed'] == 0
+        assert set(watcher._load_state()) == {'SAP.xlsx', 'HR.xlsx'}
+
+
+def test_watch_polling():
+    """輪詢模式"""
+    print("Testing watch folder (polling)...")
+    _run_watch(use_inotify=False)
+    print("✓ New and changed masters split automatically")
+
+
+def test_watch_inotify():
+    """inotify 模式（非 Linux 平台自動改為輪詢）"""
+    print("\nTesting watch folder (inotify)...")
+    _run_watch(use_inotify=True)
+    print("✓ inotify events trigger splits")
+
+
+def _crash_once(path, column_name, output_folder, options):
+    """第一次呼叫時讓處理程序直接結束（模擬記憶體不足被終止）"""
+    marker = output_folder + '.crashed'
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return _split_master(path, column_name, output_folder, options)
+
+
+_split_master = excel_watch.split_master
+
+
+def test_unreadable_master_skipped():
+    """去抖動後被刪除或無法讀取的母檔略過，不中斷監看"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        watcher = FolderWatcher(temp_dir, 'Reviewer', os.path.join(temp_dir, 'out'))
+        missing = os.path.join(temp_dir, 'gone.xlsx')
+        watcher.pending[missing] = (None, 0.0)
+        watcher._dispatch(missing)
+        assert missing not in watcher.pending and not watcher.running
+        assert watcher.stats == {'splits': 0, 'failed': 0, 'skipped': 0, 'restarts': 0}
+
+
+def test_inotify_overflow_rescans():
+    """inotify 事件佇列溢位時回報資料夾中所有母檔"""
+    if not sys.platform.startswith('linux'):
+        return
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in ('SAP.xlsx', 'HR.xlsm', 'notes.csv'):
+            open(os.path.join(temp_dir, name), 'wb').close()
+        watcher = InotifyWatcher(temp_dir)
+        try:
+            overflow = struct.pack('iIII', -1, IN_Q_OVERFLOW, 0, 0)
+            assert watcher.parse(overflow) == {os.path.join(temp_dir, 'SAP.xlsx'), os.path.join(temp_dir, 'HR.xlsm')}
+        finally:
+            watcher.close()
+
+
+def test_pool_crash_requeued():
+    """處理程序異常結束時重建程序池並重新排入母檔"""
+    print("\nTesting worker crash...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        inbox = os.path.join(temp_dir, 'inbox')
+        output = os.path.join(temp_dir, 'out')
+        os.makedirs(inbox)
+        _master(os.path.join(inbox, 'SAP.xlsx'), ['張三'])
+
+        excel_watch.split_master = _crash_once
+        watcher = FolderWatcher(inbox, 'Reviewer', output, workers=1, settle_seconds=0.1, poll_interval=0.1,
+                                use_inotify=False)
+        stop = threading.Event()
+        thread = threading.Thread(target=watcher.run, args=(stop,))
+        thread.start()
+        try:
+            assert _wait_for(lambda: watcher.stats['splits'] == 1)
+        finally:
+            stop.set()
+            thread.join()
+            excel_watch.split_master = _split_master
+        assert watcher.stats['restarts'] == 1 and watcher.stats['failed'] == 0
+        assert os.path.exists(os.path.join(output, 'SAP', '張三', 'SAP - 張三.xlsx'))
+    print("✓ Crashed split retried on a new process pool")
+
+
+if __name__ == "__main__":
+    tests = [test_is_master_candidate, test_create_watcher_fallback, test_watch_polling, test_watch_inotify,
+             test_unreadable_master_skipped, test_inotify_overflow_rescans, test_pool_crash_requeued]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+測試多工作表分割：資料表依審查者分割，被資料驗證引用的查詢表完整保留
+"""
+
+import os
+import sys
+import tempfile
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from excel_splitter_fixed import process_excel_file_safe
+from excel_worksheet_analysis import ExcelWorksheetAnalyzer
+
+
+def create_multi_sheet_master(path):
+    """建立含摘要表、兩個應用程式資料表與一個查詢表的母檔"""
+    wb = Workbook()
+    summary = wb.active
+    summary.title = 'Summary'
+    summary.append(['Application', 'Owner'])
+    summary.append(['SAP', 'IT'])
+
+    for app, reviewers in [('SAP', ['Alice', 'Bob', 'Alice', 'Carol']), ('Slack', ['Bob', 'Carol', 'Bob'])]:
+        ws = wb.create_sheet(app)
+        ws.append(['User_ID', 'Reviewer', 'Status'])
+        for i, reviewer in enumerate(reviewers):
+            ws.append([f'{app}-{i}', reviewer, None])
+        dv = DataValidation(type='list', formula1="'Status Lists'!$A$1:$A$3")
+        dv.add(f'C2:C{len(reviewers) + 1}')
+        ws.add_data_validation(dv)
+
+    lists = wb.create_sheet('Status Lists')
+    for status in ['Approve', 'Revoke', 'Modify']:
+        lists.append([status])
+
+    wb.save(path)
+    return path
+
+
+def _visible_reviewers(ws):
+    return [ws.cell(row=r, column=2).value for r in range(2, ws.max_row + 1)
+            if not ws.row_dimensions[r].hidden]
+
+
+def _output_folders(folder):
+    """輸出資料夾中的子資料夾（不含 output_manifest 清單檔）"""
+    return [name for name in os.listdir(folder) if os.path.isdir(os.path.join(folder, name))]
+
+
+def test_classify_sheets():
+    """依審查者欄位與資料驗證引用分類工作表"""
+    print("Testing sheet classification...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = create_multi_sheet_master(os.path.join(temp_dir, 'master.xlsx'))
+        classification = ExcelWorksheetAnalyzer(path).classify_sheets('Reviewer')
+
+        assert classification['data_sheets'] == {'SAP': 2, 'Slack': 2}
+        assert classification['lookup_sheets'] == ['Status Lists']
+        assert classification['other_sheets'] == ['Summary']
+        assert classification['referenced_data_sheets'] == []
+
+    print("✓ Data, lookup and other sheets classified")
+
+
+def test_referenced_data_sheet_split():
+    """被資料驗證引用的資料表仍依審查者分割，不會整張留給每位審查者"""
+    print("\nTesting referenced data sheet...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = create_multi_sheet_master(os.path.join(temp_dir, 'master.xlsx'))
+        wb = load_workbook(path)
+        dv = DataValidation(type='list', formula1="SAP!$A$2:$A$5")
+        dv.add('D2:D4')
+        wb['Slack'].add_data_validation(dv)
+        wb.save(path)
+
+        classification = ExcelWorksheetAnalyzer(path).classify_sheets('Reviewer')
+        assert classification['data_sheets'] == {'SAP': 2, 'Slack': 2}
+        assert classification['referenced_data_sheets'] == ['SAP']
+        assert classification['lookup_sheets'] == ['Status Lists']
+
+        output_folder = os.path.join(temp_dir, 'out')
+        assert process_excel_file_safe(path, 'Reviewer', output_folder, 'multi_sheet')
+        wb = load_workbook(os.path.join(output_folder, 'Bob', 'master - Bob.xlsx'))
+        assert _visible_reviewers(wb['SAP']) == ['Bob']
+        wb.close()
+
+    print("✓ Referenced data sheet still split by reviewer")
+
+
+def test_multi_sheet_split():
+    """每位審查者一個檔案，所有資料表只顯示其資料列，查詢表不變"""
+    print("\nTesting multi-sheet split...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = create_multi_sheet_master(os.path.join(temp_dir, 'master.xlsx'))
+        output_folder = os.path.join(temp_dir, 'out')
+
+        assert process_excel_file_safe(path, 'Reviewer', output_folder, 'multi_sheet')
+
+        expected = {
+            'Alice': {'SAP': ['Alice', 'Alice'], 'Slack': []},
+            'Bob': {'SAP': ['Bob'], 'Slack': ['Bob', 'Bob']},
+            'Carol': {'SAP': ['Carol'], 'Slack': ['Carol']},
+        }
+        assert sorted(_output_folders(output_folder)) == sorted(expected)
+
+        for reviewer, sheets in expected.items():
+            wb = load_workbook(os.path.join(output_folder, reviewer, f'master - {reviewer}.xlsx'))
+            for sheet_name, visible in sheets.items():
+                assert _visible_reviewers(wb[sheet_name]) == visible
+                assert len(wb[sheet_name].data_validations.dataValidation) == 1
+            lists = wb['Status Lists']
+            assert [c.value for c in lists['A']] == ['Approve', 'Revoke', 'Modify']
+            assert not any(dim.hidden for dim in lists.row_dimensions.values())
+            wb.close()
+
+    print("✓ Each reviewer file covers every data sheet")
+
+
+if __name__ == "__main__":
+    tests = [test_classify_sheets, test_referenced_data_sheet_split, test_multi_sheet_split]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test manifest-driven batch mode in splitter_enhanced (many applications, one process, shared caches)
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from splitter_enhanced import BatchCache, SplitError, load_batch_manifest, run_batch, yaml
+
+
+def _write_master(path, reviewers):
+    pd.DataFrame({
+        'User_ID': [f'USR-{i:04d}' for i in range(len(reviewers))],
+        'Application': ['SAP' if i % 2 else 'Slack' for i in range(len(reviewers))],
+        'Reviewer': reviewers,
+    }).to_excel(path, index=False)
+    return path
+
+
+def test_load_batch_manifest():
+    """Relative master paths resolve against the manifest folder; keys default to Reviewer"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manifest_path = os.path.join(temp_dir, 'batch.csv')
+        pd.DataFrame({
+            'app_name': ['SAP', 'Slack'],
+            'master': ['masters/sap.xlsx', '/data/slack.xlsx'],
+            'keys': ['Application, Reviewer', None],
+            'docs': [None, 'Slack_*.txt'],
+        }).to_csv(manifest_path, index=False)
+
+        jobs = load_batch_manifest(manifest_path)
+        assert jobs[0] == {'app_name': 'SAP', 'master': os.path.join(temp_dir, 'masters/sap.xlsx'),
+                           'keys': ['Application', 'Reviewer'], 'docs': None}
+        assert jobs[1]['keys'] == ['Reviewer']
+        assert jobs[1]['docs'] == 'Slack_*.txt'
+
+
+def test_load_batch_manifest_rejects_bad_types():
+    """YAML values of the wrong type raise SplitError instead of crashing; null means missing"""
+    if yaml is None:
+        return
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manifest_path = os.path.join(temp_dir, 'batch.yml')
+        for docs, message in [("['a*.pdf', 'b*.pdf']", 'docs must be a string'), ('42', 'docs must be a string')]:
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                f.write(f"applications:\n  - app_name: SAP\n    master: sap.xlsx\n    docs: {docs}\n")
+            try:
+                load_batch_manifest(manifest_path)
+                assert False, "wrong docs type should raise"
+            except SplitError as e:
+                assert message in str(e), e
+
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            f.write("- app_name: SAP\n  master: sap.xlsx\n  docs: null\n  keys: [Application, Reviewer]\n")
+        jobs = load_batch_manifest(manifest_path)
+        assert jobs[0]['docs'] is None and jobs[0]['keys'] == ['Application', 'Reviewer']
+
+
+def test_batch_cache_loads_once():
+    """Concurrent lookups of the same key share one load"""
+    cache = BatchCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get('master', lambda: calls.append(1) or 'df') == 'df'
+    assert calls == [1]
+
+
+def test_batch_cache_releases_after_last_user():
+    """A key expected by two jobs is dropped after the second release and reloaded if needed again"""
+    cache = BatchCache()
+    key = cache.excel_key('master.xlsx')
+    cache.expect(key, 2)
+    calls = []
+    assert cache.get(key, lambda: calls.append(1) or 'df') == 'df'
+    cache.release(key)
+    assert cache.get(key, lambda: calls.append(1) or 'df') == 'df'
+    assert calls == [1]
+    cache.release(key)
+    assert key not in cache._values and key not in cache._users
+    cache.get(key, lambda: calls.append(1) or 'df')
+    assert calls == [1, 1]
+
+
+def test_run_batch():
+    """Every application is split in one run; failures are reported in the consolidated summary"""
+    print("Testing batch mode...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        _write_master(os.path.join(temp_dir, 'sap.xlsx'), ['John Doe', 'Jane Smith', 'John Doe'])
+        _write_master(os.path.join(temp_dir, 'shared.xlsx'), ['Mike Wilson', 'Sarah Lee', 'Mike Wilson', 'Tom Hsu'])
+        for name in ['SAP_UserGuide.txt', 'SAP_permission_form.txt', 'HR_policy.txt']:
+            with open(os.path.join(temp_dir, name), 'w') as f:
+                f.write(name)
+
+        manifest_path = os.path.join(temp_dir, 'batch.csv')
+        pd.DataFrame({
+            'app_name': ['SAP', 'HR', 'Finance', 'Missing'],
+            'master': ['sap.xlsx', 'shared.xlsx', 'shared.xlsx', 'nope.xlsx'],
+            'keys': ['Reviewer', 'Application,Reviewer', 'Reviewer', 'Reviewer'],
+            'docs': [None, 'HR_*.txt', None, None],
+        }).to_csv(manifest_path, index=False)
+        output_dir = os.path.join(temp_dir, 'out')
+
+        summary = run_batch(manifest_path, output_dir, workers=3).set_index('app_name')
+
+        assert summary.loc['SAP', 'workbooks'] == 2
+        assert summary.loc['SAP', 'documents'] == 2
+        assert summary.loc['HR', 'workbooks'] == 3
+        assert summary.loc['Finance', 'workbooks'] == 3
+        assert summary.loc['Missing', 'status'] == 'failed'
+        assert 'File not found' in summary.loc['Missing', 'error']
+
+        assert os.path.exists(os.path.join(output_dir, 'SAP', 'John Doe', 'SAP_permission_form.txt'))
+        assert os.path.exists(os.path.join(output_dir, 'HR', 'SAP', 'Sarah Lee', 'HR_policy.txt'))
+        assert os.path.exists(os.path.join(output_dir, 'Finance', 'Tom Hsu', 'shared.xlsx'))
+        assert os.path.exists(os.path.join(output_dir, 'batch_summary.csv'))
+
+    print("✓ Batch summary covers every application")
+
+
+if __name__ == "__main__":
+    tests = [test_load_batch_manifest, test_load_batch_manifest_rejects_bad_types, test_batch_cache_loads_once,
+             test_batch_cache_releases_after_last_user, test_run_batch]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            failed += 1
+    print(f"\nTest Results: {len(tests) - failed} passed, {failed} failed")
+    sys.exit(0 if failed == 0 else 1)